@@ -0,0 +1,75 @@
+"""JWT authentication that resolves a token to its user from the cache.
+
+``JWTAuthentication`` loads the user from the database on every request.
+``CachedJWTAuthentication`` keeps the user in the cache under the
+token's ``jti`` until the token expires, stored at the generation of the
+``user:<id>`` scope that saving or deleting the user bumps. A hit costs
+one cache round trip and no query; a changed or deactivated user is
+reloaded, and rejected, on the next request.
+
+``revoke`` rejects a token before it expires. Its ``jti`` goes on a
+denylist kept only until the token would have expired anyway, and its
+cached user is replaced by a marker so that hits see the revocation
+without a second lookup.
+"""
+import time
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from posts.cache import generation, get_versioned, set_versioned
+
+REVOKED = 'revoked'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def _key(jti):
+    return f'jwt:{jti}'
+
+
+def _denylist_key(jti):
+    return f'jwt:revoked:{jti}'
+
+
+def _lifetime(token):
+    return max(1, int(token['exp'] - time.time()))
+
+
+def revoke(token):
+    """Reject the validated ``token`` until it expires."""
+    jti = token[api_settings.JTI_CLAIM]
+    cache.set(_denylist_key(jti), True, _lifetime(token))
+    scope = user_scope(token[api_settings.USER_ID_CLAIM])
+    set_versioned(_key(jti), REVOKED, generation(scope), _lifetime(token))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` with the user cached for the token lifetime."""
+
+    def get_user(self, validated_token):
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if jti is None or user_id is None:
+            return super().get_user(validated_token)
+
+        user, version = get_versioned(_key(jti), user_scope(user_id))
+        if user is None:
+            # The denylist outlives the marker when the user changes.
+            if cache.get(_denylist_key(jti)):
+                user = REVOKED
+            else:
+                user = super().get_user(validated_token)
+            set_versioned(
+                _key(jti), user, version, _lifetime(validated_token)
+            )
+        if user == REVOKED:
+            raise AuthenticationFailed(
+                _('Token has been revoked'), code='token_revoked'
+            )
+        return user
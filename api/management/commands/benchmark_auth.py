@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CachedJWTAuthentication
+from posts import benchmark
+from posts.instrumentation import percentile
+from posts.models import User
+from posts.seeding import seed
+
+
+def authenticate_all(authentication, requests, threads):
+    """Authenticate ``requests`` on ``threads`` threads.
+
+    Returns the wall time and the time of every request.
+    """
+    def work(chunk):
+        timings = []
+        try:
+            for request in chunk:
+                started = time.perf_counter()
+                authentication.authenticate(request)
+                timings.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        return timings
+
+    with ThreadPoolExecutor(threads) as pool:
+        started = time.perf_counter()
+        timings = [
+            timing
+            for chunk in pool.map(
+                work, [requests[i::threads] for i in range(threads)]
+            )
+            for timing in chunk
+        ]
+        return time.perf_counter() - started, timings
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the per-request cost of JWT authentication with and '
+        'without cached user resolution under concurrent requests, in a '
+        'throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        count, threads = options['requests'], options['threads']
+        with benchmark.test_database():
+            seed(users=options['users'], posts=0, comments=0, follows=0)
+            tokens = [
+                str(AccessToken.for_user(user)) for user in User.objects.all()
+            ]
+            factory = RequestFactory()
+            requests = [
+                factory.get(
+                    '/api/v1/posts/',
+                    HTTP_AUTHORIZATION=f'Bearer {tokens[i % len(tokens)]}',
+                )
+                for i in range(count)
+            ]
+            self.stdout.write(
+                f'{count} requests of {len(tokens)} users on {threads} '
+                f'threads, microseconds per request:'
+            )
+            for name, authentication in (
+                ('database', JWTAuthentication()),
+                ('cached', CachedJWTAuthentication()),
+            ):
+                # Every pass starts from a cold cache of its own.
+                with benchmark.private_cache(f'benchmark_auth:{name}'):
+                    elapsed, timings = authenticate_all(
+                        authentication, requests, threads
+                    )
+                self.stdout.write(
+                    f'{name:>9}: wall {elapsed / count * 1e6:7.1f}  '
+                    f'p50 {percentile(timings, 50) * 1e6:7.1f}  '
+                    f'p95 {percentile(timings, 95) * 1e6:7.1f}'
+                )
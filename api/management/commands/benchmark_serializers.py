@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.serializers import PostSerializer, PostValuesSerializer
+from posts import benchmark
+from posts.models import Post
+from posts.seeding import seed
+
+
+def model_rows(context):
+    posts = list(Post.objects.for_feed())
+    return posts, (
+        lambda: PostSerializer(posts, many=True, context=context).data
+    )
+
+
+def values_rows(context):
+    serializer = PostValuesSerializer(context)
+    rows = list(serializer.values(Post.objects.for_feed()))
+    return rows, lambda: serializer.many(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the per-row cost of the model and values() post list '
+        'serializers in a throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Runs per serializer; the fastest one is reported',
+        )
+
+    def handle(self, *args, **options):
+        count = options['posts']
+        with benchmark.test_database():
+            seed(users=max(10, count // 10), posts=count, comments=0)
+            context = {'request': Request(
+                RequestFactory().get('/api/v1/posts/')
+            )}
+            results, outputs = {}, {}
+            for name, fetch in (('model', model_rows),
+                                ('values', values_rows)):
+                runs = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    rows, serialize = fetch(context)
+                    fetched = time.perf_counter()
+                    data = serialize()
+                    runs.append((
+                        fetched - started, time.perf_counter() - fetched
+                    ))
+                results[name] = min(runs, key=sum)
+                outputs[name] = JSONRenderer().render(data)
+        if outputs['model'] != outputs['values']:
+            raise CommandError('The serializers rendered different JSON')
+
+        self.stdout.write(
+            f'{count} posts, microseconds per row '
+            f'(fetch + serialize = total):'
+        )
+        for name, (fetch, serialize) in results.items():
+            self.stdout.write(
+                f'{name:>7}: {fetch / count * 1e6:7.1f} + '
+                f'{serialize / count * 1e6:7.1f} = '
+                f'{(fetch + serialize) / count * 1e6:7.1f}'
+            )
+        self.stdout.write(
+            f'speedup: {sum(results["model"]) / sum(results["values"]):.1f}x'
+        )
@@ -0,0 +1,97 @@
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from posts.pagination import CursorPaginator
+
+
+class CursorPagination(BasePagination):
+    """Keyset pagination with ``after``/``before`` cursors.
+
+    Views set ``cursor_ordering``; its last field must be unique. Pages
+    cost the same however deep they are, and ``limit`` can never ask for
+    more than ``max_page_size`` rows.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-pub_date', '-id')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        return self.paginate(
+            CursorPaginator(queryset, self.get_page_size(request), ordering),
+            request,
+        )
+
+    def paginate(self, paginator, request):
+        """Return the requested page of any cursor paginator."""
+        self.request = request
+        self.page = paginator.get_page(
+            request.query_params.get('after'),
+            request.query_params.get('before'),
+        )
+        return list(self.page)
+
+    def get_next_link(self):
+        if self.page.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'before')
+        return replace_query_param(url, 'after', self.page.next_cursor)
+
+    def get_previous_link(self):
+        if self.page.previous_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'after')
+        return replace_query_param(url, 'before', self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, \
+            'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, \
+            'coreschema must be installed to use `get_schema_fields()`'
+        return [
+            coreapi.Field(
+                name=name, required=False, location='query',
+                schema=coreschema.String(description=description),
+            )
+            for name, description in (
+                ('after', 'Cursor of the page after the current one.'),
+                ('before', 'Cursor of the page before the current one.'),
+            )
+        ] + [
+            coreapi.Field(
+                name=self.page_size_query_param, required=False,
+                location='query',
+                schema=coreschema.Integer(
+                    description=f'Results per page, at most '
+                                f'{self.max_page_size}.'
+                ),
+            )
+        ]
@@ -1,21 +1,91 @@
 from rest_framework import serializers
 
+from posts import follow_graph, variants
 from posts.models import Comment, Follow, Group, Post, User
 
 
-class PostSerializer(serializers.ModelSerializer):
+def requested_fields(request, available):
+    """Names asked for with ``?fields=`` on a read, ``None`` for all."""
+    if request is None or request.method != 'GET':
+        return None
+    requested = request.query_params.get('fields')
+    if not requested:
+        return None
+    names = {name.strip() for name in requested.split(',')} - {''}
+    unknown = names - set(available)
+    if unknown:
+        raise serializers.ValidationError({
+            'fields': [f'Unknown fields: {", ".join(sorted(unknown))}.']
+        })
+    return names
+
+
+def image_variants(image, request, generated=None):
+    """The variants of ``image``, looked up in ``generated`` if given."""
+    if not image:
+        return []
+    if generated is None or image.name not in generated:
+        generated = variants.generated_many([image])
+    return [
+        {
+            'width': variant.width,
+            'format': variant.format.lower(),
+            'url': (
+                request.build_absolute_uri(thumbnail.url)
+                if request else thumbnail.url
+            ),
+        }
+        for variant, thumbnail in generated[image.name]
+    ]
+
+
+class SparseFieldsetMixin:
+    """Return only the comma-separated fields of ``?fields=`` on reads.
+
+    Fields left out are not computed at all.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = requested_fields(self.context.get('request'), self.fields)
+        if names is not None:
+            for name in set(self.fields) - names:
+                self.fields.pop(name)
+
+
+class PostListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        if 'image_variants' in self.child.fields:
+            # One key value store lookup for the whole page
+            self.child.generated = variants.generated_many(
+                [post.image for post in posts]
+            )
+        return super().to_representation(posts)
+
+
+class PostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True
     )
+    image_variants = serializers.SerializerMethodField()
+    generated = None
 
     class Meta:
-        fields = ('id', 'text', 'author', 'pub_date',)
+        fields = ('id', 'text', 'author', 'pub_date', 'image_variants',)
         read_only_fields = ('pub_date',)
         model = Post
+        list_serializer_class = PostListSerializer
+
+    def get_image_variants(self, post):
+        return image_variants(
+            post.image, self.context.get('request'), self.generated
+        )
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True
@@ -26,15 +96,31 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ('created',)
         model = Comment
 
+    def validate_parent(self, parent):
+        view = self.context.get('view')
+        post_id = view.kwargs.get('post_id') if view else None
+        if parent is not None and str(parent.post_id) != str(post_id):
+            raise serializers.ValidationError(
+                'Replies must be on the post of the comment replied to.'
+            )
+        return parent
+
+
+class PostCommentSerializer(CommentSerializer):
+    """Comments created under a post given by the URL."""
 
-class GroupSerializer(serializers.ModelSerializer):
+    class Meta(CommentSerializer.Meta):
+        read_only_fields = ('created', 'post',)
+
+
+class GroupSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = '__all__'
         model = Group
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True,
@@ -44,14 +130,90 @@ class FollowSerializer(serializers.ModelSerializer):
         queryset=User.objects.all()
     )
 
-    def validate_following(self, attrs):
+    def validate_author(self, author):
         user = self.context['request'].user
-        if Follow.objects.filter(user=user, author__username=attrs).exists():
+        if follow_graph.is_following(user, author):
             raise serializers.ValidationError(
                 'You have already follow this author!'
             )
-        return attrs
+        return author
 
     class Meta:
         fields = ('user', 'author',)
         model = Follow
+
+
+class ValuesSerializer:
+    """Read-only fast path for list endpoints.
+
+    Rows come from ``.values()`` with related fields joined in, so no
+    model instances or related objects are built. ``lookups`` maps the
+    output fields, in output order, to their ``values()`` lookups; a
+    ``represent_<field>`` method converts a value, and the output must
+    stay identical to the serializer the view uses for everything else.
+    """
+    lookups = {}
+
+    def __init__(self, context):
+        self.context = context
+        names = requested_fields(context.get('request'), self.lookups)
+        self.columns = [
+            (name, lookup, getattr(self, f'represent_{name}', None))
+            for name, lookup in self.lookups.items()
+            if names is None or name in names
+        ]
+
+    def values(self, queryset, *extra):
+        lookups = [lookup for _, lookup, _ in self.columns]
+        return queryset.values(*dict.fromkeys([*lookups, *extra]))
+
+    def to_representation(self, row):
+        return {
+            name: row[lookup] if represent is None else represent(row[lookup])
+            for name, lookup, represent in self.columns
+        }
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class PostValuesSerializer(ValuesSerializer):
+    lookups = {
+        'id': 'id',
+        'text': 'text',
+        'author': 'author__username',
+        'pub_date': 'pub_date',
+        'image_variants': 'image',
+    }
+    represent_pub_date = serializers.DateTimeField().to_representation
+    generated = None
+
+    def _image(self, name):
+        field = Post._meta.get_field('image')
+        return field.attr_class(None, field, name)
+
+    def many(self, rows):
+        rows = list(rows)
+        if any(name == 'image_variants' for name, _, _ in self.columns):
+            # One key value store lookup for the whole page or chunk
+            self.generated = variants.generated_many(
+                [self._image(row['image']) for row in rows]
+            )
+        return super().many(rows)
+
+    def represent_image_variants(self, name):
+        return image_variants(
+            self._image(name), self.context.get('request'), self.generated
+        )
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    lookups = {
+        'id': 'id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+        'post': 'post_id',
+        'parent': 'parent_id',
+    }
+    represent_created = serializers.DateTimeField().to_representation
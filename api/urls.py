@@ -1,11 +1,15 @@
-from django.urls import path, include
+from django.db.transaction import non_atomic_requests
+from django.urls import path, include, re_path
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 from rest_framework.routers import DefaultRouter
 
-from .views import CommentViewSet, FollowViewSet, GroupViewSet, PostViewSet
+from .views import (
+    CommentExportView, CommentViewSet, FollowViewSet, GroupViewSet,
+    PostExportView, PostViewSet, TokenRevokeView,
+)
 
 
 v1_router = DefaultRouter()
@@ -22,5 +26,16 @@ v1_router.register(
 urlpatterns = [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/revoke/', TokenRevokeView.as_view(), name='token_revoke'),
+    # Streamed after the view returns, so outside a request transaction
+    re_path(
+        r'^export/posts\.(?P<fmt>ndjson|json)$',
+        non_atomic_requests(PostExportView.as_view()), name='export_posts'
+    ),
+    re_path(
+        r'^export/comments\.(?P<fmt>ndjson|json)$',
+        non_atomic_requests(CommentExportView.as_view()),
+        name='export_comments'
+    ),
     path('', include(v1_router.urls))
 ]
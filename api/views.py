@@ -1,49 +1,465 @@
+import itertools
+import json
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import APIView
 
-from posts.models import Post, Group, Follow
+from posts import bulk, follow_graph, writebehind
+from posts.cache import conditional_response
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import SearchPaginator
+from .authentication import revoke
 from .permissions import IsOwnerOrReadOnly
 from .serializers import (
-    CommentSerializer, FollowSerializer, GroupSerializer, PostSerializer
+    CommentSerializer, CommentValuesSerializer, FollowSerializer,
+    GroupSerializer, PostCommentSerializer, PostSerializer,
+    PostValuesSerializer,
 )
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+class ConditionalGetMixin:
+    """Answer list and detail GETs with ETags from cache generations.
+
+    ``get_etag_scopes`` returns the scopes the response is built from; a
+    client that sends the current ETag gets a 304 before any query or
+    serialization runs.
+    """
+
+    def get_etag_scopes(self):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        etag, not_modified = conditional_response(
+            request, self.get_etag_scopes()
+        )
+        if not_modified is not None:
+            return not_modified
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+
+class ValuesListMixin:
+    """Serve lists with ``values_serializer_class`` rather than models."""
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        serializer = self.values_serializer_class(
+            self.get_serializer_context()
+        )
+        queryset = serializer.values(
+            self.filter_queryset(self.get_queryset()),
+            *(name.lstrip('-') for name in self.cursor_ordering),
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(serializer.many(queryset))
+        return self.get_paginated_response(serializer.many(page))
+
+
+class BulkMixin:
+    """Base of the ``bulk`` and ``bulk-delete`` actions.
+
+    Both take a JSON list of up to ``bulk_max_items`` items and answer
+    200 with one result per item, in request order: the item's status
+    code and its ``data`` or ``errors``. Valid items are written in one
+    transaction whatever happens to the others.
+    """
+    bulk_max_items = 1000
+    bulk_actions = ('bulk_create', 'bulk_destroy')
+
+    def get_permissions(self):
+        if self.action in self.bulk_actions:
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
+    def bulk_items(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError(
+                {'detail': ['Expected a non-empty list of items.']}
+            )
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'detail': [
+                f'At most {self.bulk_max_items} items per request.'
+            ]})
+        return items
+
+    def bulk_validate(self, items, serializer_class):
+        """Validate ``items``, returning results and validated data.
+
+        Valid items have a ``None`` result, to be filled in once they
+        are saved.
+        """
+        results, valid = [], []
+        context = self.get_serializer_context()
+        for item in items:
+            serializer = serializer_class(data=item, context=context)
+            if serializer.is_valid():
+                results.append(None)
+                valid.append(serializer.validated_data)
+            else:
+                results.append({'status': 400, 'errors': serializer.errors})
+        return results, valid
+
+    def bulk_created(self, results, objs, serializer_class):
+        data = iter(serializer_class(
+            objs, many=True, context=self.get_serializer_context()
+        ).data)
+        return Response({'results': [
+            result or {'status': 201, 'data': next(data)}
+            for result in results
+        ]})
+
+    def bulk_ids(self, items):
+        """Integer ids of ``items``; anything else is ``None``."""
+        return [item if type(item) is int else None for item in items]
+
+    def bulk_owned(self, found):
+        """Rows of ``found`` the user may delete."""
+        return [
+            obj for obj in found.values()
+            if obj.author_id == self.request.user.pk
+        ]
+
+    def bulk_deleted(self, items, found):
+        """Results of deleting ``items``, ``found`` mapping ids to rows."""
+        results = []
+        for item, pk in zip(items, self.bulk_ids(items)):
+            obj = found.get(pk)
+            if obj is None:
+                status = 404
+            elif obj.author_id == self.request.user.pk:
+                status = 204
+            else:
+                status = 403
+            results.append({'id': item, 'status': status})
+        return Response({'results': results})
+
+
+class PostViewSet(ConditionalGetMixin, ValuesListMixin, BulkMixin,
+                  viewsets.ModelViewSet):
+    queryset = Post.objects.for_feed()
     serializer_class = PostSerializer
+    values_serializer_class = PostValuesSerializer
     permission_classes = [IsOwnerOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['group', ]
+    cursor_ordering = ('-pub_date', '-id')
+
+    def get_etag_scopes(self):
+        if self.action == 'retrieve':
+            return [f'post:{self.kwargs["pk"]}']
+        return ['global']
+
+    def list(self, request, *args, **kwargs):
+        if 'search' in request.query_params:
+            return self._conditional(self.search_list, request)
+        return super().list(request, *args, **kwargs)
+
+    def search_list(self, request):
+        """Ranked full-text search, paginated with cursors."""
+        page = self.paginator.paginate(
+            SearchPaginator(
+                request.query_params['search'],
+                self.paginator.get_page_size(request),
+                self.filter_queryset(self.get_queryset()),
+            ),
+            request,
+        )
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        results, valid = self.bulk_validate(
+            self.bulk_items(request), PostSerializer
+        )
+        posts = bulk.create_posts(request.user, valid) if valid else []
+        return self.bulk_created(results, posts, PostSerializer)
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_destroy(self, request):
+        items = self.bulk_items(request)
+        posts = {
+            post.pk: post for post in Post.objects.select_related(
+                'author', 'group'
+            ).filter(pk__in=self.bulk_ids(items))
+        }
+        owned = self.bulk_owned(posts)
+        if owned:
+            bulk.delete_posts(owned)
+        return self.bulk_deleted(items, posts)
 
-class CommentViewSet(viewsets.ModelViewSet):
+
+class CommentViewSet(ConditionalGetMixin, ValuesListMixin, BulkMixin,
+                     viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    cursor_ordering = ('created', 'id')
 
     def get_queryset(self):
         post = get_object_or_404(Post, pk=self.kwargs.get('post_id'))
-        return post.comments
+        return post.comments.select_related('author')
+
+    def get_etag_scopes(self):
+        return [f'post:{self.kwargs.get("post_id")}']
 
     def perform_create(self, serializer):
         post = get_object_or_404(Post, pk=self.kwargs.get('post_id'))
         serializer.save(author=self.request.user, post=post)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request, post_id):
+        items = self.bulk_items(request)
+        post = get_object_or_404(
+            Post.objects.select_related('author', 'group'), pk=post_id
+        )
+        results, valid = self.bulk_validate(items, PostCommentSerializer)
+        comments = (
+            bulk.create_comments(request.user, post, valid) if valid else []
+        )
+        return self.bulk_created(results, comments, PostCommentSerializer)
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_destroy(self, request, post_id):
+        items = self.bulk_items(request)
+        post = get_object_or_404(
+            Post.objects.select_related('author', 'group'), pk=post_id
+        )
+        comments = {
+            comment.pk: comment for comment in
+            post.comments.filter(pk__in=self.bulk_ids(items))
+        }
+        owned = self.bulk_owned(comments)
+        if owned:
+            bulk.delete_comments(post, owned)
+        return self.bulk_deleted(items, comments)
+
 
 class GroupViewSet(viewsets.ModelViewSet):
     serializer_class = GroupSerializer
     queryset = Group.objects.all()
+    cursor_ordering = ('id',)
 
 
-class FollowViewSet(viewsets.ModelViewSet):
-    queryset = Follow.objects.all()
+class FollowViewSet(BulkMixin, viewsets.ModelViewSet):
+    queryset = Follow.objects.select_related('user', 'author')
     serializer_class = FollowSerializer
     permission_classes = [IsOwnerOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ['=user__username', '=author__username', ]
+    cursor_ordering = ('-id',)
+    queued = False
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if self.queued:
+            response.status_code = 202
+        return response
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        follow = Follow(
+            user=self.request.user,
+            author=serializer.validated_data['author'],
+        )
+        # A queued follow is answered unsaved, it is applied shortly.
+        self.queued = writebehind.follow(follow.user, follow.author)
+        if self.queued:
+            serializer.instance = follow
+        else:
+            serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """Follow authors given as ``{"author": <username>}`` items."""
+        items = self.bulk_items(request)
+        names = [
+            item.get('author') if isinstance(item, dict) else None
+            for item in items
+        ]
+        names = [name if isinstance(name, str) else None for name in names]
+        authors = {
+            author.username: author for author in
+            User.objects.filter(username__in=[n for n in names if n])
+        }
+        following = follow_graph.followed_among(
+            request.user, [author.pk for author in authors.values()]
+        )
+        followed = {
+            name for name, author in authors.items()
+            if author.pk in following
+        }
+
+        results, new = [], []
+        for name in names:
+            if name is None:
+                error = 'This field is required.'
+            elif name not in authors:
+                error = f'Object with username={name} does not exist.'
+            elif name in followed:
+                error = 'You have already follow this author!'
+            elif authors[name] == request.user:
+                error = 'You cannot follow yourself.'
+            else:
+                followed.add(name)
+                new.append(authors[name])
+                results.append(None)
+                continue
+            results.append({'status': 400, 'errors': {'author': [error]}})
+        follows = bulk.create_follows(request.user, new) if new else []
+        return self.bulk_created(results, follows, FollowSerializer)
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_destroy(self, request):
+        """Unfollow authors given by username."""
+        items = self.bulk_items(request)
+        authors = list(User.objects.filter(
+            following__user=request.user,
+            username__in=[item for item in items if isinstance(item, str)],
+        ))
+        if authors:
+            bulk.delete_follows(request.user, authors)
+        followed = {author.username for author in authors}
+        return Response({'results': [
+            {'author': item, 'status': 204 if item in followed else 404}
+            for item in items
+        ]})
+
+
+class ExportView(APIView):
+    """Stream every matching row as NDJSON or as one JSON array.
+
+    Rows are read with ``iterator()`` in chunks of ``chunk_size``, on a
+    server-side cursor where the database has them, and written as they
+    are read, so memory stays flat however many rows go out. Records
+    have the shape of the list endpoint and come in id order; ``after``
+    resumes an interrupted export after the id of the last record
+    received. ``filters`` maps query parameters to lookups.
+    """
+    values_serializer_class = None
+    queryset = None
+    date_field = None
+    filters = {}
+    chunk_size = 500
+
+    def perform_content_negotiation(self, request, force=False):
+        # The stream is rendered here, whatever the client accepts.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get_queryset(self):
+        params = self.request.query_params
+        lookups = {
+            lookup: params[name]
+            for name, lookup in self.filters.items() if name in params
+        }
+        for name, lookup in (('since', 'gte'), ('until', 'lt'),):
+            if name in params:
+                try:
+                    value = parse_datetime(params[name])
+                except ValueError:
+                    value = None
+                if value is None:
+                    raise ValidationError(
+                        {name: ['Expected an ISO 8601 date and time.']}
+                    )
+                lookups[f'{self.date_field}__{lookup}'] = value
+        if 'after' in params:
+            lookups['id__gt'] = params['after']
+        try:
+            return self.queryset.filter(**lookups).order_by('id')
+        except ValueError as error:
+            raise ValidationError({'detail': [str(error)]})
+
+    def get(self, request, fmt):
+        serializer = self.values_serializer_class(
+            {'request': request, 'view': self}
+        )
+        rows = serializer.values(self.get_queryset(), 'id').iterator(
+            chunk_size=self.chunk_size
+        )
+        if fmt == 'ndjson':
+            return StreamingHttpResponse(
+                self.render_ndjson(serializer, rows),
+                content_type='application/x-ndjson',
+            )
+        return StreamingHttpResponse(
+            self.render_json(serializer, rows),
+            content_type='application/json',
+        )
+
+    def records(self, serializer, rows):
+        """Yield the encoded records of ``rows`` a chunk at a time."""
+        while True:
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield [
+                # Escaped like JSONRenderer does, for JSONP and <script>.
+                json.dumps(
+                    record, cls=JSONEncoder, ensure_ascii=False,
+                    separators=(',', ':'),
+                ).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+                for record in serializer.many(chunk)
+            ]
+
+    def render_ndjson(self, serializer, rows):
+        for records in self.records(serializer, rows):
+            yield ''.join(f'{record}\n' for record in records).encode()
+
+    def render_json(self, serializer, rows):
+        separator = '['
+        for records in self.records(serializer, rows):
+            yield (separator + ','.join(records)).encode()
+            separator = ','
+        yield b'[]' if separator == '[' else b']'
+
+
+class PostExportView(ExportView):
+    values_serializer_class = PostValuesSerializer
+    queryset = Post.objects.all()
+    date_field = 'pub_date'
+    filters = {'author': 'author__username', 'group': 'group'}
+
+
+class CommentExportView(ExportView):
+    values_serializer_class = CommentValuesSerializer
+    queryset = Comment.objects.all()
+    date_field = 'created'
+    filters = {
+        'author': 'author__username', 'post': 'post', 'group': 'post__group',
+    }
+
+
+class TokenRevokeView(APIView):
+    """Revoke the access token of the request, e.g. on logout."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        revoke(request.auth)
+        return Response(status=204)
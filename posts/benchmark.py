@@ -0,0 +1,164 @@
+"""Latency and query counts of the site and API endpoints.
+
+Every endpoint is requested through the test client against whatever
+data is in the database, usually made by ``seed_yatube``. The subjects
+are the worst cases of a power-law graph: the most followed author, the
+user following the most authors, the most commented post and the
+largest group. Unless ``warm`` is set the cache is cleared before each
+request, so page caching does not hide the database work; in
+``test_database`` that is a private in-process cache, never the one the
+site shares.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import sentry_sdk
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .instrumentation import percentile
+from .models import Group, Post
+from users.models import Profile
+
+ENDPOINTS = {
+    'index': lambda s: reverse('index'),
+    'follow_index': lambda s: reverse('follow_index'),
+    'profile': lambda s: reverse('profile', args=[s['author'].username]),
+    'post_view': lambda s: reverse(
+        'post', args=[s['post'].author.username, s['post'].pk]
+    ),
+    'group_posts': lambda s: reverse('group_posts', args=[s['group'].slug]),
+    'search': lambda s: reverse('search') + f'?q={s["query"]}',
+    'api_posts': lambda s: '/api/v1/posts/',
+    'api_post': lambda s: f'/api/v1/posts/{s["post"].pk}/',
+    'api_comments': lambda s: f'/api/v1/posts/{s["post"].pk}/comments/',
+    'api_groups': lambda s: '/api/v1/group/',
+    'api_follow': lambda s: '/api/v1/follow/',
+}
+
+
+@contextmanager
+def private_cache(name='benchmark'):
+    """Swap the caches for an in-process one nobody else uses.
+
+    Clearing the configured cache would empty the page caches, sessions
+    and tokens of every process sharing it. Each ``name`` is a separate
+    cache.
+    """
+    with override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': name,
+    }}):
+        yield
+
+
+@contextmanager
+def test_database():
+    """Work in a throwaway test database and cache, as the test runner does."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True
+    )
+    try:
+        with private_cache():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def subjects(query='city'):
+    """Pick the heaviest objects of the dataset to request."""
+    return {
+        'author': Profile.objects.select_related('user').order_by(
+            '-followers_count', 'pk'
+        ).first().user,
+        'reader': Profile.objects.select_related('user').order_by(
+            '-following_count', 'pk'
+        ).first().user,
+        'post': Post.objects.select_related('author').order_by(
+            '-comments_count', 'pk'
+        ).first(),
+        'group': Group.objects.annotate(size=Count('groups')).order_by(
+            '-size', 'pk'
+        ).first(),
+        'query': query,
+    }
+
+
+def get(client, url):
+    """Request ``url`` in a Sentry transaction, as the WSGI handler would.
+
+    The test client bypasses the handler Sentry wraps, so without this
+    tracing would cost nothing here.
+    """
+    path = urlsplit(url).path
+    with sentry_sdk.start_transaction(
+        op='http.server', name=path,
+        custom_sampling_context={'wsgi_environ': {'PATH_INFO': path}},
+    ) as transaction:
+        response = client.get(url)
+        transaction.set_http_status(response.status_code)
+    return response
+
+
+def measure(client, url, requests, warm=False):
+    timings, queries = [], []
+    for _ in range(requests):
+        if not warm:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = get(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise AssertionError(f'GET {url} returned {response.status_code}')
+        queries.append(len(captured))
+    return {
+        'url': url,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'queries': max(queries),
+    }
+
+
+def run(requests=20, warm=False, endpoints=None):
+    """Return ``{endpoint: stats}`` for the current database.
+
+    Requests are made as the user following the most authors, so feed
+    endpoints have the most work to do.
+    """
+    chosen = subjects()
+    # The session serves the site, the token the API.
+    client = Client(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(chosen["reader"])}'
+    )
+    client.force_login(chosen['reader'])
+    return {
+        name: measure(client, url(chosen), requests, warm)
+        for name, url in ENDPOINTS.items()
+        if endpoints is None or name in endpoints
+    }
+
+
+def compare(baseline, current):
+    """Yield ``(size, endpoint, before, after)`` p50 and p95 pairs.
+
+    Runs are matched by position, endpoints by name.
+    """
+    for before, after in zip(baseline['runs'], current['runs']):
+        for name, stats in after['endpoints'].items():
+            old = before['endpoints'].get(name)
+            if old is not None:
+                yield after['size'], name, old, stats
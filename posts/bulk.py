@@ -0,0 +1,143 @@
+"""Batched writes for the bulk API and the write-behind queue.
+
+Rows are inserted and deleted a batch at a time in one transaction, and
+what ``posts.signals`` does row by row (counters, timelines, cache
+generations and the search index) is done once for the whole batch.
+Callers validate and authorize the rows beforehand.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import Profile
+from . import feeds, follow_graph, recommendations, search, signals
+from .cache import bump, post_scopes
+from .models import Comment, Follow, Post
+
+
+def _insert(model, objs):
+    """Insert ``objs`` without signals and set their primary keys.
+
+    Unlike ``dumps.insert`` this leaves ``auto_now_add`` alone, so dates
+    are those of the insert; the callers set them to the same instant
+    for the backends that insert row by row.
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        model._default_manager.bulk_create(objs)
+    else:
+        for obj in objs:
+            obj.save_base(raw=True, force_insert=True)
+
+
+def _scopes(posts):
+    return {scope for post in posts for scope in post_scopes(post)}
+
+
+@transaction.atomic
+def create_posts(author, items):
+    """Create posts of ``author`` from dicts of field values."""
+    now = timezone.now()
+    posts = [Post(author=author, pub_date=now, **item) for item in items]
+    _insert(Post, posts)
+    Profile.objects.filter(user=author).update(
+        posts_count=F('posts_count') + len(posts)
+    )
+    feeds.fan_out_many(author, posts)
+    bump(*_scopes(posts))
+    search.update_many([post.pk for post in posts])
+    return posts
+
+
+@transaction.atomic
+def delete_posts(posts):
+    with signals.suspended():
+        Post.objects.filter(pk__in=[post.pk for post in posts]).delete()
+    for author_id, count in Counter(p.author_id for p in posts).items():
+        Profile.objects.filter(user_id=author_id).update(
+            posts_count=F('posts_count') - count
+        )
+    bump(*_scopes(posts))
+    backend = search.get_backend()
+    for post in posts:
+        backend.remove(post.pk)
+
+
+def _touch_post(post, delta):
+    Post.objects.filter(pk=post.pk).update(
+        comments_count=F('comments_count') + delta,
+        version=F('version') + 1,
+    )
+
+
+@transaction.atomic
+def create_comments(author, post, items):
+    return add_comments(post, [
+        Comment(author=author, **item) for item in items
+    ])
+
+
+@transaction.atomic
+def add_comments(post, comments):
+    """Insert the unsaved ``comments`` of ``post``, whoever wrote them."""
+    now = timezone.now()
+    for comment in comments:
+        comment.post, comment.created = post, now
+    _insert(Comment, comments)
+    _touch_post(post, len(comments))
+    bump(*post_scopes(post))
+    search.add_comments(post.pk, [comment.text for comment in comments])
+    return comments
+
+
+@transaction.atomic
+def delete_comments(post, comments):
+    with signals.suspended():
+        _, deleted = Comment.objects.filter(
+            pk__in=[c.pk for c in comments]
+        ).delete()
+    _touch_post(post, -deleted.get(Comment._meta.label, 0))
+    bump(*post_scopes(post))
+    search.update(post.pk)
+
+
+def _follow_scopes(user, authors):
+    return {f'author:{user.username}'} | {
+        f'author:{author.username}' for author in authors
+    }
+
+
+@transaction.atomic
+def create_follows(user, authors):
+    follows = [Follow(user=user, author=author) for author in authors]
+    _insert(Follow, follows)
+    Profile.objects.filter(user_id__in=[a.pk for a in authors]).update(
+        followers_count=F('followers_count') + 1
+    )
+    Profile.objects.filter(user=user).update(
+        following_count=F('following_count') + len(authors)
+    )
+    follow_graph.changed([(user.pk, author.pk) for author in authors])
+    recommendations.mark_dirty([user.pk])
+    for author in authors:
+        feeds.backfill(user, author)
+    bump(*_follow_scopes(user, authors))
+    return follows
+
+
+@transaction.atomic
+def delete_follows(user, authors):
+    with signals.suspended():
+        Follow.objects.filter(user=user, author__in=authors).delete()
+    Profile.objects.filter(user_id__in=[a.pk for a in authors]).update(
+        followers_count=F('followers_count') - 1
+    )
+    Profile.objects.filter(user=user).update(
+        following_count=F('following_count') - len(authors)
+    )
+    follow_graph.changed([(user.pk, author.pk) for author in authors])
+    recommendations.mark_dirty([user.pk])
+    for author in authors:
+        feeds.prune(user, author)
+    bump(*_follow_scopes(user, authors))
@@ -0,0 +1,163 @@
+"""Generation counters for cache invalidation.
+
+Cached pages and fragments put the current generation of their scopes
+into their keys. A write bumps the generations of the scopes it touches,
+so every entry built from the old data becomes unreachable at once and
+simply expires: invalidation is O(1) and never scans keys. Bumps wait
+for the transaction of the write to commit; a page read before that is
+stored under the old generation, not the new one.
+
+Scopes are ``global`` (the index feed), ``groups`` (group titles shown
+on every card), ``group:<slug>``, ``author:<username>``, ``post:<id>``,
+and ``following:<user id>`` and ``followers:<user id>`` (the follow
+graph, see ``posts.follow_graph``).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+def _key(scope):
+    return f'generation:{scope}'
+
+
+def _seed():
+    # Seed from the clock so that an evicted counter never goes back to
+    # a value that older cached entries were keyed with.
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    keys = [_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _seed(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def generation(scope):
+    return generations(scope)[0]
+
+
+def get_versioned(key, scope):
+    """Return ``(value, generation)`` in one cache round trip.
+
+    ``value`` is what ``set_versioned`` stored under ``key``, or ``None``
+    when it was stored at an older generation of ``scope``.
+    """
+    values = cache.get_many([key, _key(scope)])
+    if _key(scope) not in values:
+        return None, generation(scope)
+    current = values[_key(scope)]
+    stored = values.get(key)
+    if stored is None or stored[0] != current:
+        return None, current
+    return stored[1], current
+
+
+def set_versioned(key, value, generation, timeout=None):
+    """Store ``value`` as read at ``generation``.
+
+    It is kept until it is replaced, or for ``timeout`` seconds.
+    """
+    cache.set(key, (generation, value), timeout)
+
+
+def bump(*scopes):
+    """Bump the generations of ``scopes`` once the transaction commits."""
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.add(_key(scope), _seed(), None)
+
+
+def post_scopes(post):
+    """Scopes whose pages show the post card."""
+    scopes = ['global', f'author:{post.author.username}', f'post:{post.pk}']
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+def scope_etag(request, versions):
+    """ETag of a response built from scopes at the given generations."""
+    parts = [
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        request.user.pk,
+        # Authenticated pages embed a token derived from the CSRF cookie.
+        request.META.get('CSRF_COOKIE', ''),
+        *versions,
+    ]
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def conditional_response(request, scopes):
+    """Return ``(etag, response)``.
+
+    ``response`` is a 304 when the client already holds the current
+    version of a page built from ``scopes``, otherwise ``None``.
+    """
+    etag = scope_etag(request, generations(*scopes))
+    return etag, get_conditional_response(request, etag=etag)
+
+
+def scoped_page(scopes):
+    """Validate and cache a page built from generation-counted scopes.
+
+    ``scopes`` is called with the view arguments and returns the scopes
+    the page is built from. Responses carry an ETag derived from their
+    generations, so a repeated GET gets a 304 without rendering. Pages
+    for anonymous users are also cached whole, keyed on the same
+    generations.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            versions = generations(*scopes(request, *args, **kwargs))
+            etag = scope_etag(request, versions)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            if request.user.is_authenticated:
+                response = view(request, *args, **kwargs)
+            else:
+                response = _anonymous_response(
+                    view, versions, request, *args, **kwargs
+                )
+            if response.status_code == 200:
+                # Rendering may have issued the CSRF cookie the client will
+                # send back, so the tag is computed again.
+                response['ETag'] = scope_etag(request, versions)
+            return response
+        return wrapper
+    return decorator
+
+
+def _anonymous_response(view, versions, request, *args, **kwargs):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f'page:{view.__name__}:{path}:{".".join(map(str, versions))}'
+    response = cache.get(key)
+    if response is None:
+        response = view(request, *args, **kwargs)
+        if (response.status_code == 200 and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED')):
+            cache.set(key, response, settings.ANONYMOUS_PAGE_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,277 @@
+"""Streaming export and import of users, groups, posts and follows.
+
+Dumps are NDJSON: one ``{"model", "pk", "fields"}`` record per line, the
+same record shape as ``dumpdata``, so ``import_yatube`` also reads JSON
+arrays such as ``dump_yatube.json``. Both directions work in bounded
+memory: rows are streamed from the database in chunks and records are
+parsed incrementally from the file.
+
+The import remaps primary keys. Users and groups that already exist are
+matched by username and slug, follows by their pair. Every created row
+is recorded in ``ImportedRow`` in the same transaction as its batch, so
+an interrupted import can simply be run again. Rows are inserted without
+signals; counters, timelines and the search index are rebuilt at the end.
+"""
+import json
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.db import connection, models, transaction
+
+from . import feeds, search
+from .counters import repair_counters
+from .models import Comment, Follow, Group, ImportedRow, Post, User
+
+Spec = namedtuple('Spec', 'model fields natural_key')
+
+# In dependency order. Foreign keys are remapped through the specs of
+# the models they point to.
+SPECS = [
+    Spec(User, (
+        'password', 'last_login', 'is_superuser', 'username', 'first_name',
+        'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+    ), ('username',)),
+    Spec(Group, ('title', 'slug', 'description'), ('slug',)),
+    Spec(Post, ('text', 'pub_date', 'author', 'group', 'image'), None),
+    Spec(Comment, ('post', 'author', 'text', 'created', 'parent'), None),
+    Spec(Follow, ('user', 'author'), ('user', 'author')),
+]
+# Models of a pass only point to models imported by earlier passes, and
+# replies to comments earlier in the dump.
+PASSES = [SPECS[:2], SPECS[2:3], SPECS[3:]]
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def _default(value):
+    # isoformat() keeps microseconds, which DjangoJSONEncoder drops.
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def export(stream, chunk_size=2000):
+    """Write every exported row to ``stream`` as NDJSON.
+
+    Returns ``{label: rows}``.
+    """
+    written = Counter()
+    for spec in SPECS:
+        rows = spec.model._default_manager.order_by('pk').values_list(
+            'pk', *spec.fields
+        )
+        for pk, *values in rows.iterator(chunk_size=chunk_size):
+            stream.write(json.dumps({
+                'model': label(spec.model),
+                'pk': pk,
+                'fields': dict(zip(spec.fields, values)),
+            }, default=_default) + '\n')
+            written[label(spec.model)] += 1
+    return written
+
+
+def read_records(stream, chunk_size=64 * 1024):
+    """Yield the records of an NDJSON stream or a JSON array, incrementally."""
+    decoder = json.JSONDecoder()
+    buffer, pos = '', 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+            pos += 1
+        if pos < len(buffer):
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The record continues in the next chunk.
+                pass
+            else:
+                yield record
+                continue
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            if buffer[pos:].strip():
+                raise ValueError(f'Truncated record: {buffer[pos:pos + 80]}')
+            return
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+@contextmanager
+def keeping_dates():
+    """Let ``bulk_create`` keep dumped dates instead of ``auto_now_add``."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def insert(model, objs):
+    """Insert ``objs`` without signals and set their primary keys."""
+    if connection.features.can_return_ids_from_bulk_insert:
+        with keeping_dates():
+            model._default_manager.bulk_create(objs)
+    else:
+        # Without RETURNING the new keys are only known row by row. A
+        # raw save keeps the given dates and skips the receivers, like
+        # loaddata.
+        for obj in objs:
+            obj.save_base(raw=True, force_insert=True)
+
+
+def rebuild_derived():
+    """Recompute what signals maintain for rows inserted without them."""
+    repair_counters()
+    feeds.rebuild_timelines()
+    search.rebuild()
+
+
+class Importer:
+    """Import dump records in batches of ``batch_size``.
+
+    ``source`` names the dump, so that the primary keys of different
+    dumps are remapped independently.
+    """
+
+    def __init__(self, source, batch_size=1000):
+        self.source = source
+        self.batch_size = batch_size
+        self.stats = {label(spec.model): Counter() for spec in SPECS}
+        self.foreign_keys = {
+            spec.model: {
+                name: label(spec.model._meta.get_field(name).related_model)
+                for name in spec.fields
+                if spec.model._meta.get_field(name).is_relation
+            }
+            for spec in SPECS
+        }
+
+    def run(self, open_stream, repair=True):
+        """Import the dump; ``open_stream`` opens it once per pass."""
+        for specs in PASSES:
+            by_label = {label(spec.model): spec for spec in specs}
+            batches = {name: [] for name in by_label}
+            with open_stream() as stream:
+                for record in read_records(stream):
+                    batch = batches.get(record.get('model'))
+                    if batch is None:
+                        continue
+                    batch.append(record)
+                    if len(batch) >= self.batch_size:
+                        self.import_batch(by_label[record['model']], batch)
+                        batch.clear()
+            for name, batch in batches.items():
+                if batch:
+                    self.import_batch(by_label[name], batch)
+        if repair:
+            rebuild_derived()
+        return self.stats
+
+    def targets(self, model_label, source_pks):
+        return dict(ImportedRow.objects.filter(
+            source=self.source, model=model_label, source_pk__in=source_pks,
+        ).values_list('source_pk', 'target_pk'))
+
+    def import_batch(self, spec, records):
+        model_label = label(spec.model)
+        stats = self.stats[model_label]
+        done = self.targets(model_label, [r['pk'] for r in records])
+        records = [r for r in records if r['pk'] not in done]
+        stats['resumed'] += len(done)
+
+        foreign_keys = self.foreign_keys[spec.model]
+        # Replies to comments of the same batch wait for their targets.
+        batch_pks = {r['pk'] for r in records}
+        later = [r for r in records if any(
+            r['fields'].get(name) in batch_pks
+            for name, related in foreign_keys.items() if related == model_label
+        )]
+        if later and len(later) < len(records):
+            later_pks = {r['pk'] for r in later}
+            self.import_batch(
+                spec, [r for r in records if r['pk'] not in later_pks]
+            )
+            self.import_batch(spec, later)
+            return
+        maps = {
+            name: self.targets(related, [
+                r['fields'].get(name) for r in records
+                if r['fields'].get(name) is not None
+            ])
+            for name, related in foreign_keys.items()
+        }
+
+        objs = []
+        for record in records:
+            obj = self.build(spec, record['fields'], maps)
+            if obj is None:
+                stats['orphaned'] += 1
+            else:
+                objs.append((record['pk'], obj))
+
+        # Targets are pks of matched rows or objects created below.
+        existing = self.existing(spec, [obj for _, obj in objs])
+        created, targets = [], []
+        for source_pk, obj in objs:
+            key = self.natural_key(spec, obj)
+            if key is not None and key in existing:
+                stats['matched'] += 1
+                targets.append((source_pk, existing[key]))
+                continue
+            created.append(obj)
+            targets.append((source_pk, obj))
+            if key is not None:
+                existing[key] = obj
+
+        with transaction.atomic():
+            insert(spec.model, created)
+            ImportedRow.objects.bulk_create([
+                ImportedRow(
+                    source=self.source, model=model_label,
+                    source_pk=source_pk,
+                    target_pk=(target.pk if isinstance(target, models.Model)
+                               else target),
+                )
+                for source_pk, target in targets
+            ])
+        stats['created'] += len(created)
+
+    def build(self, spec, fields, maps):
+        """Instantiate a row with remapped keys, ``None`` if one is missing."""
+        obj = spec.model()
+        for name in spec.fields:
+            if name not in fields:
+                continue
+            field = spec.model._meta.get_field(name)
+            value = fields[name]
+            if name in maps and value is not None:
+                value = maps[name].get(value)
+                if value is None:
+                    return None
+            setattr(obj, field.attname, field.to_python(value))
+        return obj
+
+    def natural_key(self, spec, obj):
+        if spec.natural_key:
+            return tuple(
+                getattr(obj, spec.model._meta.get_field(name).attname)
+                for name in spec.natural_key
+            )
+
+    def existing(self, spec, objs):
+        """Map natural keys of ``objs`` already in the database to pks."""
+        if not spec.natural_key or not objs:
+            return {}
+        attnames = [spec.model._meta.get_field(name).attname
+                    for name in spec.natural_key]
+        keys = {self.natural_key(spec, obj) for obj in objs}
+        rows = spec.model._default_manager.filter(**{
+            f'{attnames[0]}__in': {key[0] for key in keys},
+        }).values_list(*attnames, 'pk')
+        return {
+            tuple(key): pk for *key, pk in rows if tuple(key) in keys
+        }
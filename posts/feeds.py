@@ -0,0 +1,131 @@
+"""Materialized follow feeds.
+
+New posts are pushed into a ``FeedEntry`` row per follower (fan-out on
+write), so ``follow_index`` reads one user's timeline instead of joining
+``Follow`` against every post. Authors with more than
+``FEED_FANOUT_MAX_FOLLOWERS`` followers are not fanned out; their posts
+are merged into the feed at read time to keep the write cost bounded.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import F
+
+from users.models import Profile
+from . import follow_graph
+from .models import FeedEntry, Follow, Post
+
+# Ordering of the querysets returned by ``follow_feed``.
+FOLLOW_FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def is_popular(author):
+    return Profile.objects.filter(
+        user_id=author.id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def fan_out(post):
+    """Deliver a new post to the timelines of the author's followers."""
+    fan_out_many(post.author, [post])
+
+
+def fan_out_many(author, posts):
+    """Deliver new posts of ``author``, loading the followers once."""
+    if is_popular(author):
+        return
+    followers = follow_graph.followers(author)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post=post, author_id=author.id,
+                      pub_date=post.pub_date)
+            for post in posts
+            for user_id in followers
+        ],
+        batch_size=500, ignore_conflicts=True,
+    )
+
+
+def backfill(user, author):
+    """Copy the latest posts of a newly followed author into a timeline."""
+    if not is_popular(author):
+        _deliver_recent(author.id, [user.id])
+
+
+def prune(user, author):
+    """Drop an unfollowed author's posts from a timeline."""
+    FeedEntry.objects.filter(user=user, author=author).delete()
+    followers = Profile.objects.filter(user_id=author.id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if followers == settings.FEED_FANOUT_MAX_FOLLOWERS:
+        # The author has just stopped being merged at read time, so their
+        # recent posts are materialized for the remaining followers.
+        user_ids = Follow.objects.filter(
+            author=author
+        ).values_list('user_id', flat=True)
+        _deliver_recent(author.id, list(user_ids))
+
+
+def _deliver_recent(author_id, user_ids, apps=global_apps):
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post_id=post_id, author_id=author_id,
+                      pub_date=pub_date)
+            for post_id, pub_date in posts
+            for user_id in user_ids
+        ],
+        batch_size=500, ignore_conflicts=True,
+    )
+
+
+def rebuild_timelines(apps=global_apps):
+    """Materialize every timeline from ``Follow``, e.g. after an import.
+
+    Migrations pass their ``apps`` to run it on the historical models.
+    """
+    Profile = apps.get_model('users', 'Profile')
+    Follow = apps.get_model('posts', 'Follow')
+    popular = set(Profile.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('user_id', flat=True))
+    follows = Follow.objects.exclude(author_id__in=popular).order_by(
+        'author_id'
+    ).values_list('author_id', 'user_id')
+    for author_id, rows in groupby(follows.iterator(), key=itemgetter(0)):
+        user_ids = [user_id for _, user_id in rows]
+        # Bounds the entries built at once to a few backfills.
+        for start in range(0, len(user_ids), 20):
+            _deliver_recent(author_id, user_ids[start:start + 20], apps)
+
+
+def follow_feed(user):
+    """Return the querysets the user's follow feed is merged from.
+
+    The timeline is read from the ``FeedEntry`` index, and the posts of
+    followed popular authors from the author index. Both are ordered by
+    ``FOLLOW_FEED_ORDERING``; ``CursorPaginator`` pages and merges them.
+    """
+    feed = Post.objects.for_feed()
+    timeline = feed.filter(feed_entries__user=user).annotate(
+        feed_date=F('feed_entries__pub_date'),
+        feed_post=F('feed_entries__post'),
+    )
+    popular = Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=(
+            settings.FEED_FANOUT_MAX_FOLLOWERS
+        ),
+    ).values('author_id')
+    merged = feed.filter(author_id__in=popular).annotate(
+        feed_date=F('pub_date'), feed_post=F('id'),
+    )
+    return [timeline, merged]
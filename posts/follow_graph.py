@@ -0,0 +1,76 @@
+"""Cached adjacency sets of the follow graph.
+
+Every user's followed authors and followers are kept in the cache as
+frozensets of user ids, so "does X follow these authors" is answered
+from one cache round trip instead of a ``Follow`` query per author.
+
+A set is stored with the generation of its scope (``following:<id>``
+or ``followers:<id>``) it was read at. Follow writes bump the
+generations; a read fetches the set and the current generation in one
+round trip and reloads the set from the database when they disagree. A
+reload racing a write keeps the old generation, so it cannot hide the
+write.
+
+Follows still in the write-behind queue are merged into the sets their
+user reads, see ``posts.writebehind``.
+"""
+from . import writebehind
+from .cache import bump, get_versioned, set_versioned
+from .models import Follow
+
+
+def following_scope(user_id):
+    return f'following:{user_id}'
+
+
+def followers_scope(user_id):
+    return f'followers:{user_id}'
+
+
+def _load(scope, user_id, column, target):
+    key = f'follow_graph:{scope}'
+    ids, generation = get_versioned(key, scope)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(
+            **{column: user_id}
+        ).values_list(target, flat=True))
+        set_versioned(key, ids, generation)
+    return ids
+
+
+def following(user):
+    """Ids of the authors ``user`` follows."""
+    if not user.is_authenticated:
+        return frozenset()
+    ids = _load(following_scope(user.pk), user.pk, 'user_id', 'author_id')
+    for op in writebehind.pending(user):
+        if op['op'] == 'follow':
+            ids = ids | {op['author']}
+        elif op['op'] == 'unfollow':
+            ids = ids - {op['author']}
+    return ids
+
+
+def followers(author):
+    """Ids of the users following ``author``."""
+    return _load(
+        followers_scope(author.pk), author.pk, 'author_id', 'user_id'
+    )
+
+
+def followed_among(user, author_ids):
+    """The ids of ``author_ids`` that ``user`` follows."""
+    return following(user) & set(author_ids)
+
+
+def is_following(user, author):
+    return author.pk in following(user)
+
+
+def changed(follows):
+    """Invalidate the sets touched by the ``(user_id, author_id)`` pairs."""
+    bump(*{
+        scope
+        for user_id, author_id in follows
+        for scope in (following_scope(user_id), followers_scope(author_id))
+    })
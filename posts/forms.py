@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+
 from .models import Post, Comment
 
 
@@ -7,6 +9,30 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image',)
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # ImageField has only read the header of a new upload, so the
+        # pixel count is checked before anything decodes the image.
+        opened = getattr(image, 'image', None)
+        if opened is not None:
+            width, height = opened.size
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                raise forms.ValidationError(
+                    f'Images must have at most '
+                    f'{settings.POST_IMAGE_MAX_PIXELS} pixels.'
+                )
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        error = getattr(self.files.get('image'), 'upload_error', None)
+        if error:
+            # The rest of the upload was dropped, so this replaces what
+            # ImageField made of the truncated file.
+            self._errors.pop('image', None)
+            self.add_error('image', error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
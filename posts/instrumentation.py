@@ -0,0 +1,257 @@
+"""Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` measures, for every request, the number of
+database queries and the time spent in them, cache hits and misses,
+template rendering time and total latency. They are returned in a
+``Server-Timing`` header when ``SERVER_TIMING`` is set, logged at debug
+level and aggregated in process per URL name; staff can read the
+aggregates at ``/admin/instrumentation/``.
+
+``QUERY_BUDGETS`` maps URL names to the most queries their views may
+run. A view over budget is logged as a warning, or raises
+``QueryBudgetExceeded`` when ``QUERY_BUDGET_RAISE`` is set, as it is in
+the tests.
+
+Queries are counted with database execute wrappers, so they are seen
+without ``DEBUG``. Caches and templates have no such hooks: the cache
+objects of the request thread and the template backend are wrapped once
+and report to the measurement of the current thread, if any.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.db import connections
+from django.http import JsonResponse
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_MISSING = object()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+class Measurement:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+def _current():
+    return getattr(_local, 'measurement', None)
+
+
+def _instrument_cache(cache):
+    if getattr(cache, '_instrumented', False):
+        return
+    get, get_many = cache.get, cache.get_many
+
+    @wraps(get)
+    def instrumented_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        measurement = _current()
+        if measurement is not None:
+            if value is _MISSING:
+                measurement.cache_misses += 1
+            else:
+                measurement.cache_hits += 1
+        return default if value is _MISSING else value
+
+    @wraps(get_many)
+    def instrumented_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version=version)
+        measurement = _current()
+        if measurement is not None:
+            measurement.cache_hits += len(values)
+            measurement.cache_misses += len(keys) - len(values)
+        return values
+
+    cache.get, cache.get_many = instrumented_get, instrumented_get_many
+    cache._instrumented = True
+
+
+def _instrument_templates():
+    if getattr(Template.render, '_instrumented', False):
+        return
+    render = Template.render
+
+    @wraps(render)
+    def instrumented_render(self, *args, **kwargs):
+        measurement = _current()
+        if measurement is None:
+            return render(self, *args, **kwargs)
+        # Templates rendered while rendering one are already timed.
+        measurement.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            measurement.template_depth -= 1
+            if not measurement.template_depth:
+                measurement.template_time += time.perf_counter() - started
+
+    instrumented_render._instrumented = True
+    Template.render = instrumented_render
+
+
+class Stats:
+    """Aggregated measurements per URL name.
+
+    Latencies are kept for the last ``window`` requests of each URL name.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.latencies = defaultdict(lambda: deque(maxlen=self.window))
+            self.totals = defaultdict(lambda: defaultdict(float))
+
+    def record(self, name, measurement, over_budget):
+        with self._lock:
+            self.latencies[name].append(measurement.total_time)
+            totals = self.totals[name]
+            totals['requests'] += 1
+            totals['queries'] += measurement.queries
+            totals['queries_max'] = max(
+                totals['queries_max'], measurement.queries
+            )
+            totals['db_time'] += measurement.db_time
+            totals['cache_hits'] += measurement.cache_hits
+            totals['cache_misses'] += measurement.cache_misses
+            totals['template_time'] += measurement.template_time
+            totals['over_budget'] += over_budget
+
+    def summary(self):
+        with self._lock:
+            summary = {}
+            for name, totals in self.totals.items():
+                latencies = self.latencies[name]
+                requests = totals['requests']
+                summary[name] = {
+                    'requests': int(requests),
+                    'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                    'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                    'queries_mean': round(totals['queries'] / requests, 2),
+                    'queries_max': int(totals['queries_max']),
+                    'db_ms_mean': round(
+                        totals['db_time'] / requests * 1000, 2
+                    ),
+                    'template_ms_mean': round(
+                        totals['template_time'] / requests * 1000, 2
+                    ),
+                    'cache_hits': int(totals['cache_hits']),
+                    'cache_misses': int(totals['cache_misses']),
+                    'over_budget': int(totals['over_budget']),
+                }
+            return summary
+
+
+stats = Stats()
+
+
+def url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return '<unresolved>'
+    return match.view_name
+
+
+class InstrumentationMiddleware:
+    """Measure every request; goes first in ``MIDDLEWARE``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        for cache in caches.all():
+            _instrument_cache(cache)
+        measurement = _local.measurement = Measurement()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(measurement)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.measurement = None
+        measurement.total_time = time.perf_counter() - started
+
+        name = url_name(request)
+        budget = settings.QUERY_BUDGETS.get(name)
+        over_budget = budget is not None and measurement.queries > budget
+        stats.record(name, measurement, over_budget)
+        logger.debug(
+            '%s %s %s: %d queries in %.1fms, %d cache hits, %d misses, '
+            'templates %.1fms, total %.1fms',
+            request.method, request.path, name, measurement.queries,
+            measurement.db_time * 1000, measurement.cache_hits,
+            measurement.cache_misses, measurement.template_time * 1000,
+            measurement.total_time * 1000,
+        )
+        if over_budget:
+            message = (
+                f'{name} ran {measurement.queries} queries, '
+                f'the budget is {budget}'
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = measurement.server_timing()
+        return response
+
+
+@staff_member_required
+def stats_view(request):
+    """Aggregated measurements since the process started or was reset."""
+    if request.method == 'POST':
+        stats.clear()
+    return JsonResponse(stats.summary())
@@ -0,0 +1,38 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import writebehind
+
+
+class Command(BaseCommand):
+    help = 'Apply comments and follows queued on the Redis write-behind queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drain', action='store_true',
+            help='Apply what is queued and exit instead of waiting for more',
+        )
+
+    def handle(self, *args, drain, **options):
+        if settings.WRITE_BEHIND != 'redis':
+            raise CommandError("WRITE_BEHIND is not 'redis'")
+        queue = writebehind.get_queue()
+        if drain:
+            queue.flush()
+            return
+
+        stopping = []
+
+        def stop(signum, frame):
+            # The batch being applied is finished first.
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        while not stopping:
+            ops = queue.pop(timeout=1)
+            if ops:
+                writebehind.apply(ops)
+                self.stdout.write(f'Applied {len(ops)} writes')
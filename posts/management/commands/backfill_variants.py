@@ -0,0 +1,71 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+
+from posts import variants
+from posts.cache import bump, post_scopes
+from posts.models import Post
+
+# Image names per query, below SQLite's limit on query parameters
+CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def invalidate(names):
+    """Rebuild the cached cards of the posts showing ``names``."""
+    scopes = set()
+    for start in range(0, len(names), CHUNK_SIZE):
+        posts = Post.objects.filter(
+            image__in=names[start:start + CHUNK_SIZE]
+        ).select_related('author', 'group')
+        for post in posts:
+            scopes.update(post_scopes(post))
+        posts.update(version=F('version') + 1)
+    bump(*scopes)
+
+
+def backfill(name):
+    try:
+        variants.generate(name)
+    except Exception:
+        logger.exception('Could not generate variants of %s', name)
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Generate the responsive variants of the images in media/posts/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Worker processes; 1 generates in this process',
+        )
+
+    def handle(self, *args, **options):
+        if not default_storage.exists('posts'):
+            return
+        names = [
+            f'posts/{name}' for name in default_storage.listdir('posts')[1]
+        ]
+        if options['workers'] == 1:
+            results = list(map(backfill, names))
+        else:
+            # Forked workers must not share the parent's connections.
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=django.setup
+            )
+            with pool:
+                results = list(pool.map(backfill, names, chunksize=16))
+        invalidate([name for name, done in zip(names, results) if done])
+        self.stdout.write(
+            f'Generated variants for {sum(results)} of {len(names)} images'
+        )
@@ -0,0 +1,132 @@
+import json
+import platform
+
+import django
+import sentry_sdk
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from sentry_sdk.integrations.django import DjangoIntegration
+
+from posts import benchmark
+from posts.seeding import seed
+from yatube import tracing
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a test database at several sizes and record p50/p95 latency '
+        'and query counts of every endpoint as JSON. The development '
+        'database is not touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+            help='Numbers of users; every user writes 10 posts and 20 '
+                 'comments on average',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Requests per endpoint and size',
+        )
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Keep the cache between requests',
+        )
+        parser.add_argument(
+            '--tracing', choices=['off', 'sampled', 'full'], default='off',
+            help='Sentry tracing: off, sampled with the SENTRY_TRACES_* '
+                 'settings, or every request. Events are dropped, not sent.',
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            choices=sorted(benchmark.ENDPOINTS),
+            help='Only benchmark this endpoint; may be repeated',
+        )
+        parser.add_argument(
+            '--output', default='-', help='JSON file, - for stdout'
+        )
+        parser.add_argument(
+            '--compare', metavar='BASELINE',
+            help='Print the change against a previous JSON result',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        self.init_sentry(options['tracing'])
+        runs = []
+        try:
+            with benchmark.test_database():
+                cache_backend = settings.CACHES['default']['BACKEND']
+                for size in options['sizes']:
+                    call_command('flush', interactive=False, verbosity=0)
+                    cache.clear()
+                    created = seed(
+                        users=size, posts=size * 10, comments=size * 20,
+                        groups=max(1, size // 50),
+                    )
+                    self.stderr.write(f'Benchmarking {created}')
+                    runs.append({
+                        'size': created,
+                        'endpoints': benchmark.run(
+                            options['requests'], options['warm'],
+                            options['endpoints'],
+                        ),
+                    })
+        except AssertionError as error:
+            raise CommandError(error)
+
+        result = {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cache': cache_backend,
+                'requests': options['requests'],
+                'warm': options['warm'],
+                'tracing': options['tracing'],
+            },
+            'runs': runs,
+        }
+        output = json.dumps(result, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+
+        if baseline is not None:
+            for size, name, before, after in benchmark.compare(
+                baseline, result
+            ):
+                change = after['p50_ms'] / max(before['p50_ms'], 0.01) - 1
+                self.stderr.write(
+                    f'{size["users"]:>7} users {name:<14} '
+                    f'p50 {before["p50_ms"]:>8.2f} -> {after["p50_ms"]:>8.2f} '
+                    f'ms ({change:+.0%}), queries {before["queries"]} -> '
+                    f'{after["queries"]}'
+                )
+
+    def init_sentry(self, mode):
+        if mode == 'full':
+            trace_options = {'traces_sample_rate': 1.0}
+        elif mode == 'sampled':
+            trace_options = tracing.options(
+                settings.SENTRY_TRACES_SAMPLE_RATE,
+                settings.SENTRY_TRACES_RATES,
+            )
+        else:
+            trace_options = {}
+        sentry_sdk.init(
+            dsn=settings.SENTRY_DSN, transport=tracing.NullTransport,
+            integrations=[DjangoIntegration()], **trace_options
+        )
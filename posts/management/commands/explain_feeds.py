@@ -0,0 +1,102 @@
+import importlib
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, migrations, transaction
+
+from posts.feeds import FOLLOW_FEED_ORDERING, follow_feed
+from posts.models import Comment, Follow, Post
+from posts.pagination import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the query plans of the hot feed, follow and comment '
+        'queries, optionally as they were before the index migration.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-page', type=int, default=10,
+            help='Page size used for the feed queries',
+        )
+        parser.add_argument(
+            '--before', action='store_true',
+            help='Drop the indexes of 0004_feed_indexes for the run, in a '
+                 'transaction that is rolled back',
+        )
+
+    def handle(self, *args, before, **options):
+        if not before:
+            return self.explain_all(**options)
+        with transaction.atomic():
+            self.drop_feed_indexes()
+            self.explain_all(**options)
+            transaction.set_rollback(True)
+
+    def drop_feed_indexes(self):
+        migration = importlib.import_module(
+            'posts.migrations.0004_feed_indexes'
+        ).Migration
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for operation in migration.operations:
+                if isinstance(operation, migrations.AddIndex):
+                    cursor.execute(f'DROP INDEX {quote(operation.index.name)}')
+                elif (isinstance(operation, migrations.AddConstraint)
+                        and connection.vendor != 'sqlite'):
+                    # SQLite can only drop a constraint by rebuilding the
+                    # table; the lookup keeps its autoindex there.
+                    table = apps.get_model(
+                        'posts', operation.model_name
+                    )._meta.db_table
+                    cursor.execute(
+                        f'ALTER TABLE {quote(table)} DROP CONSTRAINT '
+                        f'{quote(operation.constraint.name)}'
+                    )
+
+    def explain_all(self, per_page, **options):
+        post = Post.objects.filter(group__isnull=False).order_by('-id').first()
+        follow = Follow.objects.order_by('-id').first()
+        if post is None or follow is None:
+            raise CommandError(
+                'The database needs posts with groups and follows'
+            )
+        # Use a mid-feed cursor: that is where OFFSET pagination hurts.
+        boundary = Post.objects.order_by('-pub_date', '-id')[
+            Post.objects.count() // 2
+        ]
+        cursor = CursorPaginator(Post.objects.all(), per_page)._seek(
+            [boundary.pub_date, boundary.id], forward=True
+        )
+
+        queries = {
+            'index': Post.objects.for_feed(),
+            'index, deep page': Post.objects.for_feed().filter(cursor),
+            'group_posts': Post.objects.for_feed().filter(
+                group_id=post.group_id
+            ),
+            'profile': Post.objects.for_feed().filter(
+                author_id=post.author_id
+            ),
+        }
+        for name, queryset in queries.items():
+            queryset = queryset.order_by('-pub_date', '-id')[:per_page + 1]
+            self.explain(name, queryset)
+        timeline, popular = follow_feed(follow.user)
+        for name, queryset in [('follow_index', timeline),
+                               ('follow_index, popular authors', popular)]:
+            self.explain(name, queryset.order_by(
+                *FOLLOW_FEED_ORDERING
+            )[:per_page + 1])
+        self.explain('comments', Comment.objects.filter(
+            post_id=post.id
+        ).order_by('created', 'id')[:per_page + 1])
+        self.explain('follow lookup', Follow.objects.filter(
+            user_id=follow.user_id, author_id=follow.author_id
+        ))
+
+    def explain(self, name, queryset):
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(queryset.explain())
+        self.stdout.write('')
@@ -0,0 +1,33 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.dumps import export
+
+
+class Command(BaseCommand):
+    help = 'Stream users, groups, posts, comments and follows to NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='NDJSON file, - for stdout')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Rows fetched from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['output'] == '-':
+            written = export(sys.stdout, options['chunk_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                written = export(stream, options['chunk_size'])
+        elapsed = time.monotonic() - started or 1e-9
+        total = sum(written.values())
+        for model, rows in written.items():
+            self.stderr.write(f'{model}: {rows} rows')
+        self.stderr.write(
+            f'Exported {total} rows in {elapsed:.1f}s '
+            f'({total / elapsed:.0f} rows/s)'
+        )
@@ -0,0 +1,53 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.dumps import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a dump made by export_yatube or dumpdata, streaming it. '
+        'Run it again with the same --source to resume an interrupted '
+        'import. Image files are not copied, only their paths.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='NDJSON or JSON array file')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows inserted per transaction',
+        )
+        parser.add_argument(
+            '--source',
+            help='Name of the dump for key remapping, the file name '
+                 'by default',
+        )
+        parser.add_argument(
+            '--no-repair', action='store_false', dest='repair',
+            help='Do not rebuild counters, timelines and the search index',
+        )
+
+    def handle(self, *args, **options):
+        path = options['input']
+        importer = Importer(
+            options['source'] or os.path.basename(path),
+            options['batch_size'],
+        )
+        started = time.monotonic()
+        stats = importer.run(
+            lambda: open(path, encoding='utf-8'), repair=options['repair']
+        )
+        elapsed = time.monotonic() - started or 1e-9
+        for model, counts in stats.items():
+            details = ', '.join(
+                f'{counts[name]} {name}'
+                for name in ('created', 'matched', 'resumed', 'orphaned')
+            )
+            self.stdout.write(f'{model}: {details}')
+        total = sum(sum(counts.values()) for counts in stats.values())
+        self.stdout.write(
+            f'Processed {total} rows in {elapsed:.1f}s '
+            f'({total / elapsed:.0f} rows/s)'
+        )
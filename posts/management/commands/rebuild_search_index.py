@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of posts and comments'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Indexed {rebuild()} posts')
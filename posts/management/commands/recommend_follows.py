@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import recommend
+
+
+class Command(BaseCommand):
+    help = 'Recompute "who to follow" suggestions of users marked dirty'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', dest='everyone',
+            help='Recompute the suggestions of every user',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Users per batch (default: RECOMMENDATIONS_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, everyone, batch_size, **options):
+        count = recommend(everyone=everyone, batch_size=batch_size)
+        self.stdout.write(f'Recomputed suggestions of {count} users')
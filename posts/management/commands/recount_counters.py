@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized post and profile counters'
+
+    def handle(self, *args, **options):
+        repaired = repair_counters()
+        for model, count in repaired.items():
+            self.stdout.write(f'Repaired {count} {model}')
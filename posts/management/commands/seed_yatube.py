@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a synthetic social graph where posts, '
+        'followers and comments follow a power law'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Average number of authors a user follows',
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Zipf exponent; higher values concentrate activity '
+                 'on fewer users',
+        )
+        parser.add_argument('--seed', type=int, default=0, dest='random_seed')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = seed(
+            users=options['users'], posts=options['posts'],
+            groups=options['groups'], comments=options['comments'],
+            follows=options['follows'], exponent=options['exponent'],
+            random_seed=options['random_seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(', '.join(
+            f'{rows} {table}' for table, rows in created.items()
+        ) + f' created in {time.monotonic() - started:.1f}s')
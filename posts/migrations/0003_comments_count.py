@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:17
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field, outer='pk'):
+    rows = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    return Coalesce(Subquery(
+        rows.values(field).annotate(n=Count('pk')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('users', 'Profile')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in User.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+    Profile.objects.update(
+        posts_count=count_of(Post, 'author', outer='user_id'),
+        followers_count=count_of(Follow, 'author', outer='user_id'),
+        following_count=count_of(Follow, 'user', outer='user_id'),
+    )
+    Post.objects.update(comments_count=count_of(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0001_profile'),
+        ('posts', '0002_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:19
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('users', 'Profile')
+    duplicates = Follow.objects.values('user_id', 'author_id').annotate(
+        keep=Min('id'), n=Count('id'),
+    ).filter(n__gt=1)
+    for row in list(duplicates):
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id'],
+        ).exclude(id=row['keep']).delete()
+        Profile.objects.filter(user_id=row['user_id']).update(
+            following_count=Follow.objects.filter(user_id=row['user_id']).count(),
+        )
+        Profile.objects.filter(user_id=row['author_id']).update(
+            followers_count=Follow.objects.filter(author_id=row['author_id']).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_profile'),
+        ('posts', '0003_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created', 'id'], name='posts_comme_post_id_9660d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='posts_post_pub_dat_d3c0cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='posts_post_author__075f1d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='posts_post_group_i_6a7ae9_idx'),
+        ),
+        migrations.RunPython(drop_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
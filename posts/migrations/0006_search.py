@@ -0,0 +1,79 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations
+
+# Posts indexed per round trip, under the SQLite limit on query parameters
+BATCH_SIZE = 500
+
+TABLES = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE posts_search USING fts5(document)',
+    ],
+    # No foreign key to posts_post: Django does not know this table, so
+    # flush and test truncation would fail on it. The post_delete signal
+    # removes the rows of deleted posts.
+    'postgresql': [
+        'CREATE TABLE posts_search ('
+        ' post_id integer PRIMARY KEY,'
+        ' document tsvector NOT NULL)',
+        'CREATE INDEX posts_search_document ON posts_search USING gin (document)',
+    ],
+}
+
+
+# Documents are indexed as posts.search indexed them when this was written
+INSERTS = {
+    'sqlite': 'INSERT INTO posts_search (rowid, document) VALUES (%s, %s)',
+    'postgresql': (
+        'INSERT INTO posts_search (post_id, document) '
+        'VALUES (%s, to_tsvector(%s::regconfig, %s))'
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in TABLES:
+        return
+    for sql in TABLES[vendor]:
+        schema_editor.execute(sql)
+
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    config = (
+        [getattr(settings, 'SEARCH_CONFIG', 'simple')]
+        if vendor == 'postgresql' else []
+    )
+    posts = Post.objects.order_by('pk').values_list('pk', 'text').iterator()
+    while True:
+        texts = dict(islice(posts, BATCH_SIZE))
+        if not texts:
+            break
+        comments = defaultdict(list)
+        for post_id, text in Comment.objects.filter(
+            post_id__in=texts
+        ).order_by('created', 'id').values_list('post_id', 'text').iterator():
+            comments[post_id].append(text)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(INSERTS[vendor], [
+                [post_id, *config, '\n'.join([text, *comments[post_id]])]
+                for post_id, text in texts.items()
+            ])
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in TABLES:
+        schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
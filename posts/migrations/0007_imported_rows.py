@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200)),
+                ('model', models.CharField(max_length=100)),
+                ('source_pk', models.BigIntegerField()),
+                ('target_pk', models.BigIntegerField()),
+            ],
+            options={
+                'unique_together': {('source', 'model', 'source_pk')},
+            },
+        ),
+    ]
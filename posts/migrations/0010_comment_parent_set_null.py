@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_comment_parent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='replies', to='posts.Comment'),
+        ),
+    ]
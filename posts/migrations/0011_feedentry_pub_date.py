@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:03
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from posts import feeds
+
+
+def fill_timelines(apps, schema_editor):
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry.objects.update(pub_date=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('pub_date')[:1]
+    ))
+    # Bounded like the timelines built after an import.
+    feeds.rebuild_timelines(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_profile'),
+        ('posts', '0010_comment_parent_set_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
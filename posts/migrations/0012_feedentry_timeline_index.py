@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feedentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='posts_feede_user_id_cbce2a_idx'),
+        ),
+    ]
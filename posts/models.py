@@ -9,11 +9,19 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField(max_length=200)
+    version = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Posts with everything a post card renders joined in."""
+        return self.select_related("author", "group")
+
+
 class Post(models.Model):
     text = models.TextField(blank=False)
     pub_date = models.DateTimeField("date_published", auto_now_add=True)
@@ -25,6 +33,17 @@ class Post(models.Model):
         related_name="groups"
     )
     image = models.ImageField(upload_to='posts/', null=True, blank=True)
+    comments_count = models.IntegerField(default=0, editable=False)
+    version = models.IntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"]),
+            models.Index(fields=["author", "-pub_date", "-id"]),
+            models.Index(fields=["group", "-pub_date", "-id"]),
+        ]
 
     def __str__(self):
         return self.text
@@ -37,6 +56,14 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    # The comment replied to, on the same post; replies outlive it
+    parent = models.ForeignKey(
+        "self", on_delete=models.SET_NULL, blank=True, null=True,
+        related_name="replies"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["post", "created", "id"])]
 
     def __str__(self):
         return self.text
@@ -49,3 +76,63 @@ class Follow(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="following"
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_follow"
+            )
+        ]
+
+
+class FeedEntry(models.Model):
+    """Materialized follow feed row: ``post`` delivered to ``user``."""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+"
+    )
+    # Copied from the post so that a timeline page is read from the
+    # index alone, in feed order.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "author"]),
+            models.Index(fields=["user", "-pub_date", "-post"]),
+        ]
+
+
+class ImportedRow(models.Model):
+    """Row created by ``import_yatube`` for a row of a dump.
+
+    Written in the same transaction as the row itself, so an interrupted
+    import resumes exactly where it stopped.
+    """
+    source = models.CharField(max_length=200)
+    model = models.CharField(max_length=100)
+    source_pk = models.BigIntegerField()
+    target_pk = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ("source", "model", "source_pk")
+
+
+class Recommendation(models.Model):
+    """Author suggested to ``user`` by the ``recommend_follows`` job."""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="recommendations"
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("user", "author")
+        indexes = [models.Index(fields=["user", "-score"])]
@@ -0,0 +1,192 @@
+import base64
+import binascii
+import collections.abc
+import heapq
+import json
+import operator
+from functools import reduce
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values):
+    """Pack the ordering key of a boundary row into an opaque token."""
+    # isoformat() keeps microseconds, which DjangoJSONEncoder drops.
+    raw = json.dumps([
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    """Unpack a token made by ``encode_cursor`` into ``length`` values."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor(token)
+    return values
+
+
+class CursorPaginator:
+    """Keyset paginator for ordered querysets.
+
+    Pages are addressed by opaque ``after``/``before`` tokens holding the
+    ordering key of the boundary row, so no ``COUNT(*)`` or ``OFFSET`` is
+    issued and a deep page costs the same as the first one. The last
+    ordering field must be unique (usually ``id``).
+
+    ``object_list`` can also be a list of querysets sharing the ordering
+    fields, such as a feed merged from several indexes: each one is
+    paged with the same cursor and their pages are merged.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.sources = (
+            list(object_list) if isinstance(object_list, (list, tuple))
+            else [object_list]
+        )
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+        if any(name.startswith('-') != self.descending
+               for name in self.ordering):
+            raise ValueError('Mixed ordering directions are not supported')
+
+    def encode_cursor(self, obj):
+        return encode_cursor(self._key(obj))
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            # A row of a ``values()`` queryset.
+            return tuple(obj[name] for name in self.fields)
+        return tuple(getattr(obj, name) for name in self.fields)
+
+    def decode_cursor(self, token):
+        values = decode_cursor(token, len(self.fields))
+        query = self.sources[0].query
+        try:
+            return [
+                # Ordering by an annotation converts like its expression.
+                (query.annotations[name].output_field
+                 if name in query.annotations
+                 else query.model._meta.get_field(name)).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor(token)
+
+    def _seek(self, values, forward):
+        """Build the keyset condition ``(f1, f2, ...) < (v1, v2, ...)``.
+
+        The row-value comparison is spelled out as an ``OR`` of prefixes,
+        which no index can serve on its own, so it is ANDed with a range
+        on the leading field (``f1 <= v1``) for the planner to walk the
+        ordering index from. ``forward`` follows the paginator ordering,
+        otherwise the comparison is flipped to walk back towards newer
+        rows.
+        """
+        lookup = 'lt' if self.descending == forward else 'gt'
+        conditions = []
+        for i, name in enumerate(self.fields):
+            exact = {field: value for field, value
+                     in zip(self.fields[:i], values[:i])}
+            exact[f'{name}__{lookup}'] = values[i]
+            conditions.append(Q(**exact))
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & reduce(
+            operator.or_, conditions
+        )
+
+    def page(self, after=None, before=None):
+        if before is not None:
+            reverse = [
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in self.ordering
+            ]
+            rows = self._rows(
+                self._seek(self.decode_cursor(before), forward=False),
+                reverse,
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(
+                rows, self,
+                previous_cursor=self._edge(rows, 0) if has_previous else None,
+                next_cursor=self._edge(rows, -1) or before,
+            )
+
+        condition = None
+        if after is not None:
+            condition = self._seek(self.decode_cursor(after), forward=True)
+        rows = self._rows(condition, self.ordering)
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            rows, self,
+            previous_cursor=(self._edge(rows, 0) or after) if after else None,
+            next_cursor=self._edge(rows, -1) if has_next else None,
+        )
+
+    def _rows(self, condition, ordering):
+        """Fetch a page and one more row, merging the sources if needed."""
+        limit = self.per_page + 1
+        pages = []
+        for queryset in self.sources:
+            if condition is not None:
+                queryset = queryset.filter(condition)
+            pages.append(list(queryset.order_by(*ordering)[:limit]))
+        if len(pages) == 1:
+            return pages[0]
+        return list(islice(heapq.merge(
+            *pages, key=self._key, reverse=ordering[0].startswith('-')
+        ), limit))
+
+    def _edge(self, rows, index):
+        if rows:
+            return self.encode_cursor(rows[index])
+
+    def get_page(self, after=None, before=None):
+        """Return a page, falling back to the first one on a bad cursor."""
+        try:
+            return self.page(after=after or None, before=before or None)
+        except InvalidCursor:
+            return self.page()
+
+
+class CursorPage(collections.abc.Sequence):
+
+    def __init__(self, object_list, paginator, previous_cursor=None,
+                 next_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
@@ -0,0 +1,217 @@
+"""Who-to-follow suggestions.
+
+Candidates for a user are scored from three signals:
+
+* friends of friends: authors followed by the authors the user follows,
+  a point per path;
+* co-followers: authors followed by the users whose follows overlap the
+  user's the most, weighted by the Jaccard similarity of the two sets;
+* groups: authors posting in the groups the user posts in, weighted by
+  one over the number of authors of the group.
+
+``recommend`` stores the ``RECOMMENDATIONS_TOP`` best candidates of the
+users whose profile is marked dirty, ``RECOMMENDATIONS_BATCH_SIZE`` users
+at a time, so pages read them with one indexed query; several runs can
+share the work. A batch only loads the edges around its users, and
+authors with more than ``RECOMMENDATIONS_MAX_FANOUT`` followers, like
+groups with more authors, are not expanded: the time and memory a batch
+takes stay bounded however large the graph grows.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from users.models import Profile
+from .cache import bump, get_versioned, set_versioned
+from .models import Follow, Post, Recommendation
+
+WEIGHTS = {'friends': 1.0, 'co_followers': 1.0, 'groups': 0.5}
+# Ids per ``__in`` lookup, under the SQLite limit on query parameters
+CHUNK_SIZE = 500
+
+
+def scope(user_id):
+    return f'recommendations:{user_id}'
+
+
+def for_user(user, limit=None):
+    """Authors suggested to ``user``, best first.
+
+    The list is cached until the next run recomputes it.
+    """
+    if not user.is_authenticated:
+        return []
+    key = f'recommended:{user.pk}'
+    authors, generation = get_versioned(key, scope(user.pk))
+    if authors is None:
+        authors = [
+            recommendation.author for recommendation in
+            Recommendation.objects.filter(user=user).select_related(
+                'author'
+            ).order_by('-score', 'author_id')
+        ]
+        set_versioned(key, authors, generation)
+    return authors[:limit or settings.RECOMMENDATIONS_TOP]
+
+
+def mark_dirty(user_ids):
+    """Have the next run recompute ``user_ids`` and their followers.
+
+    Whom a user follows feeds the friends of friends of their followers,
+    except for users with more than ``RECOMMENDATIONS_MAX_FANOUT``
+    followers: ``score`` does not expand them, so their followers are
+    left alone and a follow costs the same whoever makes it.
+    """
+    Profile.objects.filter(
+        Q(user_id__in=user_ids)
+        | Q(user_id__in=Follow.objects.filter(
+            author_id__in=user_ids,
+            author__profile__followers_count__lte=(
+                settings.RECOMMENDATIONS_MAX_FANOUT
+            ),
+        ).values('user_id'))
+    ).update(recommendations_dirty=True)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _adjacency(queryset, key, value, ids):
+    """``{key: {value, ...}}`` of the rows of ``queryset`` for ``ids``."""
+    adjacency = defaultdict(set)
+    for chunk in _chunks(ids):
+        for k, v in queryset.filter(
+            **{f'{key}__in': chunk}
+        ).values_list(key, value).distinct():
+            adjacency[k].add(v)
+    return adjacency
+
+
+def _large(queryset, key, ids):
+    """Those of ``ids`` with more than RECOMMENDATIONS_MAX_FANOUT rows."""
+    large = set()
+    for chunk in _chunks(ids):
+        large.update(queryset.filter(**{f'{key}__in': chunk}).values_list(
+            key, flat=True
+        ))
+    return large
+
+
+def score(user_ids):
+    """Return ``{user_id: [(author_id, score), ...]}``, best first."""
+    max_fanout = settings.RECOMMENDATIONS_MAX_FANOUT
+    follows = Follow.objects.all()
+    following = _adjacency(follows, 'user_id', 'author_id', user_ids)
+
+    followed = set().union(*following.values())
+    expanded = followed - _large(
+        Profile.objects.filter(followers_count__gt=max_fanout), 'user_id',
+        followed,
+    )
+    friends = _adjacency(follows, 'user_id', 'author_id', expanded)
+    followers = _adjacency(follows, 'author_id', 'user_id', expanded)
+
+    similar = {}
+    for user_id in user_ids:
+        overlap = Counter()
+        for author_id in following[user_id] & expanded:
+            overlap.update(followers[author_id])
+        overlap.pop(user_id, None)
+        similar[user_id] = overlap.most_common(
+            settings.RECOMMENDATIONS_SIMILAR_USERS
+        )
+    neighbours = {v for pairs in similar.values() for v, _ in pairs}
+    following.update(_adjacency(
+        follows, 'user_id', 'author_id', neighbours - set(following)
+    ))
+
+    posts = Post.objects.exclude(group=None)
+    groups = _adjacency(posts, 'author_id', 'group_id', user_ids)
+    posted = set().union(*groups.values())
+    group_authors = _adjacency(posts, 'group_id', 'author_id', posted - _large(
+        posts.values('group_id').annotate(
+            authors=Count('author_id', distinct=True)
+        ).filter(authors__gt=max_fanout), 'group_id', posted,
+    ))
+
+    top = {}
+    for user_id in user_ids:
+        mine = following[user_id]
+        # Counted in C first, the paths are then weighted in one pass.
+        paths = Counter()
+        for author_id in mine & expanded:
+            paths.update(friends[author_id])
+        scores = {
+            candidate: WEIGHTS['friends'] * count
+            for candidate, count in paths.items()
+        }
+        weighted = [
+            (following[neighbour], WEIGHTS['co_followers'] * common / (
+                len(mine) + len(following[neighbour]) - common
+            ))
+            for neighbour, common in similar[user_id]
+        ] + [
+            (group_authors[group_id],
+             WEIGHTS['groups'] / len(group_authors[group_id]))
+            for group_id in groups[user_id] if group_authors[group_id]
+        ]
+        for candidates, weight in weighted:
+            for candidate in candidates:
+                scores[candidate] = scores.get(candidate, 0) + weight
+
+        candidates = scores.keys() - mine - {user_id}
+        top[user_id] = [
+            (candidate, scores[candidate]) for candidate in heapq.nlargest(
+                settings.RECOMMENDATIONS_TOP, candidates,
+                key=scores.__getitem__,
+            )
+        ]
+    return top
+
+
+def recommend(everyone=False, batch_size=None):
+    """Recompute the suggestions of dirty users, or of ``everyone``.
+
+    Return the number of users recomputed.
+    """
+    batch_size = batch_size or settings.RECOMMENDATIONS_BATCH_SIZE
+    if everyone:
+        Profile.objects.update(recommendations_dirty=True)
+    done = 0
+    while True:
+        with transaction.atomic():
+            # Rows marked again while the batch runs wait for the commit
+            # and stay dirty for the next batch. Concurrent runs take
+            # different batches.
+            user_ids = list(Profile.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                recommendations_dirty=True
+            ).order_by('user_id').values_list(
+                'user_id', flat=True
+            )[:batch_size])
+            if not user_ids:
+                return done
+            for chunk in _chunks(user_ids):
+                Profile.objects.filter(user_id__in=chunk).update(
+                    recommendations_dirty=False
+                )
+            _store(score(user_ids))
+        done += len(user_ids)
+
+
+def _store(top):
+    for chunk in _chunks(top):
+        Recommendation.objects.filter(user_id__in=chunk).delete()
+    Recommendation.objects.bulk_create([
+        Recommendation(user_id=user_id, author_id=author_id, score=value)
+        for user_id, candidates in top.items()
+        for author_id, value in candidates
+    ])
+    bump(*(scope(user_id) for user_id in top))
@@ -0,0 +1,343 @@
+"""Full-text search over posts and their comments.
+
+Each post is indexed as one document made of its text and the text of
+its comments. ``SEARCH_BACKEND`` selects where the index lives:
+
+* ``SQLiteBackend``: an FTS5 table ranked with bm25, for local use;
+* ``PostgresBackend``: a ``tsvector`` table with a GIN index ranked with
+  ``ts_rank``, for production;
+* ``PythonBackend``: an in-process inverted index, for tests.
+
+Signals keep the index up to date one post at a time; new comments are
+appended to the document of their post rather than rebuilding it from
+every comment. Hits are ranked by
+``(score, post id)``, which is also the keyset ``SearchPaginator`` uses
+for cursors.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+from .pagination import CursorPage, InvalidCursor, decode_cursor, encode_cursor
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower())
+
+
+class SearchBackend:
+    """Index of post documents.
+
+    ``search`` returns at most ``limit`` hits as ``(score, post_id)``,
+    best first. With ``after`` they are the hits ranked below that key,
+    with ``before`` the ones ranked just above it. ``append`` adds text
+    to the document of an indexed post and returns ``False`` when the
+    post is not indexed.
+    """
+
+    def index(self, post_id, document):
+        raise NotImplementedError
+
+    def append(self, post_id, text):
+        raise NotImplementedError
+
+    def remove(self, post_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, limit, after=None, before=None):
+        raise NotImplementedError
+
+
+class PythonBackend(SearchBackend):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = defaultdict(dict)
+        self.terms = {}
+
+    def index(self, post_id, document):
+        counts = Counter(tokenize(document))
+        with self._lock:
+            self._remove(post_id)
+            for term, count in counts.items():
+                self.postings[term][post_id] = count
+            self.terms[post_id] = set(counts)
+
+    def append(self, post_id, text):
+        counts = Counter(tokenize(text))
+        with self._lock:
+            if post_id not in self.terms:
+                return False
+            for term, count in counts.items():
+                postings = self.postings[term]
+                postings[post_id] = postings.get(post_id, 0) + count
+            self.terms[post_id].update(counts)
+        return True
+
+    def _remove(self, post_id):
+        for term in self.terms.pop(post_id, ()):
+            del self.postings[term][post_id]
+
+    def remove(self, post_id):
+        with self._lock:
+            self._remove(post_id)
+
+    def clear(self):
+        with self._lock:
+            self.postings.clear()
+            self.terms.clear()
+
+    def search(self, query, limit, after=None, before=None):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self.postings.get(term, {}) for term in terms]
+            matches = set.intersection(*(set(p) for p in postings))
+            total = len(self.terms)
+            hits = sorted(
+                (
+                    sum(
+                        p[post_id] * math.log(1 + total / len(p))
+                        for p in postings
+                    ),
+                    post_id,
+                )
+                for post_id in matches
+            )[::-1]
+        if after is not None:
+            return [hit for hit in hits if hit < tuple(after)][:limit]
+        if before is not None:
+            return [hit for hit in hits if hit > tuple(before)][-limit:]
+        return hits[:limit]
+
+
+class SQLBackend(SearchBackend):
+    """Ranks hits in the database; subclasses provide ``ranked``.
+
+    ``ranked`` selects ``score`` and ``id`` of the matching documents.
+    """
+
+    def ranked(self, query):
+        raise NotImplementedError
+
+    def execute(self, sql, params):
+        """Rows of a query, or the number of rows a statement changed."""
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description:
+                return cursor.fetchall()
+            return cursor.rowcount
+
+    def search(self, query, limit, after=None, before=None):
+        if not tokenize(query):
+            return []
+        ranked, params = self.ranked(query)
+        sql = f'SELECT score, id FROM ({ranked}) AS hits'
+        if after is not None:
+            sql += ' WHERE (score, id) < (%s, %s)'
+            params = [*params, *after]
+        elif before is not None:
+            sql += ' WHERE (score, id) > (%s, %s)'
+            params = [*params, *before]
+        order = 'ASC' if before is not None else 'DESC'
+        sql += f' ORDER BY score {order}, id {order} LIMIT %s'
+        rows = [tuple(row) for row in self.execute(sql, [*params, limit])]
+        return rows[::-1] if before is not None else rows
+
+
+class SQLiteBackend(SQLBackend):
+
+    def index(self, post_id, document):
+        self.remove(post_id)
+        self.execute(
+            'INSERT INTO posts_search (rowid, document) VALUES (%s, %s)',
+            [post_id, document],
+        )
+
+    def append(self, post_id, text):
+        return self.execute(
+            'UPDATE posts_search SET document = document || char(10) || %s '
+            'WHERE rowid = %s',
+            [text, post_id],
+        ) > 0
+
+    def remove(self, post_id):
+        self.execute('DELETE FROM posts_search WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        self.execute('DELETE FROM posts_search', [])
+
+    def ranked(self, query):
+        # Quoting every token keeps FTS5 query syntax out of user input.
+        match = ' '.join(f'"{term}"' for term in tokenize(query))
+        return (
+            'SELECT -bm25(posts_search) AS score, rowid AS id '
+            'FROM posts_search WHERE posts_search MATCH %s',
+            [match],
+        )
+
+
+class PostgresBackend(SQLBackend):
+
+    def index(self, post_id, document):
+        self.execute(
+            'INSERT INTO posts_search (post_id, document) '
+            'VALUES (%s, to_tsvector(%s::regconfig, %s)) '
+            'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+            [post_id, settings.SEARCH_CONFIG, document],
+        )
+
+    def append(self, post_id, text):
+        return self.execute(
+            'UPDATE posts_search '
+            'SET document = document || to_tsvector(%s::regconfig, %s) '
+            'WHERE post_id = %s',
+            [settings.SEARCH_CONFIG, text, post_id],
+        ) > 0
+
+    def remove(self, post_id):
+        self.execute('DELETE FROM posts_search WHERE post_id = %s', [post_id])
+
+    def clear(self):
+        self.execute('TRUNCATE posts_search', [])
+
+    def ranked(self, query):
+        return (
+            'SELECT ts_rank(document, query)::float8 AS score, post_id AS id '
+            'FROM posts_search, plainto_tsquery(%s::regconfig, %s) AS query '
+            'WHERE document @@ query',
+            [settings.SEARCH_CONFIG, query],
+        )
+
+
+@lru_cache()
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    if setting == 'SEARCH_BACKEND':
+        get_backend.cache_clear()
+
+
+def documents(post_ids):
+    """Return ``{post_id: document}`` for the posts that exist."""
+    texts = dict(
+        Post.objects.filter(pk__in=post_ids).values_list('pk', 'text')
+    )
+    comments = defaultdict(list)
+    for post_id, text in Comment.objects.filter(
+        post_id__in=texts
+    ).order_by('created', 'id').values_list('post_id', 'text'):
+        comments[post_id].append(text)
+    return {
+        post_id: '\n'.join([text, *comments[post_id]])
+        for post_id, text in texts.items()
+    }
+
+
+def update(post_id):
+    """Reindex a post after it or one of its comments has changed."""
+    update_many([post_id])
+
+
+def add_comments(post_id, texts):
+    """Index new comments of a post without rebuilding its document."""
+    if not get_backend().append(post_id, '\n'.join(texts)):
+        update(post_id)
+
+
+def update_many(post_ids):
+    backend = get_backend()
+    found = documents(post_ids)
+    for post_id in post_ids:
+        if post_id in found:
+            backend.index(post_id, found[post_id])
+        else:
+            backend.remove(post_id)
+
+
+def rebuild(batch_size=500):
+    backend = get_backend()
+    backend.clear()
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    for start in range(0, len(post_ids), batch_size):
+        batch = documents(post_ids[start:start + batch_size])
+        for post_id, document in batch.items():
+            backend.index(post_id, document)
+    return len(post_ids)
+
+
+class SearchPaginator:
+    """Cursor paginator over ranked search hits.
+
+    Cursors hold the ``(score, post id)`` key of the boundary hit. The
+    posts of a page are loaded from ``object_list``; hits it filters out
+    are dropped from the page.
+    """
+
+    def __init__(self, query, per_page, object_list=None):
+        self.query = query
+        self.per_page = int(per_page)
+        if object_list is None:
+            object_list = Post.objects.for_feed()
+        self.object_list = object_list
+
+    def decode_cursor(self, token):
+        score, post_id = decode_cursor(token, 2)
+        try:
+            return float(score), int(post_id)
+        except (TypeError, ValueError):
+            raise InvalidCursor(token)
+
+    def page(self, after=None, before=None):
+        backend = get_backend()
+        if before is not None:
+            hits = backend.search(
+                self.query, self.per_page + 1,
+                before=self.decode_cursor(before),
+            )
+            has_previous = len(hits) > self.per_page
+            hits = hits[-self.per_page:]
+            previous_cursor = self._edge(hits, 0) if has_previous else None
+            next_cursor = self._edge(hits, -1) or before
+        else:
+            hits = backend.search(
+                self.query, self.per_page + 1,
+                after=self.decode_cursor(after) if after else None,
+            )
+            has_next = len(hits) > self.per_page
+            hits = hits[:self.per_page]
+            previous_cursor = (self._edge(hits, 0) or after) if after else None
+            next_cursor = self._edge(hits, -1) if has_next else None
+
+        posts = self.object_list.in_bulk([post_id for _, post_id in hits])
+        return CursorPage(
+            [posts[post_id] for _, post_id in hits if post_id in posts],
+            self, previous_cursor=previous_cursor, next_cursor=next_cursor,
+        )
+
+    def _edge(self, hits, index):
+        if hits:
+            return encode_cursor(hits[index])
+
+    def get_page(self, after=None, before=None):
+        """Return a page, falling back to the first one on a bad cursor."""
+        try:
+            return self.page(after=after or None, before=before or None)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,128 @@
+"""Synthetic data with the skew of a real social network.
+
+Users are ranked; the user at rank ``r`` writes posts, gets followed and
+comments with a weight of ``1 / r ** exponent``, so activity and
+followers follow a power law: a few authors have most followers and
+posts, most users have a handful. Posts get comments the same way.
+Rows are bulk inserted without signals and derived data is rebuilt at
+the end, like an import.
+"""
+import itertools
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .dumps import keeping_dates, rebuild_derived
+from .models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'morning walk city river park coffee friends travel mountain sea '
+    'book music photo dinner weekend sunset garden train museum market '
+    'winter summer snow rain bridge street festival lake forest road'
+).split()
+
+SPAN = timedelta(days=365)
+
+
+def cumulative_zipf(n, exponent):
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, n + 1)
+    ))
+
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, words)))
+
+
+def seed(users=100, posts=1000, groups=10, comments=2000, follows=20,
+         exponent=1.1, random_seed=0, batch_size=1000):
+    """Create a power-law dataset and return ``{table: rows created}``.
+
+    ``follows`` is the average number of authors a user follows.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    prefix = f'seed-{uuid.uuid4().hex[:8]}-'
+
+    def past():
+        return now - SPAN * rng.random()
+
+    def insert(model, objs):
+        for start in range(0, len(objs), batch_size):
+            model.objects.bulk_create(
+                objs[start:start + batch_size], ignore_conflicts=True
+            )
+
+    password = make_password(None)
+    insert(User, [
+        User(username=f'{prefix}{i}', password=password, date_joined=past())
+        for i in range(users)
+    ])
+    user_ids = list(User.objects.filter(
+        username__startswith=prefix
+    ).order_by('pk').values_list('pk', flat=True))
+    insert(Group, [
+        Group(title=f'Group {i}', slug=f'{prefix}{i}',
+              description=sentence(rng))
+        for i in range(groups)
+    ])
+    group_ids = list(Group.objects.filter(
+        slug__startswith=prefix
+    ).order_by('pk').values_list('pk', flat=True))
+    user_weights = cumulative_zipf(len(user_ids), exponent)
+    group_weights = cumulative_zipf(len(group_ids), exponent)
+
+    authors = rng.choices(user_ids, cum_weights=user_weights, k=posts)
+    with keeping_dates():
+        insert(Post, [
+            Post(
+                text=sentence(rng, 60), author_id=author_id, pub_date=past(),
+                group_id=(
+                    rng.choices(group_ids, cum_weights=group_weights)[0]
+                    if group_ids and rng.random() < 0.5 else None
+                ),
+            )
+            for author_id in authors
+        ])
+        post_ids = list(Post.objects.filter(
+            author_id__in=user_ids
+        ).values_list('pk', flat=True))
+        rng.shuffle(post_ids)
+        post_weights = cumulative_zipf(len(post_ids), exponent)
+        insert(Comment, [
+            Comment(post_id=post_id, author_id=author_id, text=sentence(rng),
+                    created=past())
+            for post_id, author_id in zip(
+                rng.choices(post_ids, cum_weights=post_weights, k=comments)
+                if post_ids else [],
+                rng.choices(user_ids, cum_weights=user_weights, k=comments),
+            )
+        ])
+
+    pairs = set()
+    for user_id in user_ids:
+        # Out-degrees are Pareto distributed with the requested mean.
+        degree = min(
+            len(user_ids) - 1, int(rng.paretovariate(2) * follows / 2)
+        )
+        for author_id in rng.choices(
+            user_ids, cum_weights=user_weights, k=degree
+        ):
+            if author_id != user_id:
+                pairs.add((user_id, author_id))
+    insert(Follow, [
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    ])
+
+    rebuild_derived()
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_ids),
+        'comments': comments if post_ids else 0,
+        'follows': len(pairs),
+    }
@@ -0,0 +1,170 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from users.models import Profile
+from . import feeds, follow_graph, recommendations, search, thumbnails
+from .cache import bump, post_scopes
+from .models import Comment, Follow, Group, Post
+
+# Posts being deleted in this thread; their cascaded comments skip the
+# per-comment bookkeeping.
+_deleting = threading.local()
+# Set while posts.bulk deletes rows and keeps everything in sync for the
+# whole batch itself.
+_suspended = threading.local()
+
+
+@contextmanager
+def suspended():
+    """Skip the delete receivers of this module in this thread."""
+    _suspended.active = True
+    try:
+        yield
+    finally:
+        _suspended.active = False
+
+
+def _is_suspended():
+    return getattr(_suspended, 'active', False)
+
+
+def _shift(queryset, delta, *fields):
+    queryset.update(**{field: F(field) + delta for field in fields})
+
+
+def _touch_post(post_id, comments_delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + comments_delta,
+        version=F('version') + 1,
+    )
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Group)
+def bump_version(sender, instance, raw=False, update_fields=None,
+                 **kwargs):
+    if raw:
+        return
+    if update_fields is None:
+        instance.version += 1
+    elif 'version' in update_fields:
+        # Bumped in the same UPDATE, on top of any concurrent bump; the
+        # instance holds the expression until it is refreshed.
+        instance.version = F('version') + 1
+    else:
+        # A partial save leaves the version column alone, so a concurrent
+        # bump is not overwritten; bump it in the database instead.
+        sender.objects.filter(pk=instance.pk).update(
+            version=F('version') + 1
+        )
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # An edit that moves the post to another group has to invalidate
+    # the old group page as well.
+    if instance.pk and not raw:
+        instance._old_group_slug = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        _shift(Profile.objects.filter(user_id=instance.author_id), 1,
+               'posts_count')
+        feeds.fan_out(instance)
+    scopes = post_scopes(instance)
+    old_group = getattr(instance, '_old_group_slug', None)
+    if old_group:
+        scopes.append(f'group:{old_group}')
+    bump(*scopes)
+    search.update(instance.pk)
+    if instance.image:
+        thumbnails.queue_post_images(instance, scopes)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    if _is_suspended():
+        return
+    _deleting.posts = getattr(_deleting, 'posts', set()) | {instance.pk}
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if _is_suspended():
+        return
+    _deleting.posts.discard(instance.pk)
+    _shift(Profile.objects.filter(user_id=instance.author_id), -1,
+           'posts_count')
+    bump(*post_scopes(instance))
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump(*post_scopes(instance.post))
+    if created:
+        _touch_post(instance.post_id, 1)
+        search.add_comments(instance.post_id, [instance.text])
+    else:
+        search.update(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if _is_suspended():
+        return
+    if instance.post_id in getattr(_deleting, 'posts', ()):
+        # The post goes away with its comments, nothing to keep in sync.
+        return
+    _touch_post(instance.post_id, -1)
+    bump(*post_scopes(instance.post))
+    search.update(instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump('global', 'groups', f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _shift(Profile.objects.filter(user_id=instance.author_id), 1,
+               'followers_count')
+        _shift(Profile.objects.filter(user_id=instance.user_id), 1,
+               'following_count')
+        follow_graph.changed([(instance.user_id, instance.author_id)])
+        recommendations.mark_dirty([instance.user_id])
+        feeds.backfill(instance.user, instance.author)
+        bump(f'author:{instance.author.username}',
+             f'author:{instance.user.username}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if _is_suspended():
+        return
+    _shift(Profile.objects.filter(user_id=instance.author_id), -1,
+           'followers_count')
+    _shift(Profile.objects.filter(user_id=instance.user_id), -1,
+           'following_count')
+    follow_graph.changed([(instance.user_id, instance.author_id)])
+    recommendations.mark_dirty([instance.user_id])
+    feeds.prune(instance.user, instance.author)
+    bump(f'author:{instance.author.username}',
+         f'author:{instance.user.username}')
@@ -0,0 +1,20 @@
+from django import template
+
+from posts import variants
+
+register = template.Library()
+
+
+@register.inclusion_tag('picture.html')
+def post_picture(image):
+    """Render a post image as <picture> with its generated variants."""
+    sources = variants.sources(image)
+    # JPEG goes into the <img> srcset, the other formats into <source>.
+    jpeg = dict(sources).pop('image/jpeg', '')
+    return {
+        'image': image,
+        'sources': [source for source in sources if source[0] != 'image/jpeg'],
+        'srcset': jpeg,
+        'sizes': f'(max-width: {variants.ASPECT[0]}px) 100vw, '
+                 f'{variants.ASPECT[0]}px',
+    }
@@ -26,12 +26,12 @@ class PostsTest(TestCase):
             text="This post was created to check the cache", author=self.user
         )
 
-        # Check the new post not on the index page
+        # A new post invalidates the cached index page right away
         response_index = self.client.get('/')
-        self.assertNotContains(response_index, self.post.text, status_code=200)
+        self.assertContains(response_index, self.post.text, status_code=200)
         cache.set('my_key', 'my_value', 20)
         self.assertTrue(cache.get('my_key'))
-        
+
         # Clear cache & check post on the index page
         cache.clear()
         response_index = self.client.get('/')
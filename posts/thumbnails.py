@@ -0,0 +1,206 @@
+"""Thumbnail generation off the request path.
+
+``QueuedThumbnailBackend`` is the sorl-thumbnail backend of the project.
+When a thumbnail is not in the key value store yet, it queues the resize
+on a worker pool and returns the source image instead, so rendering never
+waits for Pillow. Posts queue their card thumbnail and image variants
+when they are saved. Either way the posts showing the image get a new
+version once it is ready, so that their cached cards are rebuilt.
+
+A thumbnail is generated once however many requests ask for it: queued
+names are tracked in-process and locked in the cache for other processes.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from django.db.models import F
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from . import variants
+from .cache import bump, post_scopes
+from .models import Post
+
+CARD_GEOMETRY = variants.geometry(960)
+CARD_OPTIONS = variants.CROP_OPTIONS
+
+# Formats sorl-thumbnail has no file extension for.
+EXTRA_EXTENSIONS = {'AVIF': 'avif'}
+
+LOCK_TIMEOUT = 5 * 60
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_queued = set()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _lock_key(name):
+    return f'thumbnail:{name}'
+
+
+def submit(name, task):
+    """Queue ``task`` that generates the thumbnail ``name``.
+
+    Returns ``False`` when the thumbnail is already being generated.
+    With ``THUMBNAIL_EXECUTOR = 'sync'`` the task runs inline.
+    """
+    with _lock:
+        if name in _queued:
+            return False
+        if not cache.add(_lock_key(name), True, LOCK_TIMEOUT):
+            return False
+        _queued.add(name)
+    if settings.THUMBNAIL_EXECUTOR == 'sync':
+        _run(name, task)
+    else:
+        _get_executor().submit(_run_in_worker, name, task)
+    return True
+
+
+def _run(name, task):
+    try:
+        task()
+    except Exception:
+        logger.exception('Thumbnail generation failed for %s', name)
+    finally:
+        with _lock:
+            _queued.discard(name)
+        cache.delete(_lock_key(name))
+
+
+def _run_in_worker(name, task):
+    try:
+        _run(name, task)
+    finally:
+        connection.close()
+
+
+def _source_exists(file_):
+    try:
+        return ImageFile(file_).exists()
+    except (OSError, SuspiciousFileOperation):
+        return False
+
+
+class QueuedThumbnailBackend(ThumbnailBackend):
+    """Serve thumbnails from the key value store, queue the missing ones."""
+
+    def _options(self, source, options):
+        # Mirrors the option defaults of ThumbnailBackend.get_thumbnail so
+        # that the thumbnail name matches the one it generates.
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        extension = EXTENSIONS.get(options['format']) or EXTRA_EXTENSIONS[
+            options['format']
+        ]
+        key = tokey(source.key, geometry_string, serialize(options))
+        return (
+            f'{thumbnail_settings.THUMBNAIL_PREFIX}'
+            f'{key[:2]}/{key[2:4]}/{key}.{extension}'
+        )
+
+    def thumbnail_name(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        return self._get_thumbnail_filename(
+            source, geometry_string, self._options(source, options)
+        )
+
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        """Return the thumbnail if it has been generated, else ``None``."""
+        name = self.thumbnail_name(file_, geometry_string, **options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def generate(self, file_, geometry_string, **options):
+        """Generate the thumbnail in the calling thread."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = ImageFile(
+            self.thumbnail_name(file_, geometry_string, **options),
+            default.storage,
+        )
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+
+        if not _source_exists(file_):
+            if thumbnail_settings.THUMBNAIL_DUMMY:
+                return DummyImageFile(geometry_string)
+            return ImageFile(file_)
+
+        post = getattr(file_, 'instance', None)
+        scopes = post_scopes(post) if isinstance(post, Post) else []
+
+        def task():
+            self.generate(file_, geometry_string, **options)
+            if scopes:
+                _images_ready(post.pk, scopes)
+
+        submit(thumbnail.name, task)
+        # The sync executor has generated the thumbnail by now.
+        return default.kvstore.get(thumbnail) or ImageFile(file_)
+
+
+def _images_ready(pk, scopes):
+    Post.objects.filter(pk=pk).update(version=F('version') + 1)
+    bump(*scopes)
+
+
+def queue_post_images(post, scopes):
+    """Generate the card thumbnail and variants of a post after commit.
+
+    Once they are ready the post version and ``scopes`` are bumped, so
+    that cached cards showing the source image are rebuilt. The job is
+    queued under its own name: a request that is generating just the
+    card thumbnail must not make the variants be skipped.
+    """
+    image, pk = post.image, post.pk
+
+    def task():
+        default.backend.generate(image, CARD_GEOMETRY, **CARD_OPTIONS)
+        variants.generate(image)
+        _images_ready(pk, scopes)
+
+    def on_commit():
+        backend = default.backend
+        card = backend.cached_thumbnail(image, CARD_GEOMETRY, **CARD_OPTIONS)
+        if card and len(variants.generated(image)) == len(variants.registry()):
+            return
+        if _source_exists(image):
+            submit(f'images:{image.name}', task)
+
+    transaction.on_commit(on_commit)
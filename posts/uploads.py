@@ -0,0 +1,53 @@
+"""Streaming handling of image uploads.
+
+``ImageUploadHandler`` replaces Django's upload handlers: every upload is
+streamed to a temporary file in chunks, whatever its size, and saving it
+moves that file into storage. Uploads that do not start with an image
+signature or grow past ``POST_IMAGE_MAX_BYTES`` stop being written at
+once; the file keeps the reason in ``upload_error`` for the form to
+report.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.forms import ImageField
+from django.template.defaultfilters import filesizeformat
+
+SIGNATURES = (
+    b'\xff\xd8\xff',  # JPEG
+    b'\x89PNG\r\n\x1a\n',
+    b'GIF87a',
+    b'GIF89a',
+)
+
+
+def is_image(head):
+    """Sniff the first bytes of an upload for a supported image format."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return True
+    return head.startswith(SIGNATURES)
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        if start == 0 and not is_image(raw_data):
+            self.error = ImageField.default_error_messages['invalid_image']
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            limit = filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+            self.error = f'Image files must be at most {limit}.'
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.upload_error = self.error
+        return uploaded
@@ -8,6 +8,8 @@ urlpatterns = [
     path("new/", views.new_post, name="new_post"),
     # follow index page
     path('follow/', views.follow_index, name="follow_index"),
+    # search results
+    path("search/", views.search, name="search"),
     # group page
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
     # user profile
@@ -31,5 +33,9 @@ urlpatterns = [
     path(
         "<username>/<int:post_id>/comment", views.add_comment,
         name="add_comment"
-    )
+    ),
+    path(
+        "<username>/<int:post_id>/comments/", views.post_comments,
+        name="post_comments"
+    ),
 ]
@@ -0,0 +1,142 @@
+"""Responsive variants of post images.
+
+Every post image is rendered at each of ``POST_IMAGE_WIDTHS`` in every
+format Pillow can write: AVIF when available, WebP, and JPEG as the
+fallback all browsers understand. Variants are sorl thumbnails cropped to
+the card aspect ratio, so they share its key value store and worker pool.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+try:
+    import pillow_avif  # noqa: F401 registers the AVIF plugin
+except ImportError:
+    pass
+
+Variant = namedtuple('Variant', 'width format')
+
+# Preferred first: browsers pick the first <source> they support.
+FORMATS = (
+    ('AVIF', 'image/avif'),
+    ('WEBP', 'image/webp'),
+    ('JPEG', 'image/jpeg'),
+)
+ASPECT = (960, 440)
+# Key value store keys per query, below SQLite's limit on query parameters
+CHUNK_SIZE = 500
+CROP_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+@lru_cache()
+def formats():
+    """Return the formats Pillow can write, preferred first."""
+    Image.init()
+    return [fmt for fmt, _ in FORMATS if fmt in Image.SAVE]
+
+
+def registry():
+    return [
+        Variant(width, fmt)
+        for fmt in formats()
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def geometry(width):
+    return f'{width}x{round(width * ASPECT[1] / ASPECT[0])}'
+
+
+def options(variant):
+    return dict(CROP_OPTIONS, format=variant.format)
+
+
+def generate(image):
+    """Generate every variant of ``image`` in the calling thread."""
+    for variant in registry():
+        default.backend.generate(
+            image, geometry(variant.width), **options(variant)
+        )
+
+
+def generated(image):
+    """Return ``[(variant, thumbnail)]`` for the variants generated so far."""
+    return generated_many([image])[image.name]
+
+
+def generated_many(images):
+    """Return ``{image name: [(variant, thumbnail)]}`` for ``images``.
+
+    The key value store is read for all of them at once rather than once
+    per variant of every image. Images without a file are left out.
+    """
+    backend = default.backend
+    wanted = {}
+    for image in images:
+        if not image:
+            continue
+        for variant in registry():
+            name = backend.thumbnail_name(
+                image, geometry(variant.width), **options(variant)
+            )
+            key = add_prefix(ImageFile(name, default.storage).key)
+            wanted[key] = (image.name, variant)
+
+    values = _get_many(list(wanted))
+    found = {image.name: [] for image in images if image}
+    for key, (name, variant) in wanted.items():
+        if values.get(key) is not None:
+            found[name].append((variant, deserialize_image_file(values[key])))
+    return found
+
+
+def _get_many(keys):
+    """Read raw ``keys`` from the key value store, ``None`` when missing."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    # What the cached db store does per key, for all keys in two trips
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    stored = {}
+    for start in range(0, len(missing), CHUNK_SIZE):
+        stored.update(KVStoreModel.objects.filter(
+            key__in=missing[start:start + CHUNK_SIZE]
+        ).values_list('key', 'value'))
+    if missing:
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return {
+        key: None if value == EMPTY_VALUE else value
+        for key, value in values.items()
+    }
+
+
+def sources(image):
+    """Group the generated variants of ``image`` into ``srcset`` strings.
+
+    Returns ``[(mime_type, srcset)]`` in order of preference.
+    """
+    srcsets = {}
+    for variant, thumbnail in generated(image):
+        srcsets.setdefault(variant.format, []).append(
+            f'{thumbnail.url} {variant.width}w'
+        )
+    return [
+        (mime_type, ', '.join(srcsets[fmt]))
+        for fmt, mime_type in FORMATS
+        if fmt in srcsets
+    ]
@@ -1,34 +1,95 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
 from .models import Post, Group, User, Comment, Follow
+from . import follow_graph, recommendations, writebehind
+from .cache import generations, scoped_page
+from .counters import profile_of
+from .feeds import FOLLOW_FEED_ORDERING, follow_feed
 from .forms import PostForm, CommentForm
+from .pagination import CursorPaginator
+from .search import SearchPaginator
 
 
+def _viewer_scopes(request):
+    # Cards show whether the viewer follows their authors.
+    if request.user.is_authenticated:
+        return [follow_graph.following_scope(request.user.pk)]
+    return []
+
+
+def _own_recommendation_scopes(request, username):
+    # Users see their follow suggestions on their own profile.
+    if request.user.username == username:
+        return [recommendations.scope(request.user.pk)]
+    return []
+
+
+def _followed(request, page):
+    return follow_graph.followed_among(
+        request.user, {post.author_id for post in page}
+    )
+
+
+@transaction.non_atomic_requests
+@scoped_page(lambda request: ['global', *_viewer_scopes(request)])
 def index(request):
-    posts = Post.objects.order_by('-pub_date')
+    posts = Post.objects.for_feed()
 
-    paginator = Paginator(posts, 5)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, 5)
+    page = paginator.get_page(
+        request.GET.get('after'), request.GET.get('before')
+    )
 
     return render(request, 'index.html', {
         'page': page,
         'paginator': paginator,
+        'followed': _followed(request, page),
+        'generation': '.'.join(map(str, generations(
+            'global', *_viewer_scopes(request)
+        ))),
     })
 
 
+@transaction.non_atomic_requests
+@scoped_page(lambda request, slug: [
+    f'group:{slug}', 'groups', *_viewer_scopes(request)
+])
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by("-pub_date")
+    posts = Post.objects.for_feed().filter(group=group)
 
-    paginator = Paginator(posts, 5)
-    page = paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(posts, 5)
+    page = paginator.get_page(
+        request.GET.get('after'), request.GET.get('before')
+    )
 
     return render(request, 'group.html', {
         'group': group,
         'paginator': paginator,
         'page': page,
+        'followed': _followed(request, page),
+    })
+
+
+@transaction.non_atomic_requests
+@scoped_page(lambda request: ['global', *_viewer_scopes(request)])
+def search(request):
+    query = request.GET.get('q', '').strip()
+
+    paginator = SearchPaginator(query, 5)
+    page = paginator.get_page(
+        request.GET.get('after'), request.GET.get('before')
+    )
+
+    return render(request, 'search.html', {
+        'query': query,
+        'page': page,
+        'paginator': paginator,
+        'followed': _followed(request, page),
     })
 
 
@@ -47,50 +108,113 @@ def new_post(request):
     return render(request, 'new.html', {'form': form})
 
 
+@transaction.non_atomic_requests
+@scoped_page(lambda request, username: [
+    f'author:{username}', 'groups',
+    *_own_recommendation_scopes(request, username),
+])
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts_count = Post.objects.filter(author=author).count()
-    author_posts = Post.objects.filter(author=author).order_by('-pub_date')
-    followers_count = author.following.count()
-    following_count = author.follower.count()
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    author_profile = profile_of(author)
+    author_posts = Post.objects.for_feed().filter(author=author)
 
     following = False
+    recommended = []
     if request.user.is_authenticated:
         if request.user.username == username:
             following = 'Self'
-        if Follow.objects.filter(user=request.user).filter(author=author):
+            recommended = recommendations.for_user(request.user)
+        elif follow_graph.is_following(request.user, author):
             following = True
 
-    paginator = Paginator(author_posts, 6)
-    page = paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(author_posts, 6)
+    page = paginator.get_page(
+        request.GET.get('after'), request.GET.get('before')
+    )
 
     return render(request, 'profile.html', {
         'page': page,
         'paginator': paginator,
-        'posts_count': posts_count,
+        'posts_count': author_profile.posts_count,
         'author': author,
         'following': following,
-        'following_count': following_count,
-        'followers_count': followers_count
+        'recommended': recommended,
+        'following_count': author_profile.following_count,
+        'followers_count': author_profile.followers_count
     })
 
 
+@transaction.non_atomic_requests
+@scoped_page(lambda request, username, post_id: [
+    f'post:{post_id}', f'author:{username}', 'groups'
+])
 def post_view(request, username, post_id):
-    author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, author=author.id, id=post_id)
-    posts_count = Post.objects.filter(author=post.author).count()
-    comments = Comment.objects.filter(post=post)
-    followers_count = author.following.count()
-    following_count = author.follower.count()
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    post = get_object_or_404(
+        Post.objects.for_feed(), author=author.id, id=post_id
+    )
+    author_profile = profile_of(author)
+    comments = _comments(post)
+    page = _comments_page(request, comments)
+
+    reply_to = None
+    if request.user.is_authenticated and \
+            request.GET.get('reply_to', '').isdigit():
+        reply_to = post.comments.select_related('author').filter(
+            pk=request.GET['reply_to']
+        ).first()
 
     return render(request, 'post.html', {
-        'posts_count': posts_count,
+        'posts_count': author_profile.posts_count,
         'post': post,
         'form': CommentForm(),
+        # Lazy, only ``comments_page`` is rendered
         'comments': comments,
+        'comments_page': page,
+        'next_comments': _next_comments_url(post, page),
+        'pending_comments': writebehind.pending_comments(request.user, post),
+        'reply_to': reply_to,
         'author': author,
-        'followers_count': followers_count,
-        'following_count': following_count
+        'followers_count': author_profile.followers_count,
+        'following_count': author_profile.following_count
+    })
+
+
+def _comments(post):
+    return Comment.objects.filter(post=post).select_related(
+        'author', 'parent__author'
+    ).order_by('created', 'id')
+
+
+def _comments_page(request, comments):
+    paginator = CursorPaginator(comments, 20, ordering=('created', 'id'))
+    return paginator.get_page(request.GET.get('after'))
+
+
+def _next_comments_url(post, comments):
+    if comments.has_next():
+        url = reverse('post_comments', args=[post.author.username, post.id])
+        return f'{url}?after={comments.next_cursor}'
+
+
+@transaction.non_atomic_requests
+@scoped_page(lambda request, username, post_id: [f'post:{post_id}'])
+def post_comments(request, username, post_id):
+    """The comments after ``after``, rendered, for lazy loading."""
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        author__username=username, id=post_id,
+    )
+    page = _comments_page(request, _comments(post))
+    return JsonResponse({
+        'html': render_to_string('comment_items.html', {
+            'comments_page': page, 'post': post,
+        }, request=request),
+        'next': _next_comments_url(post, page),
     })
 
 
@@ -108,7 +232,9 @@ def post_edit(request, username, post_id):
     if request.method == 'POST':
         if form.is_valid():
             post = form.save(commit=False)
-            post.save()
+            # The counters may have moved since the post was read; the
+            # version is bumped in the same UPDATE.
+            post.save(update_fields=[*PostForm.Meta.fields, 'version'])
             return redirect('post', username=post.author, post_id=post.id)
         return render(request, 'new.html', form_content)
 
@@ -132,7 +258,11 @@ def add_comment(request, username, post_id):
             comment = form.save(commit=False)
             comment.post = post
             comment.author = request.user
-            comment.save()
+            parent = request.POST.get('parent', '')
+            if parent.isdigit():
+                comment.parent = post.comments.filter(pk=parent).first()
+            if not writebehind.comment(comment):
+                comment.save()
             return redirect(
                 'post', username=post.author.username, post_id=post.id
             )
@@ -152,31 +282,34 @@ def post_delete(request, username, post_id):
     return redirect('profile', username=post.author.username)
 
 
+@transaction.non_atomic_requests
 @login_required
+@scoped_page(lambda request: [
+    'global', f'author:{request.user.username}',
+    recommendations.scope(request.user.pk),
+])
 def follow_index(request):
-    posts = Post.objects.order_by('-pub_date').filter(
-        author__following__user=request.user
-    )
+    posts = follow_feed(request.user)
 
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, 10, ordering=FOLLOW_FEED_ORDERING)
+    page = paginator.get_page(
+        request.GET.get('after'), request.GET.get('before')
+    )
 
     return render(request, 'follow.html', {
         'page': page,
         'paginator': paginator,
+        'recommended': recommendations.for_user(request.user),
     })
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if author.username != request.user.username:
-        if Follow.objects.filter(user=request.user).filter(author=author):
-            return redirect('index')
-
-        followers = Follow(user=request.user, author=author)
-        followers.save()
+    if (author != request.user
+            and not follow_graph.is_following(request.user, author)
+            and not writebehind.follow(request.user, author)):
+        Follow.objects.get_or_create(user=request.user, author=author)
 
     return redirect('index')
 
@@ -184,7 +317,8 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    followers = Follow.objects.get(user=request.user, author=author)
-    followers.delete()
+    if not writebehind.unfollow(request.user, author):
+        followers = Follow.objects.get(user=request.user, author=author)
+        followers.delete()
 
     return redirect('index')
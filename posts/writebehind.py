@@ -0,0 +1,347 @@
+"""Write-behind queue for comments and follows.
+
+With ``WRITE_BEHIND`` set, the comment and follow views queue their
+writes instead of saving them, so a burst of comments on a popular post
+does not queue requests on the post row and the counters. A worker
+applies the queue a batch at a time through ``posts.bulk``: one
+transaction, one counter update per post or user, one cache bump per
+scope.
+
+``'thread'`` keeps the queue in-process and drains it on a worker
+thread; it is flushed when the process exits. ``'redis'`` pushes the
+writes to a Redis list of the cache server, drained by
+``manage.py apply_writes`` and by nothing else: web processes leave it
+alone when they exit. When ``WRITE_BEHIND_MAX_PENDING`` writes are
+waiting, ``comment``, ``follow`` and ``unfollow`` return ``False`` and
+the caller writes synchronously, which slows the writers down instead of
+growing the queue.
+
+Until a write is applied its author sees it through an overlay of their
+pending writes: ``pending_comments`` for the post page and
+``follow_graph.following`` for follows. The overlay is kept next to the
+queue, in-process for ``'thread'`` and in a Redis hash per user for
+``'redis'``, and every write adds or removes one entry, so concurrent
+requests and the worker never overwrite each other's. Applied comments
+are dated when they are applied, like any other insert; the queued date
+is only shown in the overlay.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import uuid
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+
+from . import bulk, follow_graph
+from .cache import bump
+from .models import Comment, Follow, Post, User
+
+QUEUE_KEY = 'writebehind:queue'
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_queue = None
+
+
+def _overlay_key(user_id):
+    return f'writebehind:pending:{user_id}'
+
+
+class ThreadQueue:
+    """In-process queue drained by a daemon thread."""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=settings.WRITE_BEHIND_MAX_PENDING)
+        self.overlay = defaultdict(dict)
+        self.overlay_lock = threading.Lock()
+        threading.Thread(
+            target=self.work, name='writebehind', daemon=True
+        ).start()
+        # The queued writes die with the process otherwise.
+        atexit.register(self.flush)
+
+    def add_pending(self, op):
+        with self.overlay_lock:
+            self.overlay[op['user']][op['id']] = op
+
+    def pending(self, user_id):
+        with self.overlay_lock:
+            return list(self.overlay.get(user_id, {}).values())
+
+    def settle(self, ops):
+        with self.overlay_lock:
+            for op in ops:
+                overlay = self.overlay.get(op['user'], {})
+                overlay.pop(op['id'], None)
+                if not overlay:
+                    self.overlay.pop(op['user'], None)
+
+    def push(self, op):
+        try:
+            self.queue.put_nowait(op)
+        except queue.Full:
+            return False
+        return True
+
+    def work(self):
+        while True:
+            # Writes arriving while a batch is applied make up the next.
+            ops = [self.queue.get()]
+            while len(ops) < settings.WRITE_BEHIND_BATCH_SIZE:
+                try:
+                    ops.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                apply(ops)
+            finally:
+                connection.close()
+                for _ in ops:
+                    self.queue.task_done()
+
+    def flush(self):
+        self.queue.join()
+
+
+class RedisQueue:
+    """Redis list shared by the web processes and ``apply_writes``."""
+
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+
+    def add_pending(self, op):
+        key = _overlay_key(op['user'])
+        pipe = self.redis.pipeline()
+        pipe.hset(key, op['id'], json.dumps(op))
+        pipe.expire(key, settings.WRITE_BEHIND_OVERLAY_TIMEOUT)
+        pipe.execute()
+
+    def pending(self, user_id):
+        return sorted(
+            (json.loads(op)
+             for op in self.redis.hvals(_overlay_key(user_id))),
+            key=itemgetter('created'),
+        )
+
+    def settle(self, ops):
+        done = defaultdict(list)
+        for op in ops:
+            done[_overlay_key(op['user'])].append(op['id'])
+        pipe = self.redis.pipeline()
+        for key, ids in done.items():
+            pipe.hdel(key, *ids)
+        pipe.execute()
+
+    def push(self, op):
+        if self.redis.llen(QUEUE_KEY) >= settings.WRITE_BEHIND_MAX_PENDING:
+            return False
+        self.redis.rpush(QUEUE_KEY, json.dumps(op))
+        return True
+
+    def pop(self, timeout=None):
+        """Pop up to a batch of writes, waiting ``timeout`` seconds."""
+        if timeout is None:
+            first = self.redis.lpop(QUEUE_KEY)
+        else:
+            first = self.redis.blpop(QUEUE_KEY, timeout)
+            first = first and first[1]
+        if first is None:
+            return []
+        pipe = self.redis.pipeline()
+        pipe.lrange(QUEUE_KEY, 0, settings.WRITE_BEHIND_BATCH_SIZE - 2)
+        pipe.ltrim(QUEUE_KEY, settings.WRITE_BEHIND_BATCH_SIZE - 1, -1)
+        rest, _ = pipe.execute()
+        return [json.loads(op) for op in [first, *rest]]
+
+    def flush(self):
+        while True:
+            ops = self.pop()
+            if not ops:
+                return
+            apply(ops)
+
+
+BACKENDS = {'thread': ThreadQueue, 'redis': RedisQueue}
+
+
+def get_queue():
+    global _queue
+    with _lock:
+        if _queue is None:
+            _queue = BACKENDS[settings.WRITE_BEHIND]()
+        return _queue
+
+
+def flush():
+    """Apply every queued write before returning."""
+    if settings.WRITE_BEHIND:
+        get_queue().flush()
+
+
+def pending(user):
+    """The queued writes of ``user`` that are not applied yet."""
+    if not settings.WRITE_BEHIND or not user.is_authenticated:
+        return []
+    return get_queue().pending(user.pk)
+
+
+def pending_comments(user, post):
+    """Unsaved comments ``user`` has queued on ``post``."""
+    return [
+        Comment(
+            author=user, post=post, text=op['text'],
+            created=parse_datetime(op['created']),
+        )
+        for op in pending(user)
+        if op['op'] == 'comment' and op['post'] == post.pk
+    ]
+
+
+def _enqueue(user, op, scopes):
+    if not settings.WRITE_BEHIND:
+        return False
+    op = dict(
+        op, id=uuid.uuid4().hex, user=user.pk,
+        created=timezone.now().isoformat(),
+    )
+    # The overlay goes first: the worker may apply the write, and drop it
+    # from the overlay, before ``push`` returns.
+    get_queue().add_pending(op)
+    if not get_queue().push(op):
+        _settle([op])
+        return False
+    bump(*scopes)
+    return True
+
+
+def comment(comment):
+    """Queue the unsaved ``comment``.
+
+    Returns ``False`` when write-behind is off or the queue is full and
+    the caller has to save the comment itself.
+    """
+    return _enqueue(comment.author, {
+        'op': 'comment',
+        'post': comment.post_id,
+        'parent': comment.parent_id,
+        'text': comment.text,
+    }, [f'post:{comment.post_id}'])
+
+
+def _follow_scopes(user, author):
+    return [
+        follow_graph.following_scope(user.pk),
+        follow_graph.followers_scope(author.pk),
+        f'author:{user.username}',
+        f'author:{author.username}',
+    ]
+
+
+def follow(user, author):
+    """Queue ``user`` following ``author``, see ``comment``."""
+    return _enqueue(
+        user, {'op': 'follow', 'author': author.pk},
+        _follow_scopes(user, author),
+    )
+
+
+def unfollow(user, author):
+    """Queue ``user`` unfollowing ``author``, see ``comment``."""
+    return _enqueue(
+        user, {'op': 'unfollow', 'author': author.pk},
+        _follow_scopes(user, author),
+    )
+
+
+def apply(ops):
+    """Apply a batch of queued writes in one transaction.
+
+    When the batch fails, its writes are retried one at a time so that a
+    single bad write only loses itself.
+    """
+    try:
+        with transaction.atomic():
+            _apply(ops)
+    except Exception:
+        logger.exception('Write-behind batch of %s failed', len(ops))
+        for op in ops:
+            try:
+                with transaction.atomic():
+                    _apply([op])
+            except Exception:
+                logger.exception('Dropped queued write %s', op)
+    _settle(ops)
+
+
+def _apply(ops):
+    comments = [op for op in ops if op['op'] == 'comment']
+    follows = [op for op in ops if op['op'] != 'comment']
+    users = User.objects.in_bulk(
+        {op['user'] for op in ops} | {op['author'] for op in follows}
+    )
+    if comments:
+        _apply_comments(comments, users)
+    if follows:
+        _apply_follows(follows, users)
+
+
+def _apply_comments(ops, users):
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        {op['post'] for op in ops}
+    )
+    parents = dict(Comment.objects.filter(
+        pk__in={op['parent'] for op in ops if op['parent']}
+    ).values_list('pk', 'post_id'))
+    by_post = defaultdict(list)
+    for op in ops:
+        post, author = posts.get(op['post']), users.get(op['user'])
+        # The post or the author may have been deleted meanwhile.
+        if post is None or author is None:
+            continue
+        by_post[post].append(Comment(
+            author=author, text=op['text'],
+            parent_id=op['parent'] if parents.get(op['parent']) == post.pk
+            else None,
+        ))
+    for post, comments in by_post.items():
+        bulk.add_comments(post, comments)
+
+
+def _apply_follows(ops, users):
+    # The last write on a pair wins.
+    wanted = {(op['user'], op['author']): op['op'] == 'follow' for op in ops}
+    existing = set(Follow.objects.filter(
+        user_id__in={user_id for user_id, _ in wanted},
+        author_id__in={author_id for _, author_id in wanted},
+    ).values_list('user_id', 'author_id'))
+    created, deleted = defaultdict(list), defaultdict(list)
+    for (user_id, author_id), following in wanted.items():
+        if user_id == author_id or not {user_id, author_id} <= users.keys():
+            continue
+        if following and (user_id, author_id) not in existing:
+            created[user_id].append(users[author_id])
+        elif not following and (user_id, author_id) in existing:
+            deleted[user_id].append(users[author_id])
+    for user_id, authors in deleted.items():
+        bulk.delete_follows(users[user_id], authors)
+    for user_id, authors in created.items():
+        bulk.create_follows(users[user_id], authors)
+
+
+def _settle(ops):
+    """Drop applied ``ops`` from the overlays of their authors."""
+    get_queue().settle(ops)
+    # Pages read while both the row and the overlay were there go stale.
+    bump(*{f'post:{op["post"]}' for op in ops if op['op'] == 'comment'})
+    follow_graph.changed(
+        [(op['user'], op['author']) for op in ops if op['op'] != 'comment']
+    )
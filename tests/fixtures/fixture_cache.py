@@ -0,0 +1,10 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Database rows are recreated between tests, cached fragments are not."""
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,22 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    """Views over their QUERY_BUDGETS entry fail the test."""
+    settings.QUERY_BUDGET_RAISE = True
+
+
+@pytest.fixture
+def assert_query_budget():
+    def check(client, url, budget, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, **extra)
+        assert response.status_code == 200, f'`{url}` returned {response.status_code}'
+        assert len(queries) <= budget, \
+            f'`{url}` ran {len(queries)} queries, the budget is {budget}:\n' + \
+            '\n'.join(query['sql'] for query in queries)
+        return response
+    return check
@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def sync_thumbnails(settings):
+    """Generate thumbnails inline so that tests see them at once."""
+    settings.THUMBNAIL_EXECUTOR = 'sync'
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Keep uploads and thumbnails out of the project directory."""
+    settings.MEDIA_ROOT = str(tmp_path)
@@ -0,0 +1,64 @@
+import pytest
+from django.utils import timezone
+
+from api.pagination import CursorPagination
+from posts.dumps import keeping_dates
+from posts.models import Comment, Post
+
+
+@pytest.fixture
+def posts(user):
+    # Equal dates make the id decide the order.
+    now = timezone.now()
+    with keeping_dates():
+        Post.objects.bulk_create(
+            Post(text=f'Post {i}', author=user, pub_date=now) for i in range(25)
+        )
+    return list(Post.objects.order_by('-pub_date', '-id'))
+
+
+class TestApiPagination:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_walk_posts(self, client, posts, assert_query_budget):
+        seen, url = [], '/api/v1/posts/?limit=10'
+        while url:
+            data = assert_query_budget(client, url, 2).json()
+            seen += [post['id'] for post in data['results']]
+            url = data['next']
+        assert seen == [post.id for post in posts], \
+            'Check that posts are paginated newest first without gaps'
+
+        data = client.get('/api/v1/posts/?limit=10').json()
+        data = client.get(data['next']).json()
+        previous = client.get(data['previous']).json()
+        assert [post['id'] for post in previous['results']] == seen[:10]
+        assert previous['previous'] is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_page_size_cap(self, client, posts, monkeypatch):
+        data = client.get('/api/v1/posts/').json()
+        assert len(data['results']) == 10
+        monkeypatch.setattr(CursorPagination, 'max_page_size', 3)
+        data = client.get('/api/v1/posts/?limit=1000').json()
+        assert len(data['results']) == 3, 'Check that `limit` is capped'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments_oldest_first(self, client, user, post):
+        for i in range(3):
+            Comment.objects.create(post=post, author=user, text=f'Comment {i}')
+        data = client.get(f'/api/v1/posts/{post.id}/comments/?limit=2').json()
+        assert [c['text'] for c in data['results']] == ['Comment 0', 'Comment 1']
+        data = client.get(data['next']).json()
+        assert [c['text'] for c in data['results']] == ['Comment 2']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sparse_fieldsets(self, client, post):
+        data = client.get('/api/v1/posts/?fields=id,text').json()
+        assert data['results'] == [{'id': post.id, 'text': post.text}]
+        data = client.get(f'/api/v1/posts/{post.id}/?fields=author').json()
+        assert data == {'author': post.author.username}
+
+        response = client.get('/api/v1/posts/?fields=id,password')
+        assert response.status_code == 400
+        assert 'password' in response.json()['fields'][0]
@@ -0,0 +1,162 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts import search
+from posts.models import Comment, FeedEntry, Follow, Post
+from users.models import Profile
+
+
+@pytest.fixture
+def api(client, user):
+    token = AccessToken.for_user(user)
+
+    def post(url, data):
+        response = client.post(
+            url, data, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+        assert response.status_code == 200, response.content
+        return [
+            (result['status'], result.get('data', result.get('errors')))
+            for result in response.json()['results']
+        ]
+    return post
+
+
+@pytest.fixture
+def reader(user):
+    reader = get_user_model().objects.create_user(username='Reader')
+    Follow.objects.create(user=reader, author=user)
+    return reader
+
+
+class TestBulk:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_posts(self, api, user, reader):
+        results = api('/api/v1/posts/bulk/', [
+            {'text': 'First bulk'}, {'text': ''}, {'text': 'Second bulk'},
+        ])
+        assert [status for status, _ in results] == [201, 400, 201]
+        assert 'text' in results[1][1], 'Check that invalid items get errors'
+        first, second = results[0][1], results[2][1]
+        assert (first['text'], first['author']) == ('First bulk', user.username)
+
+        assert Profile.objects.get(user=user).posts_count == 2
+        assert FeedEntry.objects.filter(user=reader).count() == 2, \
+            'Check that bulk posts are fanned out to followers'
+        assert [pk for _, pk in search.get_backend().search('bulk', 10)] \
+            in ([first['id'], second['id']], [second['id'], first['id']])
+
+        other = Post.objects.create(text='Not mine', author=reader)
+        results = api('/api/v1/posts/bulk-delete/', [first['id'], other.pk, 0])
+        assert [status for status, _ in results] == [204, 403, 404]
+        assert list(Post.objects.filter(author=user).values_list(
+            'text', flat=True
+        )) == ['Second bulk']
+        assert Profile.objects.get(user=user).posts_count == 1
+        assert [pk for _, pk in search.get_backend().search('bulk', 10)] == [
+            second['id']
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments(self, api, user, reader):
+        post = Post.objects.create(text='Commented', author=user)
+        url = f'/api/v1/posts/{post.pk}/comments/'
+        results = api(url + 'bulk/', [{'text': 'One'}, {}, {'text': 'Two'}])
+        assert [status for status, _ in results] == [201, 400, 201]
+        assert results[0][1]['post'] == post.pk
+        post.refresh_from_db()
+        assert post.comments_count == 2
+
+        other = Comment.objects.create(post=post, author=reader, text='Hi')
+        results = api(url + 'bulk-delete/', [
+            results[0][1]['id'], other.pk, 'x'
+        ])
+        assert [status for status, _ in results] == [204, 403, 404]
+        post.refresh_from_db()
+        assert post.comments_count == 2
+        assert sorted(post.comments.values_list('text', flat=True)) == [
+            'Hi', 'Two'
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follows(self, api, user, reader):
+        author = get_user_model().objects.create_user(username='Author')
+        Post.objects.create(text='Backfilled', author=author)
+        results = api('/api/v1/follow/bulk/', [
+            {'author': 'Author'}, {'author': 'Author'}, {'author': 'Nobody'},
+            {'author': user.username}, {'author': 'Reader'},
+        ])
+        assert [status for status, _ in results] == [201, 400, 400, 400, 201]
+        assert results[0][1] == {'user': user.username, 'author': 'Author'}
+        assert Profile.objects.get(user=user).following_count == 2
+        assert Profile.objects.get(user=author).followers_count == 1
+        assert FeedEntry.objects.filter(user=user, author=author).exists(), \
+            'Check that bulk follows backfill the timeline'
+
+        results = api('/api/v1/follow/bulk-delete/', ['Author', 'Nobody'])
+        assert [status for status, _ in results] == [204, 404]
+        assert Profile.objects.get(user=user).following_count == 1
+        assert Profile.objects.get(user=author).followers_count == 0
+        assert not FeedEntry.objects.filter(user=user, author=author).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_dates_stay_automatic(self, monkeypatch, api, user):
+        fields = [Post._meta.get_field('pub_date'), Comment._meta.get_field('created')]
+        switched, real = [], QuerySet.bulk_create
+
+        def bulk_create(queryset, objs, **kwargs):
+            if queryset.model not in (Post, Comment):
+                return real(queryset, objs, **kwargs)
+            switched.extend(not field.auto_now_add for field in fields)
+            for obj in objs:
+                obj.save_base(raw=True, force_insert=True)
+
+        # What bulk_create does where it returns the new keys.
+        monkeypatch.setattr(connection.features, 'can_return_ids_from_bulk_insert', True)
+        monkeypatch.setattr(QuerySet, 'bulk_create', bulk_create)
+        results = api('/api/v1/posts/bulk/', [{'text': 'Dated'}])
+        api(f'/api/v1/posts/{results[0][1]["id"]}/comments/bulk/', [{'text': 'Dated'}])
+        assert switched and not any(switched), \
+            'Check that bulk writes leave auto_now_add on for other threads'
+        assert Comment.objects.get().created >= Post.objects.get().pub_date
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rejects_bad_requests(self, client, api, user):
+        url = '/api/v1/posts/bulk/'
+        assert client.post(url, [{'text': 'x'}],
+                           content_type='application/json').status_code == 401
+        token = AccessToken.for_user(user)
+        for data in ({'text': 'x'}, [], [{'text': 'x'}] * 1001):
+            response = client.post(
+                url, data, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {token}',
+            )
+            assert response.status_code == 400
+        assert not Post.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fewer_queries_than_one_by_one(self, settings, client, api,
+                                           user, reader):
+        # The budgets are for reads; a create runs under the list's name.
+        settings.QUERY_BUDGET_RAISE = False
+        token = AccessToken.for_user(user)
+        with CaptureQueriesContext(connection) as one_by_one:
+            for i in range(20):
+                client.post(
+                    '/api/v1/posts/', {'text': f'Single {i}'},
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Bearer {token}',
+                )
+        with CaptureQueriesContext(connection) as batched:
+            api('/api/v1/posts/bulk/', [
+                {'text': f'Bulk {i}'} for i in range(20)
+            ])
+        assert Post.objects.count() == 40
+        assert len(batched) * 2 < len(one_by_one), \
+            f'{len(batched)} queries in bulk, {len(one_by_one)} one by one'
@@ -0,0 +1,134 @@
+import io
+import re
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts import bulk
+from posts.cache import bump
+from posts.dumps import Importer, export, keeping_dates
+from posts.models import Comment, Post
+
+
+def add_comments(post, author, count):
+    start = timezone.now() - timedelta(days=1)
+    with keeping_dates():
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text=f'Comment {i}',
+                    created=start + timedelta(seconds=i))
+            for i in range(count)
+        )
+
+
+def texts(html):
+    return re.findall(r'Comment \d+', html)
+
+
+class TestCommentThreads:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_and_lazy_loading(self, client, user):
+        post = Post.objects.create(text='Popular', author=user)
+        add_comments(post, user, 45)
+        url = f'/{user.username}/{post.id}/'
+
+        response = client.get(url)
+        assert texts(response.content.decode()) == [f'Comment {i}' for i in range(20)]
+        page = client.get(response.context['next_comments']).json()
+        assert texts(page['html']) == [f'Comment {i}' for i in range(20, 40)]
+        page = client.get(page['next']).json()
+        assert texts(page['html']) == [f'Comment {i}' for i in range(40, 45)]
+        assert page['next'] is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_queries_do_not_grow_with_comments(self, client, user, django_user_model):
+        post = Post.objects.create(text='Popular', author=user)
+        url = f'/{user.username}/{post.id}/'
+
+        def queries(total):
+            others = [django_user_model.objects.create_user(username=f'U{total}-{i}')
+                      for i in range(3)]
+            for other in others:
+                add_comments(post, other, (total - post.comments.count()) // 3)
+            bump(f'post:{post.pk}')
+            with CaptureQueriesContext(connection) as captured:
+                assert client.get(url).status_code == 200
+            return len(captured)
+
+        assert queries(30) == queries(3000)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_replies(self, user_client, user):
+        post = Post.objects.create(text='Threaded', author=user)
+        other = Post.objects.create(text='Other', author=user)
+        parent = Comment.objects.create(post=post, author=user, text='Parent')
+        foreign = Comment.objects.create(post=other, author=user, text='Foreign')
+        url = f'/{user.username}/{post.id}/comment'
+
+        response = user_client.get(f'/{user.username}/{post.id}/?reply_to={parent.id}')
+        assert f'name="parent" value="{parent.id}"' in response.content.decode()
+        user_client.post(url, {'text': 'Reply', 'parent': parent.id})
+        user_client.post(url, {'text': 'Stray', 'parent': foreign.id})
+        assert Comment.objects.get(text='Reply').parent == parent
+        assert Comment.objects.get(text='Stray').parent is None, \
+            'Check that replies only go to comments of the same post'
+        assert 'in reply to' in user_client.get(f'/{user.username}/{post.id}/').content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_deleting_parent_keeps_replies(self, client, user, django_user_model):
+        other = django_user_model.objects.create_user(username='Replier')
+        post = Post.objects.create(text='Threaded', author=user)
+        parent = Comment.objects.create(post=post, author=user, text='Parent')
+        reply = Comment.objects.create(post=post, author=other, text='Reply', parent=parent)
+        nested = Comment.objects.create(post=post, author=other, text='Nested', parent=reply)
+
+        parent.delete()
+        post.refresh_from_db()
+        assert post.comments_count == 2, \
+            "Check that deleting a comment keeps other users' replies"
+        reply.refresh_from_db()
+        assert reply.parent is None
+        content = client.get(f'/{user.username}/{post.id}/').content.decode()
+        assert 'Reply' in content and 'Nested' in content
+
+        bulk.delete_comments(post, [reply])
+        post.refresh_from_db()
+        assert post.comments_count == 1
+        assert Comment.objects.get(pk=nested.pk).parent is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api(self, client, user):
+        post = Post.objects.create(text='Threaded', author=user)
+        other = Post.objects.create(text='Other', author=user)
+        parent = Comment.objects.create(post=post, author=user, text='Parent')
+        Comment.objects.create(post=post, author=user, text='Reply', parent=parent)
+        foreign = Comment.objects.create(post=other, author=user, text='Foreign')
+
+        results = client.get(f'/api/v1/posts/{post.id}/comments/').json()['results']
+        assert [r['parent'] for r in results] == [None, parent.id]
+
+        response = client.post(
+            f'/api/v1/posts/{post.id}/comments/',
+            {'text': 'Stray', 'post': post.id, 'parent': foreign.id},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}',
+        )
+        assert response.status_code == 400
+        assert 'parent' in response.json()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_dump_keeps_replies(self, user):
+        post = Post.objects.create(text='Threaded', author=user)
+        parent = Comment.objects.create(post=post, author=user, text='Parent')
+        Comment.objects.create(post=post, author=user, text='Reply', parent=parent)
+        stream = io.StringIO()
+        export(stream)
+        Post.objects.all().delete()
+
+        Importer('threads').run(lambda: io.StringIO(stream.getvalue()))
+        assert Comment.objects.get(text='Reply').parent == Comment.objects.get(text='Parent'), \
+            'Check that replies to comments of the same batch are imported'
@@ -0,0 +1,46 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment
+
+
+class TestConditionalGet:
+
+    def check_revalidation(self, client, url):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.get('ETag')
+        assert etag, f'Check that `{url}` sends an ETag'
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, f'Check that `{url}` answers 304 to a matching ETag'
+        assert not [q for q in queries if q['sql'].startswith('SELECT "posts_')], \
+            'Check that a 304 is sent before the page is built'
+        return etag
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('logged_in', [False, True])
+    def test_html_pages(self, client, user, post_with_group, logged_in):
+        if logged_in:
+            client.force_login(user)
+        post = post_with_group
+        for url in ['/', f'/group/{post.group.slug}/', f'/{user.username}/']:
+            self.check_revalidation(client, url)
+
+        url = f'/{user.username}/{post.id}/'
+        etag = self.check_revalidation(client, url)
+        Comment.objects.create(post=post, author=user, text='Changes the page')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, 'Check that a write changes the ETag'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api(self, client, user, post):
+        self.check_revalidation(client, '/api/v1/posts/')
+        etag = self.check_revalidation(client, f'/api/v1/posts/{post.id}/')
+        self.check_revalidation(client, f'/api/v1/posts/{post.id}/comments/')
+
+        post.text = 'Edited'
+        post.save()
+        response = client.get(f'/api/v1/posts/{post.id}/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
@@ -0,0 +1,98 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Post
+from users.models import Profile
+
+
+class TestCounters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counters_follow_writes(self, user, post):
+        reader = get_user_model().objects.create_user(username='Reader')
+        comment = Comment.objects.create(post=post, author=reader, text='Hi')
+        follow = Follow.objects.create(user=reader, author=user)
+
+        post.refresh_from_db()
+        assert post.comments_count == 1, 'Check that comments are counted'
+        profile = Profile.objects.get(user=user)
+        assert profile.posts_count == 1
+        assert profile.followers_count == 1
+        assert Profile.objects.get(user=reader).following_count == 1
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        profile.refresh_from_db()
+        assert post.comments_count == 0
+        assert profile.followers_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_recount_repairs_drift(self, user, post):
+        Post.objects.filter(pk=post.pk).update(comments_count=42)
+        Profile.objects.filter(user=user).update(posts_count=7)
+        call_command('recount_counters', stdout=open('/dev/null', 'w'))
+        post.refresh_from_db()
+        assert post.comments_count == 0
+        assert Profile.objects.get(user=user).posts_count == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_runs_no_aggregates(self, client, post):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/{post.author.username}/')
+        assert response.status_code == 200
+        assert not [q for q in queries if 'COUNT(' in q['sql'].upper()], \
+            'Check that the profile page reads the stored counters'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_of_loaded_users(self, settings, client):
+        # The dump's images miss their thumbnails, which costs lookups.
+        settings.QUERY_BUDGET_RAISE = False
+        # Content type ids of the test database differ from the dump's.
+        call_command(
+            'loaddata', 'dump_yatube.json', verbosity=0,
+            exclude=['admin', 'auth.permission'],
+        )
+        assert not Profile.objects.exists()
+
+        response = client.get('/john_traveller/')
+        assert response.status_code == 200, \
+            'Check that users loaded from fixtures have a profile page'
+        assert response.context['posts_count'] == 4
+        post = Post.objects.filter(author__username='evi_roman').first()
+        assert client.get(f'/evi_roman/{post.pk}/').status_code == 200
+        assert Profile.objects.count() == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_edit_keeps_concurrent_counts(self, user, post):
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=user, text='Meanwhile')
+        version = Post.objects.get(pk=post.pk).version
+
+        stale.text = 'Edited'
+        stale.save(update_fields=['group', 'text', 'image'])
+        post.refresh_from_db()
+        assert post.text == 'Edited'
+        assert post.comments_count == 1, \
+            'Check that editing a post does not write its counters back'
+        assert post.version == version + 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_edit_bumps_version_in_one_update(self, user_client, user, post):
+        stale_version = post.version
+        Comment.objects.create(post=post, author=user, text='Meanwhile')
+        version = Post.objects.get(pk=post.pk).version
+        assert version > stale_version
+
+        with CaptureQueriesContext(connection) as queries:
+            user_client.post(f'/{user.username}/{post.pk}/edit/',
+                             data={'text': 'Edited'})
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "posts_post"')]
+        assert len(updates) == 1, \
+            'Check that editing a post bumps its version in the same UPDATE'
+        post.refresh_from_db()
+        assert post.text == 'Edited' and post.version == version + 1
@@ -0,0 +1,79 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from posts.dumps import Importer, read_records
+from posts.models import Comment, FeedEntry, Follow, Group, ImportedRow, Post, User
+
+DUMP = 'dump_yatube.json'
+
+
+def open_dump():
+    return open(DUMP, encoding='utf-8')
+
+
+class TestDumps:
+
+    def test_read_records_streams_arrays_and_ndjson(self):
+        records = [{'model': 'posts.group', 'pk': i, 'fields': {'title': 'x' * i}}
+                   for i in range(1, 40)]
+        array = io.StringIO(json.dumps(records))
+        ndjson = io.StringIO('\n'.join(json.dumps(r) for r in records) + '\n')
+        assert list(read_records(array, chunk_size=7)) == records
+        assert list(read_records(ndjson, chunk_size=7)) == records
+
+    @pytest.mark.django_db(transaction=True)
+    def test_import_remaps_and_repairs(self):
+        User.objects.create_user(username='admin')
+        stats = Importer('dump', batch_size=2).run(open_dump)
+
+        assert stats['auth.user']['matched'] == 1, \
+            'Check that existing users are matched by username'
+        assert Post.objects.count() == 7 and Comment.objects.count() == 5
+        assert Follow.objects.count() == 5 and Group.objects.count() == 2
+        post = Post.objects.get(text__startswith='The view of the Kremlin')
+        assert post.pub_date.isoformat() == '2020-07-22T07:05:55.310000+00:00', \
+            'Check that dumped dates are kept'
+        assert post.comments_count == post.comments.count(), \
+            'Check that counters are repaired after the import'
+        assert FeedEntry.objects.exists(), 'Check that timelines are rebuilt'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_import_resumes(self, monkeypatch):
+        importer = Importer('dump', batch_size=2)
+        calls = []
+        original = importer.import_batch
+
+        def interrupted(spec, records):
+            calls.append(spec)
+            if len(calls) == 5:
+                raise KeyboardInterrupt
+            original(spec, records)
+
+        monkeypatch.setattr(importer, 'import_batch', interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            importer.run(open_dump)
+        partial = ImportedRow.objects.count()
+        assert 0 < partial < 24
+
+        stats = Importer('dump', batch_size=2).run(open_dump)
+        assert sum(counts['resumed'] for counts in stats.values()) == partial
+        assert Post.objects.count() == 7 and User.objects.count() == 5
+
+    @pytest.mark.django_db(transaction=True)
+    def test_export_round_trip(self, tmp_path):
+        Importer('dump').run(open_dump)
+        output = tmp_path / 'yatube.ndjson'
+        call_command('export_yatube', str(output), stderr=io.StringIO())
+        lines = output.read_text().splitlines()
+        assert len(lines) == 24
+        assert all(json.loads(line)['model'] for line in lines)
+
+        stdout = io.StringIO()
+        call_command('import_yatube', str(output), stdout=stdout)
+        assert 'rows/s' in stdout.getvalue()
+        assert Post.objects.count() == 14, \
+            'Check that posts of another dump are imported with new keys'
+        assert User.objects.count() == 5
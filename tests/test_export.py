@@ -0,0 +1,90 @@
+import json
+import tracemalloc
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from api.views import ExportView
+from posts.dumps import keeping_dates
+from posts.models import Comment, Post
+
+
+def content(response):
+    assert response.status_code == 200
+    return b''.join(response.streaming_content).decode()
+
+
+def ndjson(response):
+    return [json.loads(line) for line in content(response).splitlines()]
+
+
+class TestExport:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_posts_match_the_api(self, client, user, post_with_group):
+        Post.objects.create(text='Line\u2028separator', author=user)
+        listed = client.get('/api/v1/posts/').json()['results'][::-1]
+        response = client.get('/api/v1/export/posts.ndjson')
+        assert response['Content-Type'] == 'application/x-ndjson'
+        assert ndjson(response) == listed
+        assert json.loads(content(client.get('/api/v1/export/posts.json'))) == listed
+        assert '\\u2028' in content(client.get('/api/v1/export/posts.json'))
+
+        Post.objects.all().delete()
+        assert content(client.get('/api/v1/export/posts.json')) == '[]'
+        assert content(client.get('/api/v1/export/posts.ndjson')) == ''
+
+    @pytest.mark.django_db(transaction=True)
+    def test_filters_and_resume(self, client, user, post, post_with_group,
+                                django_user_model):
+        other = django_user_model.objects.create_user(username='other')
+        old = timezone.now() - timedelta(days=30)
+        with keeping_dates():
+            Post.objects.bulk_create([Post(text='Old', author=other, pub_date=old)])
+        url = '/api/v1/export/posts.ndjson'
+
+        def texts(**params):
+            return [r['text'] for r in ndjson(client.get(url, params))]
+
+        assert texts(author='other') == ['Old']
+        assert texts(group=post_with_group.group_id) == [post_with_group.text]
+        assert texts(until=(old + timedelta(days=1)).isoformat()) == ['Old']
+        assert texts(since=(old + timedelta(days=1)).isoformat()) == [
+            post.text, post_with_group.text
+        ]
+        assert texts(after=post.id) == [post_with_group.text, 'Old'], \
+            'Check that `after` resumes after the last id received'
+        assert texts(fields='text', author='other') == ['Old']
+
+        for params in ({'since': 'yesterday'}, {'after': 'x'}, {'group': 'x'}):
+            assert client.get(url, params).status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments(self, client, user, post):
+        Comment.objects.create(post=post, author=user, text='First')
+        records = ndjson(client.get('/api/v1/export/comments.ndjson', {'post': post.id}))
+        assert [(r['text'], r['post'], r['author']) for r in records] == [
+            ('First', post.id, user.username)
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_memory_stays_flat(self, client, user, monkeypatch):
+        monkeypatch.setattr(ExportView, 'chunk_size', 50)
+
+        def peak(total):
+            Post.objects.bulk_create(
+                Post(text='x' * 500, author=user)
+                for _ in range(total - Post.objects.count())
+            )
+            response = client.get('/api/v1/export/posts.ndjson', {'fields': 'id,text'})
+            tracemalloc.start()
+            rows = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            size = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert rows == total
+            return size
+
+        small, large = peak(200), peak(2000)
+        assert large < small * 1.5, \
+            f'Check that memory does not grow with the rows exported ({small} -> {large})'
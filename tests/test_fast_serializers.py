@@ -0,0 +1,44 @@
+import pytest
+
+from api.views import CommentViewSet, PostViewSet
+from posts.models import Comment, Post
+from tests.test_thumbnails import image_file
+
+
+class TestValuesSerializers:
+
+    def both(self, client, monkeypatch, viewset, url):
+        fast = client.get(url).content
+        monkeypatch.setattr(viewset, 'values_serializer_class', None)
+        slow = client.get(url).content
+        monkeypatch.undo()
+        return fast, slow
+
+    @pytest.mark.django_db(transaction=True)
+    def test_posts_match_model_serializer(self, client, monkeypatch, user,
+                                          post_with_group):
+        Post.objects.create(text='С картинкой "quoted" ☃', author=user, image=image_file())
+        Post.objects.create(text='No image', author=user)
+        for url in ['/api/v1/posts/', '/api/v1/posts/?limit=2',
+                    '/api/v1/posts/?fields=author,pub_date',
+                    f'/api/v1/posts/?group={post_with_group.group_id}']:
+            fast, slow = self.both(client, monkeypatch, PostViewSet, url)
+            assert fast == slow, f'Check that `{url}` renders the same bytes'
+        assert b'image_variants' in fast and b'webp' in client.get('/api/v1/posts/').content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments_match_model_serializer(self, client, monkeypatch, user, post):
+        for i in range(3):
+            Comment.objects.create(post=post, author=user, text=f'Комментарий {i}')
+        for url in [f'/api/v1/posts/{post.id}/comments/',
+                    f'/api/v1/posts/{post.id}/comments/?limit=2&fields=text']:
+            fast, slow = self.both(client, monkeypatch, CommentViewSet, url)
+            assert fast == slow, f'Check that `{url}` renders the same bytes'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_over_values(self, client, user):
+        for i in range(3):
+            Post.objects.create(text=f'Post {i}', author=user)
+        data = client.get('/api/v1/posts/?limit=2&fields=text').json()
+        data = client.get(data['next']).json()
+        assert data['results'] == [{'text': 'Post 0'}]
@@ -0,0 +1,30 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from posts.seeding import seed
+
+
+def explain(*args):
+    out = io.StringIO()
+    call_command('explain_feeds', *args, stdout=out)
+    return out.getvalue()
+
+
+class TestFeedIndexes:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_explain_before_and_after(self, settings):
+        settings.SEARCH_BACKEND = 'posts.search.PythonBackend'
+        seed(users=20, posts=300, groups=2, comments=100, follows=3)
+        before = explain('--before')
+        assert '_075f1d_idx' not in before and '_9660d8_idx' not in before, \
+            'Check that --before plans the queries without the feed indexes'
+        after = explain()
+        assert 'posts_comme_post_id_9660d8_idx' in after
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, 'posts_post')
+        assert 'posts_post_author__075f1d_idx' in indexes, \
+            'Check that the dropped indexes are restored'
@@ -0,0 +1,117 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+
+from posts.feeds import FOLLOW_FEED_ORDERING, follow_feed
+from posts.models import FeedEntry, Follow, Post
+from posts.pagination import CursorPaginator
+from posts.seeding import seed
+
+
+def feed_paginator(user, per_page=10):
+    return CursorPaginator(follow_feed(user), per_page, FOLLOW_FEED_ORDERING)
+
+
+def feed(user):
+    return list(feed_paginator(user).get_page())
+
+
+class TestFollowFeed:
+
+    @pytest.fixture
+    def author(self):
+        return get_user_model().objects.create_user(username='FeedAuthor')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_on_write(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Fanned out', author=author)
+        assert FeedEntry.objects.filter(user=user, post=post).exists(), \
+            'Check that a new post is pushed to the timelines of followers'
+        assert feed(user) == [post]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_backfills_and_unfollow_prunes(self, user, author):
+        old_post = Post.objects.create(text='Before follow', author=author)
+        follow = Follow.objects.create(user=user, author=author)
+        assert feed(user) == [old_post], \
+            'Check that following an author backfills their posts'
+
+        follow.delete()
+        assert not FeedEntry.objects.filter(user=user).exists(), \
+            'Check that unfollowing prunes the timeline'
+        assert not feed(user)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_popular_author_merged_on_read(self, settings, user, author):
+        settings.FEED_FANOUT_MAX_FOLLOWERS = 0
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Popular post', author=author)
+        assert not FeedEntry.objects.exists(), \
+            'Check that posts of popular authors are not fanned out'
+        assert feed(user) == [post], \
+            'Check that posts of popular authors are merged at read time'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_timeline_and_popular_authors_page_together(self, settings, user,
+                                                         author):
+        settings.FEED_FANOUT_MAX_FOLLOWERS = 1
+        users = get_user_model().objects
+        star, reader = users.create_user('Star'), users.create_user('Reader')
+        Follow.objects.create(user=user, author=author)
+        Follow.objects.create(user=user, author=star)
+        Follow.objects.create(user=reader, author=star)
+        posts = [
+            Post.objects.create(text=f'Post {i}', author=[author, star][i % 2])
+            for i in range(7)
+        ]
+        entries = FeedEntry.objects.filter(user=user)
+        assert [(e.post_id, e.pub_date) for e in entries.order_by('post')] == [
+            (post.pk, post.pub_date) for post in posts[::2]
+        ], 'Check that timeline entries carry the date of their post'
+
+        expected = posts[::-1]
+        paginator = feed_paginator(user, per_page=3)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        third = paginator.get_page(after=second.next_cursor)
+        assert [list(first), list(second), list(third)] == [
+            expected[:3], expected[3:6], expected[6:]
+        ], 'Check that the timeline and popular authors are merged in order'
+        assert not third.has_next()
+        back = paginator.get_page(before=third.previous_cursor)
+        assert list(back) == expected[3:6] and back.has_previous()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_timeline_page_walks_the_index(self, settings):
+        settings.SEARCH_BACKEND = 'posts.search.PythonBackend'
+        seed(users=20, posts=300, groups=2, comments=10, follows=3)
+        reader = get_user_model().objects.annotate(
+            entries=Count('feed_entries')
+        ).order_by('-entries').first()
+        paginator = feed_paginator(reader)
+        executed = []
+
+        def record(execute, sql, params, many, context):
+            executed.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.cursor() as db:
+            db.execute('ANALYZE')
+            try:
+                page = paginator.get_page()
+                with connection.execute_wrapper(record):
+                    paginator.get_page(after=page.next_cursor)
+                sql, params = next(
+                    query for query in executed if 'posts_feedentry' in query[0]
+                )
+                db.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(row[-1] for row in db.fetchall())
+                assert 'posts_feede_user_id_cbce2a_idx' in plan, \
+                    'Check that a timeline page is read from the timeline index'
+                assert 'TEMP B-TREE' not in plan, \
+                    'Check that a timeline page is not sorted in a temporary b-tree'
+            finally:
+                db.execute('DELETE FROM sqlite_stat1')
+                db.execute('ANALYZE sqlite_master')
@@ -3,7 +3,7 @@ import tempfile
 
 import pytest
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator, Page
+from posts.pagination import CursorPage, CursorPaginator
 from django.db.models import fields
 
 try:
@@ -111,12 +111,12 @@ class TestFollow:
         response = self.check_url(user_client, f'/follow', '/follow/')
         assert 'paginator' in response.context, \
             'Check that you passed the `paginator` variable into the context of the `/follow/` page'
-        assert type(response.context['paginator']) == Paginator, \
-            'Check that the `paginator` variable type `Paginator` on the `/follow/` page'
+        assert type(response.context['paginator']) == CursorPaginator, \
+            'Check that the `paginator` variable type `CursorPaginator` on the `/follow/` page'
         assert 'page' in response.context, \
             'Check that you passed the `page` variable into the context of the `/follow/` page'
-        assert type(response.context['page']) == Page, \
-            'Check that the `page` variable type `Page` on the `/follow/` page'
+        assert type(response.context['page']) == CursorPage, \
+            'Check that the `page` variable type `CursorPage` on the `/follow/` page'
         assert len(response.context['page']) == 2, \
             'Check that on the `/follow/` posts of the authors you followed to'
 
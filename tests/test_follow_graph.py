@@ -0,0 +1,61 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import bulk, follow_graph
+from posts.models import Follow, Post
+
+
+@pytest.fixture
+def authors():
+    return [
+        get_user_model().objects.create_user(username=f'Author{i}')
+        for i in range(3)
+    ]
+
+
+class TestFollowGraph:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sets_follow_writes(self, user, authors):
+        first, second, third = authors
+        Follow.objects.create(user=user, author=first)
+        ids = [author.pk for author in authors]
+        assert follow_graph.followed_among(user, ids) == {first.pk}
+        assert follow_graph.followers(first) == {user.pk}
+
+        Follow.objects.create(user=user, author=second)
+        assert follow_graph.followed_among(user, ids) == {first.pk, second.pk}, \
+            'Check that a follow invalidates the cached set'
+        Follow.objects.filter(author=first).delete()
+        assert follow_graph.followed_among(user, ids) == {second.pk}
+        assert follow_graph.followers(first) == set()
+
+        bulk.create_follows(user, [third])
+        bulk.delete_follows(user, [second])
+        assert follow_graph.followed_among(user, ids) == {third.pk}, \
+            'Check that bulk writes invalidate the cached set'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_warm_lookups_run_no_queries(self, user, authors):
+        Follow.objects.create(user=user, author=authors[0])
+        follow_graph.following(user)
+        with CaptureQueriesContext(connection) as queries:
+            assert follow_graph.is_following(user, authors[0])
+            assert not follow_graph.is_following(user, authors[1])
+        assert len(queries) == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cards_show_follow_state(self, user_client, user, authors):
+        Post.objects.create(text='Followed author', author=authors[0])
+        Post.objects.create(text='Other author', author=authors[1])
+        content = user_client.get('/').content.decode()
+        assert 'Following</span>' not in content
+
+        etag = user_client.get('/')['ETag']
+        Follow.objects.create(user=user, author=authors[0])
+        response = user_client.get('/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Check that following changes the ETag of the index'
+        assert response.content.decode().count('Following</span>') == 1
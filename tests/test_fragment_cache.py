@@ -0,0 +1,40 @@
+import pytest
+
+from posts.models import Comment, Group, Post
+
+
+class TestPostCardCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_card_is_cached_until_version_changes(self, client, post_with_group):
+        post = post_with_group
+        client.get(f'/{post.author.username}/')
+        # A write that bypasses the signals does not invalidate the card
+        Post.objects.filter(pk=post.pk).update(text='Silent change')
+        response = client.get(f'/{post.author.username}/')
+        assert 'Silent change' not in response.content.decode(), \
+            'Check that post cards are served from the fragment cache'
+
+        post.refresh_from_db()
+        post.text = 'Edited text'
+        post.save()
+        response = client.get(f'/{post.author.username}/')
+        assert 'Edited text' in response.content.decode(), \
+            'Check that saving a post invalidates its card'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_is_fresh_after_writes(self, client, user, post_with_group):
+        client.get('/')
+        new_post = Post.objects.create(text='Brand new post', author=user)
+        assert 'Brand new post' in client.get('/').content.decode(), \
+            'Check that a new post shows up on the index page right away'
+
+        Comment.objects.create(post=new_post, author=user, text='First!')
+        assert '1 comments' in client.get('/').content.decode()
+
+        Group.objects.filter(pk=post_with_group.group_id).update(title='Stale title')
+        group = Group.objects.get(pk=post_with_group.group_id)
+        group.title = 'Renamed group'
+        group.save()
+        assert 'Renamed group' in client.get('/').content.decode(), \
+            'Check that saving a group invalidates the cards of its posts'
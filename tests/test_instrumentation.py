@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+from django.core.cache import cache
+
+from posts.instrumentation import QueryBudgetExceeded, percentile, stats
+
+
+class TestInstrumentation:
+
+    @pytest.fixture(autouse=True)
+    def reset_stats(self):
+        stats.clear()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_server_timing(self, client, post, settings):
+        settings.SERVER_TIMING = True
+        client.get('/')
+        response = client.get('/')
+        timing = dict(
+            metric.strip().split(';', 1)
+            for metric in response['Server-Timing'].split(',')
+            if ';' in metric
+        )
+        assert set(timing) >= {'db', 'cache', 'tpl', 'total'}
+        assert 'queries' in timing['db']
+
+        settings.SERVER_TIMING = False
+        assert not client.get('/').has_header('Server-Timing')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_stats(self, client, user, post, django_user_model):
+        client.get('/')
+        client.get('/')
+        client.get(f'/{user.username}/{post.id}/')
+        summary = stats.summary()
+        assert summary['index']['requests'] == 2
+        assert summary['index']['cache_hits'] > 0, \
+            'Check that hits on the page cache are counted'
+        assert summary['post']['queries_max'] > 0
+        assert summary['post']['p50_ms'] <= summary['post']['p95_ms']
+
+        assert client.get('/admin/instrumentation/').status_code == 302, \
+            'Check that the stats are only shown to staff'
+        admin = django_user_model.objects.create_user(
+            username='staff', is_staff=True
+        )
+        client.force_login(admin)
+        response = client.get('/admin/instrumentation/')
+        assert response.json()['index']['requests'] == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_query_budget(self, client, post, settings, caplog):
+        settings.QUERY_BUDGETS = {'index': 0}
+        with pytest.raises(QueryBudgetExceeded):
+            client.get('/')
+
+        settings.QUERY_BUDGET_RAISE = False
+        cache.clear()
+        with caplog.at_level(logging.WARNING, logger='posts.instrumentation'):
+            assert client.get('/').status_code == 200
+        assert any('the budget is 0' in record.message
+                   for record in caplog.records)
+        assert stats.summary()['index']['over_budget'] == 2
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile([3.0], 95) == 3.0
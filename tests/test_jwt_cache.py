@@ -0,0 +1,46 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def get(client, token):
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(
+            '/api/v1/follow/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+    lookups = [q for q in captured if 'FROM "auth_user" WHERE' in q['sql']]
+    return response.status_code, len(lookups)
+
+
+class TestCachedJWTAuthentication:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_user_is_cached(self, client, user):
+        token = AccessToken.for_user(user)
+        assert get(client, token) == (200, 1)
+        assert get(client, token) == (200, 0), \
+            'Check that the user of a token is cached'
+        assert get(client, AccessToken.for_user(user)) == (200, 1), \
+            'Check that users are cached per token'
+
+        user.is_active = False
+        user.save()
+        assert get(client, token) == (401, 1), \
+            'Check that saving the user invalidates its tokens'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_revoke(self, client, user):
+        token, other = AccessToken.for_user(user), AccessToken.for_user(user)
+        get(client, token)
+        response = client.post(
+            '/api/v1/token/revoke/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        assert response.status_code == 204
+        assert get(client, token) == (401, 0)
+        assert get(client, other)[0] == 200
+
+        user.first_name = 'Renamed'
+        user.save()
+        assert get(client, token)[0] == 401, \
+            'Check that revocations outlive user changes'
@@ -0,0 +1,69 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from posts.cache import generation
+from posts.models import Comment, Follow, Group, Post
+
+
+class TestAnonymousPageCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_hit_runs_no_queries(self, client, post_with_group):
+        urls = [
+            '/',
+            f'/group/{post_with_group.group.slug}/',
+            f'/{post_with_group.author.username}/',
+            f'/{post_with_group.author.username}/{post_with_group.id}/',
+        ]
+        for url in urls:
+            client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            assert response.status_code == 200
+            assert len(queries) == 0, f'Check that `{url}` is served from the page cache'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_writes_invalidate_their_scopes(self, client, user, post_with_group):
+        post = post_with_group
+        post_url = f'/{user.username}/{post.id}/'
+        client.get(post_url)
+        Comment.objects.create(post=post, author=user, text='Fresh comment')
+        assert 'Fresh comment' in client.get(post_url).content.decode()
+
+        group_url = f'/group/{post.group.slug}/'
+        assert post.text in client.get(group_url).content.decode()
+        post.group = Group.objects.create(title='Another', slug='another', description='-')
+        post.save()
+        assert post.text not in client.get(group_url).content.decode(), \
+            'Check that moving a post invalidates its old group page'
+
+        reader = get_user_model().objects.create_user(username='Reader')
+        client.get(f'/{user.username}/')
+        Follow.objects.create(user=reader, author=user)
+        assert 'Followers: 1' in client.get(f'/{user.username}/').content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_authenticated_users_bypass_cache(self, user, post):
+        anonymous = Client()
+        anonymous.get(f'/{user.username}/')
+        assert anonymous.get(f'/{user.username}/').context is None, \
+            'Check that anonymous pages are served from the cache'
+        logged_in = Client()
+        logged_in.force_login(user)
+        assert logged_in.get(f'/{user.username}/').context is not None, \
+            'Check that pages are rendered for authenticated users'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_generations_move_on_commit(self, client, user):
+        client.get('/')
+        with transaction.atomic():
+            before = generation('global')
+            Post.objects.create(text='Uncommitted', author=user)
+            # A page read now would be cached under ``before``.
+            assert generation('global') == before, \
+                'Check that writes bump generations when they commit'
+        assert generation('global') != before
+        assert 'Uncommitted' in client.get('/').content.decode()
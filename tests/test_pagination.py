@@ -0,0 +1,98 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post
+from posts.pagination import CursorPaginator
+from posts.seeding import seed
+
+
+class TestCursorPaginator:
+
+    @pytest.fixture
+    def posts(self, user):
+        return [
+            Post.objects.create(text=f'Cursor post {i}', author=user)
+            for i in range(12)
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_walk_forward_and_back(self, posts):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        expected = sorted(posts, key=lambda p: (p.pub_date, p.id), reverse=True)
+
+        first = paginator.get_page()
+        assert list(first) == expected[:5]
+        assert not first.has_previous() and first.has_next()
+
+        second = paginator.get_page(after=first.next_cursor)
+        assert list(second) == expected[5:10]
+        assert second.has_previous() and second.has_next()
+
+        third = paginator.get_page(after=second.next_cursor)
+        assert list(third) == expected[10:]
+        assert third.has_previous() and not third.has_next()
+
+        back = paginator.get_page(before=third.previous_cursor)
+        assert list(back) == expected[5:10], \
+            'Check that `before` returns the page preceding the cursor'
+        assert back.has_previous() and back.has_next()
+
+        assert list(paginator.get_page(before=back.previous_cursor)) == expected[:5]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_no_count_or_offset(self, posts):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        first = paginator.get_page()
+        with CaptureQueriesContext(connection) as queries:
+            paginator.get_page(after=first.next_cursor)
+        assert len(queries) == 1
+        sql = queries[0]['sql'].upper()
+        assert 'COUNT(' not in sql and 'OFFSET' not in sql, \
+            'Check that the cursor paginator does not issue COUNT or OFFSET'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_invalid_cursor_falls_back_to_first_page(self, posts):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        page = paginator.get_page(after='not-a-cursor')
+        assert list(page) == list(paginator.get_page())
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_view_cursor(self, client, posts):
+        response = client.get('/')
+        page = response.context['page']
+        response = client.get(f'/?after={page.next_cursor}')
+        assert response.status_code == 200
+        assert response.context['page'].object_list[0].pk != page.object_list[0].pk
+
+    @pytest.mark.django_db(transaction=True)
+    def test_deep_page_walks_the_index(self, settings):
+        settings.SEARCH_BACKEND = 'posts.search.PythonBackend'
+        seed(users=20, posts=300, groups=2, comments=10, follows=3)
+        paginator = CursorPaginator(Post.objects.for_feed(), 10)
+        middle = paginator.get_page(after=paginator.get_page().next_cursor)
+        executed = []
+
+        def record(execute, sql, params, many, context):
+            executed.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.cursor() as db:
+            # Statistics make SQLite weigh the author join against the
+            # ordering index, as it does on a production database.
+            db.execute('ANALYZE')
+            try:
+                for cursor in [{'after': middle.next_cursor},
+                               {'before': middle.previous_cursor}]:
+                    with connection.execute_wrapper(record):
+                        paginator.get_page(**cursor)
+                    sql, params = executed.pop()
+                    db.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                    plan = ' '.join(row[-1] for row in db.fetchall())
+                    assert 'posts_post_pub_dat_d3c0cd_idx' in plan, \
+                        'Check that a cursor page walks the feed ordering index'
+                    assert 'TEMP B-TREE' not in plan, \
+                        'Check that a cursor page is not sorted in a temporary b-tree'
+            finally:
+                db.execute('DELETE FROM sqlite_stat1')
+                db.execute('ANALYZE sqlite_master')
@@ -1,6 +1,6 @@
 import pytest
 
-from django.core.paginator import Paginator, Page
+from posts.pagination import CursorPage, CursorPaginator
 
 
 class TestGroupPaginatorView:
@@ -17,12 +17,12 @@ class TestGroupPaginatorView:
 
         assert 'paginator' in response.context, \
             'Check that you passed the `paginator` variable into the context of the `/group/<slug>/` page'
-        assert type(response.context['paginator']) == Paginator, \
-            'Check that the `paginator` variable type `Paginator` on the `/group/<slug>/` page'
+        assert type(response.context['paginator']) == CursorPaginator, \
+            'Check that the `paginator` variable type `CursorPaginator` on the `/group/<slug>/` page'
         assert 'page' in response.context, \
             'Check that you passed the `page` variable into the context of the `/group/<slug>/` page'
-        assert type(response.context['page']) == Page, \
-            'Check tha the `page` variable on the page `/group/<slug>/` is a `Page` type'
+        assert type(response.context['page']) == CursorPage, \
+            'Check tha the `page` variable on the page `/group/<slug>/` is a `CursorPage` type'
 
     @pytest.mark.django_db(transaction=True)
     def test_index_paginator_view_get(self, client, post_with_group):
@@ -30,9 +30,9 @@ class TestGroupPaginatorView:
         assert response.status_code != 404, 'The page `/` is not found, check it in *urls.py*'
         assert 'paginator' in response.context, \
             'Check that you passed the `paginator` variable into the context of the `/` page'
-        assert type(response.context['paginator']) == Paginator, \
-            'Check that the `paginator` variable type `Paginator` on the `/` page'
+        assert type(response.context['paginator']) == CursorPaginator, \
+            'Check that the `paginator` variable type `CursorPaginator` on the `/` page'
         assert 'page' in response.context, \
             'Check that you passed the `page` variable into the context of the `/` page'
-        assert type(response.context['page']) == Page, \
-            'Check tha the `page` variable on the page `/` is a `Page` type'
+        assert type(response.context['page']) == CursorPage, \
+            'Check tha the `page` variable on the page `/` is a `CursorPage` type'
@@ -1,6 +1,6 @@
 import pytest
 
-from django.core.paginator import Paginator, Page
+from posts.pagination import CursorPage, CursorPaginator
 from django.contrib.auth import get_user_model
 
 
@@ -26,13 +26,13 @@ class TestProfileView:
         profile_context = get_field_context(response.context, get_user_model())
         assert profile_context is not None, 'Check that you passed author into the context of the `/<username>/` page'
 
-        page_context = get_field_context(response.context, Page)
+        page_context = get_field_context(response.context, CursorPage)
         assert page_context is not None, \
             "Check that you passed a author's post into the context of the page `/<username>/`"
         assert len(page_context.object_list) == 1, \
             "Check that you passed a author's post into the context of the page `/<username>/`"
 
-        paginator_context = get_field_context(response.context, Paginator)
+        paginator_context = get_field_context(response.context, CursorPaginator)
         assert paginator_context is not None, \
             'Check that you passed a `paginator` variable into context of the page `/<username>/`'
 
@@ -45,7 +45,7 @@ class TestProfileView:
         if new_response.status_code in (301, 302):
             new_response = client.get(f'/{new_user.username}/')
 
-        page_context = get_field_context(new_response.context, Page)
+        page_context = get_field_context(new_response.context, CursorPage)
         assert page_context is not None, \
             "Check that you passed a author's post into the context of the page `/<username>/"
         assert len(page_context.object_list) == 0, \
@@ -0,0 +1,48 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from posts.models import Comment, Follow, Group, Post
+
+
+@pytest.fixture
+def feed(user, group):
+    """Posts by several authors, with groups and comments."""
+    other_group = Group.objects.create(title='Other', slug='other', description='Other group')
+    for i in range(6):
+        author = get_user_model().objects.create_user(username=f'Author{i}')
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(
+            text=f'Budget post {i}', author=author,
+            group=group if i % 2 else other_group,
+        )
+        Comment.objects.create(post=post, author=user, text='Comment')
+        Comment.objects.create(post=post, author=author, text='Reply')
+    return Post.objects.order_by('-pub_date').first()
+
+
+class TestQueryBudget:
+    # API budgets include the BEGIN issued by ATOMIC_REQUESTS.
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url, budget', [
+        ('/', 1),
+        ('/group/test-link/', 2),
+        ('/Author5/', 2),
+        ('/api/v1/posts/', 2),
+        ('/api/v1/follow/', 2),
+    ])
+    def test_anonymous_pages(self, client, feed, assert_query_budget, url, budget):
+        assert_query_budget(client, url, budget)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_page(self, client, feed, assert_query_budget):
+        assert_query_budget(client, f'/{feed.author.username}/{feed.id}/', 3)
+        assert_query_budget(client, f'/api/v1/posts/{feed.id}/comments/', 3)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_page(self, user_client, feed, assert_query_budget):
+        # session and user lookups come on top of the feed itself, read
+        # from the timeline and the popular authors; the first request
+        # caches the "who to follow" list
+        user_client.get('/follow/')
+        assert_query_budget(user_client, '/follow/', 4)
@@ -0,0 +1,73 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from posts import recommendations
+from posts.models import Follow, Group, Post
+from users.models import Profile
+
+
+def names(user):
+    return [author.username for author in recommendations.for_user(user)]
+
+
+@pytest.fixture
+def people(user):
+    User = get_user_model()
+    return {
+        name: User.objects.create_user(username=name)
+        for name in ['Friend', 'FriendOfFriend', 'Twin', 'TwinsPick', 'Poster']
+    }
+
+
+class TestRecommendations:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_signals(self, user, people):
+        Follow.objects.create(user=user, author=people['Friend'])
+        Follow.objects.create(
+            user=people['Friend'], author=people['FriendOfFriend']
+        )
+        Follow.objects.create(user=people['Twin'], author=people['Friend'])
+        Follow.objects.create(user=people['Twin'], author=people['TwinsPick'])
+        group = Group.objects.create(title='G', slug='g', description='G')
+        Post.objects.create(text='Mine', author=user, group=group)
+        Post.objects.create(text='Theirs', author=people['Poster'], group=group)
+
+        assert recommendations.recommend() == 6
+        assert names(user) == ['FriendOfFriend', 'TwinsPick', 'Poster'], \
+            'Check friends of friends, co-followers and group co-posting'
+        assert 'Friend' not in names(user), \
+            'Check that followed authors are not suggested'
+        assert recommendations.recommend() == 0, \
+            'Check that only dirty users are recomputed'
+
+        Follow.objects.create(user=user, author=people['FriendOfFriend'])
+        assert Profile.objects.get(user=user).recommendations_dirty
+        assert Profile.objects.get(user=people['Twin']).recommendations_dirty is False
+        recommendations.recommend(batch_size=1)
+        assert names(user) == ['TwinsPick', 'Poster']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_popular_authors_are_not_expanded(self, settings, user, people):
+        settings.RECOMMENDATIONS_MAX_FANOUT = 0
+        Follow.objects.create(user=user, author=people['Friend'])
+        Follow.objects.create(
+            user=people['Friend'], author=people['FriendOfFriend']
+        )
+        recommendations.recommend()
+        assert names(user) == []
+
+        Follow.objects.create(user=people['Friend'], author=people['Twin'])
+        assert Profile.objects.get(user=people['Friend']).recommendations_dirty
+        assert Profile.objects.get(user=user).recommendations_dirty is False, \
+            'Check that the followers of popular authors are not marked'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages(self, user_client, user, people):
+        Follow.objects.create(user=user, author=people['Friend'])
+        Follow.objects.create(user=people['Friend'], author=people['Twin'])
+        call_command('recommend_follows', '--all', stdout=open('/dev/null', 'w'))
+        assert 'href="/Twin/"' in user_client.get('/follow/').content.decode()
+        assert 'href="/Twin/"' in user_client.get(f'/{user.username}/').content.decode()
+        assert 'href="/Twin/"' not in user_client.get('/Friend/').content.decode()
@@ -0,0 +1,108 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import search
+from posts.models import Comment, Post
+from posts.search import SearchPaginator
+
+BACKENDS = ['posts.search.SQLiteBackend', 'posts.search.PythonBackend']
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, settings):
+    settings.SEARCH_BACKEND = request.param
+    return search.get_backend()
+
+
+class TestSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_follows_posts_and_comments(self, backend, user):
+        post = Post.objects.create(text='Sunny walk in the park', author=user)
+        assert [pk for _, pk in backend.search('park', 10)] == [post.pk]
+
+        Comment.objects.create(post=post, author=user, text='Lovely meadow')
+        assert [pk for _, pk in backend.search('meadow park', 10)] == [post.pk], \
+            'Check that comments are indexed with their post'
+
+        post.text = 'Rainy walk'
+        post.save()
+        assert backend.search('sunny', 10) == [], \
+            'Check that edited posts are reindexed'
+
+        post.delete()
+        assert backend.search('meadow', 10) == []
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments_are_appended(self, backend, user):
+        post = Post.objects.create(text='Quiet lake', author=user)
+        for i in range(3):
+            Comment.objects.create(post=post, author=user, text=f'Heron {i}')
+        with CaptureQueriesContext(connection) as captured:
+            comment = Comment.objects.create(post=post, author=user, text='Kingfisher')
+        assert not [q for q in captured if 'SELECT' in q['sql'] and 'posts_comment' in q['sql']], \
+            'Check that a new comment does not reload the comments of its post'
+        assert [pk for _, pk in backend.search('kingfisher heron lake', 10)] == [post.pk]
+
+        comment.text = 'Swan'
+        comment.save()
+        assert backend.search('kingfisher', 10) == []
+        assert [pk for _, pk in backend.search('swan', 10)] == [post.pk]
+
+        backend.remove(post.pk)
+        Comment.objects.create(post=post, author=user, text='Otter')
+        assert [pk for _, pk in backend.search('otter lake', 10)] == [post.pk], \
+            'Check that posts missing from the index are indexed whole'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_ranking(self, backend, user):
+        once = Post.objects.create(text='garden party', author=user)
+        twice = Post.objects.create(text='garden garden tools', author=user)
+        Post.objects.create(text='unrelated', author=user)
+        assert [pk for _, pk in backend.search('garden', 10)] == [twice.pk, once.pk]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_pagination(self, backend, user):
+        other = get_user_model().objects.create_user(username='Other')
+        posts = [
+            Post.objects.create(text=f'river {"river " * (i % 3)}{i}', author=user)
+            for i in range(12)
+        ]
+        Post.objects.create(text='mountain', author=other)
+        paginator = SearchPaginator('river', 5)
+
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        third = paginator.get_page(after=second.next_cursor)
+        seen = list(first) + list(second) + list(third)
+        assert sorted(p.pk for p in seen) == sorted(p.pk for p in posts)
+        assert not third.has_next() and third.has_previous()
+
+        back = paginator.get_page(before=third.previous_cursor)
+        assert list(back) == list(second)
+        assert list(paginator.get_page(before=back.previous_cursor)) == list(first)
+        assert list(paginator.get_page(after='garbage')) == list(first)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_page(self, backend, client, user):
+        for i in range(6):
+            Post.objects.create(text=f'Harbour view {i}', author=user)
+        response = client.get('/search/', {'q': 'harbour'})
+        assert response.status_code == 200
+        assert len(response.context['page']) == 5
+        assert '?q=harbour&after=' in response.content.decode(), \
+            'Check that paginator links keep the query'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_search(self, backend, client, user):
+        for i in range(12):
+            Post.objects.create(text=f'Lighthouse {i}', author=user)
+        Post.objects.create(text='Beacon', author=user)
+        response = client.get('/api/v1/posts/', {'search': 'lighthouse'})
+        data = response.json()
+        assert len(data['results']) == 10 and data['previous'] is None
+        assert all('Lighthouse' in post['text'] for post in data['results'])
+        data = client.get(data['next']).json()
+        assert len(data['results']) == 2 and data['next'] is None
@@ -0,0 +1,62 @@
+import json
+from collections import Counter
+
+import pytest
+from django.core.cache import cache
+from django.db.models import F
+
+from posts import benchmark, search
+from posts.models import Comment, FeedEntry, Follow, Post, User
+from posts.seeding import seed
+
+
+class TestSeeding:
+
+    @pytest.mark.django_db
+    def test_seed_is_skewed(self, settings):
+        settings.SEARCH_BACKEND = 'posts.search.PythonBackend'
+        created = seed(users=50, posts=500, groups=3, comments=300,
+                       follows=5)
+
+        assert User.objects.count() == created['users'] == 50
+        assert Post.objects.count() == created['posts'] == 500
+        assert Comment.objects.count() == 300
+        assert Follow.objects.count() == created['follows'] > 0
+        assert not Follow.objects.filter(user=F('author')).exists(), \
+            'Check that nobody follows themselves'
+        authors = Counter(Post.objects.values_list('author', flat=True))
+        top = sum(count for _, count in authors.most_common(5))
+        assert top > 250, \
+            'Check that a few authors write most of the posts'
+        user = User.objects.first()
+        assert user.profile.posts_count == user.posts.count(), \
+            'Check that counters are rebuilt after seeding'
+        assert FeedEntry.objects.exists()
+        assert search.get_backend().search('city', 1)
+
+    @pytest.mark.django_db
+    def test_benchmark_records_every_endpoint(self, settings):
+        settings.SEARCH_BACKEND = 'posts.search.PythonBackend'
+        seed(users=10, posts=30, groups=2, comments=30, follows=3)
+        results = benchmark.run(requests=2)
+
+        assert set(results) == set(benchmark.ENDPOINTS)
+        for stats in results.values():
+            assert 0 < stats['p50_ms'] <= stats['p95_ms']
+            assert stats['queries'] > 0
+        run = {'runs': [{'size': {'users': 10}, 'endpoints': results}]}
+        compared = list(benchmark.compare(json.loads(json.dumps(run)), run))
+        assert len(compared) == len(benchmark.ENDPOINTS)
+
+    def test_benchmark_cache_is_private(self):
+        cache.set('shared', 1)
+        with benchmark.private_cache():
+            assert cache.get('shared') is None
+            cache.set('private', 1)
+            with benchmark.private_cache('other'):
+                assert cache.get('private') is None, \
+                    'Check that named private caches are separate'
+            cache.clear()
+        assert cache.get('shared') == 1, \
+            'Check that benchmarks leave the shared cache alone'
+
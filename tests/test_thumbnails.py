@@ -0,0 +1,96 @@
+import threading
+from io import BytesIO
+
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts import thumbnails, variants
+from posts.cache import generation
+from posts.models import Post
+
+
+def image_file(name='card.png'):
+    file_obj = BytesIO()
+    Image.new('RGB', (60, 30), color=(0, 128, 0)).save(file_obj, 'png')
+    return SimpleUploadedFile(name, file_obj.getvalue(), 'image/png')
+
+
+class TestThumbnails:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_generated_on_save(self, client, user):
+        post = Post.objects.create(text='Card', author=user, image=image_file())
+        thumbnail = default.backend.cached_thumbnail(
+            post.image, thumbnails.CARD_GEOMETRY, **thumbnails.CARD_OPTIONS
+        )
+        assert thumbnail, 'Check that saving a post generates its card thumbnail'
+        response = client.get('/')
+        assert thumbnail.url in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_source_served_until_ready(self, monkeypatch, client, user):
+        queued = []
+        monkeypatch.setattr(
+            thumbnails, 'submit', lambda name, task: queued.append(name)
+        )
+        post = Post.objects.create(text='Card', author=user, image=image_file())
+        response = client.get('/')
+        assert f'src="{post.image.url}"' in response.content.decode(), \
+            'Check that the source image is shown until the thumbnail is ready'
+        name = default.backend.thumbnail_name(
+            post.image, thumbnails.CARD_GEOMETRY, **thumbnails.CARD_OPTIONS
+        )
+        assert name in queued, 'Check that the missing thumbnail is queued'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_request_generation_bumps_the_post(self, monkeypatch, settings,
+                                               client, user):
+        # The sync executor generates the card thumbnail in the request.
+        settings.QUERY_BUDGET_RAISE = False
+        monkeypatch.setattr(thumbnails, 'submit', lambda name, task: None)
+        post = Post.objects.create(text='Card', author=user, image=image_file())
+        monkeypatch.undo()
+        scope = generation(f'post:{post.pk}')
+        client.get('/')
+        post.refresh_from_db()
+        assert default.backend.cached_thumbnail(
+            post.image, thumbnails.CARD_GEOMETRY, **thumbnails.CARD_OPTIONS
+        )
+        assert post.version == 2 and generation(f'post:{post.pk}') > scope, \
+            'Check that a thumbnail made for a request rebuilds the cached card'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_request_generation_keeps_the_variants_job(self, monkeypatch, user):
+        monkeypatch.setattr(thumbnails, 'submit', lambda name, task: None)
+        post = Post.objects.create(text='Card', author=user, image=image_file())
+        monkeypatch.undo()
+        # A request is generating the card thumbnail in another process.
+        name = default.backend.thumbnail_name(
+            post.image, thumbnails.CARD_GEOMETRY, **thumbnails.CARD_OPTIONS
+        )
+        cache.add(thumbnails._lock_key(name), True)
+        post.save()
+        assert len(variants.generated(post.image)) == len(variants.registry()), \
+            'Check that a queued card thumbnail does not drop the post variants'
+
+    def test_generated_once(self, settings):
+        settings.THUMBNAIL_EXECUTOR = 'thread'
+        started, release, done = (threading.Event() for _ in range(3))
+        calls = []
+
+        def task():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            done.set()
+
+        assert thumbnails.submit('cache/card.jpg', task)
+        started.wait(5)
+        assert not thumbnails.submit('cache/card.jpg', task), \
+            'Check that a thumbnail being generated is not queued again'
+        release.set()
+        done.wait(5)
+        assert calls == [1]
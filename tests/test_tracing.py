@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sentry_sdk import Hub
+
+from yatube import tracing
+
+
+def transaction(status='ok', duration=0.01, sampling=None):
+    start = datetime(2020, 1, 1)
+    contexts = {'trace': {'status': status}}
+    if sampling is not None:
+        contexts['sampling'] = sampling
+    return {
+        'type': 'transaction',
+        'contexts': contexts,
+        'start_timestamp': start,
+        'timestamp': start + timedelta(seconds=duration),
+    }
+
+
+class TestTracing:
+
+    @pytest.fixture(autouse=True)
+    def rates(self, settings):
+        settings.SENTRY_TRACES_SAMPLE_RATE = 0.1
+        settings.SENTRY_TRACES_RATES = tracing.parse_rates('index=0.2, post=0')
+        settings.SENTRY_TRACES_IGNORE = ['/static/', '/media/', '/health']
+        settings.SENTRY_TRACES_BOOST = 4
+        settings.SENTRY_SLOW_TRANSACTION_MS = 500
+
+    def sample(self, path, **context):
+        return tracing.traces_sampler({'wsgi_environ': {'PATH_INFO': path}, **context})
+
+    def finish(self, path, **context):
+        """Sample a fast, successful request and return its event if kept."""
+        with Hub(Hub.current) as hub:
+            self.sample(path, **context)
+            return hub.scope.apply_to_event(transaction(), {})
+
+    def test_sampler(self):
+        assert self.sample('/static/style.css') == 0
+        assert self.sample('/media/cache/ab/cd/thumb.jpg') == 0
+        assert self.sample('/health') == 0
+        assert self.sample('/') == pytest.approx(0.8), \
+            'Check that rates by URL name are boosted'
+        assert self.sample('/leo/1/') == 0
+        assert self.sample('/group/cats/') == pytest.approx(0.4)
+        assert self.sample('/no/such/path/here/') == pytest.approx(0.4)
+        assert self.sample('/', parent_sampled=False) is False, \
+            'Check that the decision of an upstream service is kept'
+
+    def test_options(self):
+        assert tracing.options(0, {}) == {}, 'Check that tracing can be turned off'
+        assert tracing.options(0, {'index': 0.5}) == {'traces_sampler': tracing.traces_sampler}
+        assert 'traces_sampler' in tracing.options(0.1, {})
+
+    def test_keep_transaction(self, monkeypatch):
+        error = {'type': 'error'}
+        assert tracing.keep_transaction(error, {}) is error
+        boosted = {'rate': 0.2, 'applied': 0.8}
+        monkeypatch.setattr(tracing.random, 'random', lambda: 0.5)
+        assert tracing.keep_transaction(transaction(sampling=boosted), {}) is None, \
+            'Check that the boost surplus of fast requests is dropped'
+        assert tracing.keep_transaction(transaction(duration=1, sampling=boosted), {})
+        assert tracing.keep_transaction(
+            transaction(status='internal_error', sampling=boosted), {}
+        )
+        assert tracing.keep_transaction(transaction(), {}), \
+            'Check that transactions sampled without a boost are kept'
+        monkeypatch.setattr(tracing.random, 'random', lambda: 0.2)
+        assert tracing.keep_transaction(transaction(sampling=boosted), {}), \
+            'Check that fast requests are kept at the configured rate'
+
+    def test_keep_rate_of_sampler(self, monkeypatch, settings):
+        monkeypatch.setattr(tracing.random, 'random', lambda: 0.4)
+        settings.SENTRY_TRACES_RATES = {'index': 0.5}
+        assert self.sample('/') == 1.0
+        assert self.finish('/'), \
+            'Check that a capped boost keeps fast requests at the configured rate'
+        assert self.finish('/group/cats/') is None
+
+    def test_unboosted_are_kept(self, monkeypatch, settings):
+        monkeypatch.setattr(tracing.random, 'random', lambda: 0.99)
+        settings.SENTRY_TRACES_RATES = {'index': 1.0}
+        assert self.sample('/') == 1.0
+        assert self.finish('/'), \
+            'Check that requests traced at rate 1.0 are all kept'
+        assert self.finish('/', parent_sampled=True), \
+            'Check that transactions of an upstream trace are never dropped'
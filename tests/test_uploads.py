@@ -0,0 +1,107 @@
+import os
+import struct
+import tracemalloc
+import zlib
+
+import pytest
+from django.core.files.uploadedfile import (
+    SimpleUploadedFile, TemporaryUploadedFile
+)
+from PIL import Image, ImageFile
+
+from posts.forms import PostForm
+
+MB = 1024 * 1024
+
+
+def png_chunk(kind, data):
+    return (
+        struct.pack('>I', len(data)) + kind + data
+        + struct.pack('>I', zlib.crc32(kind + data))
+    )
+
+
+def png_bomb(side):
+    """A valid greyscale PNG of side x side pixels that is a few KB big."""
+    compressor = zlib.compressobj(9)
+    row = b'\x00' * (side + 1)
+    idat = b''.join(compressor.compress(row) for _ in range(side))
+    idat += compressor.flush()
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + png_chunk(b'IHDR', struct.pack('>IIBBBBB', side, side, 8, 0, 0, 0, 0))
+        + png_chunk(b'IDAT', idat)
+        + png_chunk(b'IEND', b'')
+    )
+
+
+class TestUploads:
+
+    @pytest.fixture(autouse=True)
+    def no_decoding(self, monkeypatch):
+        """Fail on any pixel decoding.
+
+        Pillow decodes into C buffers that tracemalloc does not see, so
+        the peak below cannot tell a decoded image from a streamed one.
+        """
+        def load(image):
+            pytest.fail('Check that uploads are validated without decoding the image')
+
+        monkeypatch.setattr(ImageFile.ImageFile, 'load', load)
+
+    def submit(self, rf, data):
+        """Parse and validate an upload, returning the form and peak memory.
+
+        The peak covers the Python buffers of the upload. The request
+        body is built and Pillow plugins are imported before tracing
+        starts, so only handling the upload is measured.
+        """
+        Image.init()
+        request = rf.post('/new', data=data)
+        tracemalloc.start()
+        try:
+            form = PostForm(request.POST, files=request.FILES)
+            form.is_valid()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return form, peak
+
+    @pytest.mark.django_db
+    def test_large_upload_is_streamed(self, rf):
+        image = SimpleUploadedFile(
+            'large.jpg', b'\xff\xd8\xff' + b'\x00' * (8 * MB), 'image/jpeg'
+        )
+        form, peak = self.submit(rf, {'text': 'Large', 'image': image})
+        assert isinstance(form.files['image'], TemporaryUploadedFile)
+        assert form.files['image'].size == 8 * MB + 3
+        assert peak < MB, \
+            f'Check that uploads are streamed, handling one took {peak} bytes'
+
+    @pytest.mark.django_db
+    def test_oversized_upload_is_rejected(self, rf, settings):
+        settings.POST_IMAGE_MAX_BYTES = MB
+        image = SimpleUploadedFile(
+            'huge.jpg', b'\xff\xd8\xff' + b'\x00' * (3 * MB), 'image/jpeg'
+        )
+        form, peak = self.submit(rf, {'text': 'Huge', 'image': image})
+        assert form.errors['image'] == ['Image files must be at most 1.0\xa0MB.']
+        assert peak < MB
+
+    @pytest.mark.django_db
+    def test_non_image_is_rejected(self, rf):
+        upload = SimpleUploadedFile('fake.png', b'<?php echo 1; ?>', 'image/png')
+        form, _ = self.submit(rf, {'text': 'Fake', 'image': upload})
+        assert form.errors['image'][0].startswith('Upload a valid image')
+        written = os.path.getsize(form.files['image'].temporary_file_path())
+        assert written == 0, \
+            'Check that a file without an image signature is not written'
+
+    @pytest.mark.django_db
+    def test_decompression_bomb_is_rejected_without_decoding(self, rf):
+        bomb = SimpleUploadedFile('bomb.png', png_bomb(10000), 'image/png')
+        form, peak = self.submit(rf, {'text': 'Bomb', 'image': bomb})
+        assert form.errors['image'] == [
+            'Images must have at most 25000000 pixels.'
+        ]
+        assert peak < MB
@@ -0,0 +1,68 @@
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+
+from posts import thumbnails, variants
+from posts.models import Post
+from tests.test_thumbnails import image_file
+
+
+class TestVariants:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_generated_on_upload(self, client, user):
+        post = Post.objects.create(text='Variants', author=user, image=image_file())
+        assert len(variants.generated(post.image)) == len(variants.registry()), \
+            'Check that saving a post generates every image variant'
+
+        content = client.get('/').content.decode()
+        assert '<picture>' in content
+        assert 'type="image/webp"' in content, \
+            'Check that the card offers WebP variants in a <source>'
+        assert '480w' in content and 'srcset=' in content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_exposes_variants(self, client, user):
+        post = Post.objects.create(text='Variants', author=user, image=image_file())
+        response = client.get(f'/api/v1/posts/{post.id}/')
+        image_variants = response.json()['image_variants']
+        assert {(v['width'], v['format']) for v in image_variants} == {
+            (v.width, v.format.lower()) for v in variants.registry()
+        }
+        assert all(v['url'].startswith('http://testserver/media/') for v in image_variants)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_looks_variants_up_per_page(self, client, user):
+        def queries(url):
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                assert client.get(url).status_code == 200
+            return len(captured)
+
+        Post.objects.create(text='Variants', author=user, image=image_file())
+        one = queries('/api/v1/posts/'), queries('/api/v1/export/posts.json')
+        for _ in range(4):
+            Post.objects.create(text='Variants', author=user, image=image_file())
+        assert (queries('/api/v1/posts/'), queries('/api/v1/export/posts.json')) == one, \
+            'Check that image variants are looked up once per page'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_backfill_command(self, monkeypatch, settings, client, user):
+        # The sync executor generates the card thumbnail in the request.
+        settings.QUERY_BUDGET_RAISE = False
+        monkeypatch.setattr(thumbnails, 'submit', lambda name, task: None)
+        post = Post.objects.create(text='Old image', author=user, image=image_file())
+        monkeypatch.undo()
+        assert not variants.generated(post.image)
+        assert 'type="image/webp"' not in client.get('/').content.decode()
+
+        call_command('backfill_variants', workers=1)
+        assert 'type="image/webp"' in client.get('/').content.decode(), \
+            'Check that the backfill invalidates cached cards'
+        assert Post.objects.get(pk=post.pk).version > post.version
+        assert len(variants.generated(post.image)) == len(variants.registry())
+        for variant, thumbnail in variants.generated(post.image):
+            assert default.storage.exists(thumbnail.name)
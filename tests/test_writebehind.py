@@ -0,0 +1,137 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts import writebehind
+from posts.models import Comment, Follow, Post
+from users.models import Profile
+
+
+@pytest.fixture
+def held(settings, monkeypatch):
+    """Queue writes behind a worker that waits until ``held.set()``."""
+    settings.WRITE_BEHIND = 'thread'
+    gate = threading.Event()
+    batches = []
+    apply = writebehind.apply
+
+    def held_apply(ops):
+        gate.wait(10)
+        batches.append(len(ops))
+        apply(ops)
+
+    monkeypatch.setattr(writebehind, 'apply', held_apply)
+    gate.batches = batches
+    yield gate
+    gate.set()
+    writebehind.flush()
+
+
+class TestWriteBehind:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments(self, held, user_client, user):
+        post = Post.objects.create(text='Popular', author=user)
+        url = f'/{user.username}/{post.id}/'
+        for i in range(3):
+            user_client.post(f'{url}comment', {'text': f'Queued {i}'})
+
+        assert not Comment.objects.exists()
+        assert 'Queued 2' in user_client.get(url).content.decode(), \
+            'Check that users see their queued comments'
+        assert 'Queued 2' not in Client().get(url).content.decode()
+
+        held.set()
+        writebehind.flush()
+        assert Comment.objects.filter(post=post).count() == 3
+        post.refresh_from_db()
+        assert post.comments_count == 3
+        assert len(held.batches) < 3, 'Check that queued writes are batched'
+        page = user_client.get(url).content.decode()
+        assert page.count('Queued 2') == 1 and '(sending)' not in page
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follows(self, held, user_client, user):
+        author = get_user_model().objects.create_user(username='Author')
+        other = get_user_model().objects.create_user(username='Other')
+        user_client.get('/Author/follow')
+        user_client.get('/Other/follow')
+        user_client.get('/Other/unfollow')
+
+        assert not Follow.objects.exists()
+        assert user_client.get('/Author/').context['following'] is True
+        assert user_client.get('/Other/').context['following'] is False
+        response = user_client.post(
+            '/api/v1/follow/', {'author': 'Author'},
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}',
+        )
+        assert response.status_code == 400, \
+            'Check that a queued follow counts as following'
+
+        held.set()
+        writebehind.flush()
+        assert list(Follow.objects.values_list('author', flat=True)) == [author.pk]
+        assert Profile.objects.get(user=user).following_count == 1
+        assert Profile.objects.get(user=other).followers_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_follow(self, held, client, user):
+        get_user_model().objects.create_user(username='Author')
+        response = client.post(
+            '/api/v1/follow/', {'author': 'Author'},
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}',
+        )
+        assert response.status_code == 202
+        assert response.json() == {'user': user.username, 'author': 'Author'}
+        held.set()
+        writebehind.flush()
+        assert Follow.objects.filter(user=user).count() == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_full_queue_writes_synchronously(self, held, monkeypatch,
+                                             user_client, user):
+        monkeypatch.setattr(writebehind.ThreadQueue, 'push', lambda self, op: False)
+        post = Post.objects.create(text='Popular', author=user)
+        user_client.post(f'/{user.username}/{post.id}/comment', {'text': 'Now'})
+        assert Comment.objects.filter(text='Now').exists()
+        assert writebehind.pending(user) == []
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_writes_keep_the_overlay(self, held, user):
+        post = Post.objects.create(text='Popular', author=user)
+        # Switch threads often enough for the writes to interleave.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(8) as pool:
+                list(pool.map(
+                    lambda i: writebehind.comment(Comment(author=user, post=post, text=f'Queued {i}')),
+                    range(50),
+                ))
+        finally:
+            sys.setswitchinterval(interval)
+        assert len(writebehind.pending_comments(user, post)) == 50, \
+            'Check that concurrent writes do not drop each other from the overlay'
+        held.set()
+        writebehind.flush()
+        assert writebehind.pending(user) == []
+
+    def test_only_the_thread_queue_flushes_at_exit(self, settings, monkeypatch):
+        registered = []
+        monkeypatch.setattr(writebehind.atexit, 'register', registered.append)
+        monkeypatch.setattr(writebehind, 'get_redis_connection', lambda alias: None)
+        monkeypatch.setattr(writebehind, '_queue', None)
+        settings.WRITE_BEHIND = 'redis'
+        writebehind.get_queue()
+        assert registered == [], \
+            'Check that web processes leave the Redis queue to apply_writes'
+
+        monkeypatch.setattr(writebehind, '_queue', None)
+        settings.WRITE_BEHIND = 'thread'
+        queue = writebehind.get_queue()
+        assert registered == [queue.flush]
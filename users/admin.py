@@ -1 +1,12 @@
-# Register your models here.
+from django.contrib import admin
+from .models import Profile
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "user", "posts_count", "followers_count", "following_count"
+    )
+    readonly_fields = ("posts_count", "followers_count", "following_count")
+
+
+admin.site.register(Profile, ProfileAdmin)
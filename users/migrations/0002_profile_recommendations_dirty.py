@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='recommendations_dirty',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+    ]
@@ -1 +1,24 @@
-# Create your models here.
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Profile(models.Model):
+    """Author profile holding denormalized counters.
+
+    The counters are kept in sync by the ``posts`` signals and can be
+    rebuilt with the ``recount_counters`` management command.
+    ``recommendations_dirty`` marks users whose follow suggestions the
+    ``recommend_follows`` command has to recompute.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="profile"
+    )
+    posts_count = models.IntegerField(default=0)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    recommendations_dirty = models.BooleanField(default=True, db_index=True)
+
+    def __str__(self):
+        return self.user.username
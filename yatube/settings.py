@@ -16,16 +16,8 @@ import sentry_sdk
 from dotenv import load_dotenv
 from sentry_sdk.integrations.django import DjangoIntegration
 
+from yatube import tracing
 
-sentry_sdk.init(
-    dsn="https://17a530367ad94b10ac644c9eb643d842@o423953.ingest.sentry.io/5443778",
-    integrations=[DjangoIntegration()],
-    traces_sample_rate=1.0,
-
-    # If you wish to associate users to errors (assuming you are using
-    # django.contrib.auth) you may enable sending PII data.
-    send_default_pii=True
-)
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -68,6 +60,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -114,6 +107,8 @@ DATABASES = {
         'PASSWORD': os.environ.get('SQL_PASSWORD', 'password'),
         'HOST': os.environ.get('SQL_HOST', 'localhost'),
         'PORT': os.environ.get('SQL_PORT', '5432'),
+        # Keeps denormalized counters consistent with the rows they count
+        'ATOMIC_REQUESTS': True,
     }
 }
 
@@ -190,10 +185,133 @@ REST_FRAMEWORK = {
             'rest_framework.permissions.IsAuthenticatedOrReadOnly',
         ],
         'DEFAULT_AUTHENTICATION_CLASSES': [
-            'rest_framework_simplejwt.authentication.JWTAuthentication',
+            'api.authentication.CachedJWTAuthentication',
         ],
         'DEFAULT_FILTER_BACKENDS': [
             'django_filters.rest_framework.DjangoFilterBackend',
         ],
         'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
+        'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPagination',
+        'PAGE_SIZE': 10,
     }
+
+# Follow feed: authors with more followers than this are merged into
+# timelines at read time instead of being fanned out on write
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.environ.get('FEED_FANOUT_MAX_FOLLOWERS', 1000)
+)
+# How many recent posts of a newly followed author go into a timeline
+FEED_BACKFILL_LIMIT = int(os.environ.get('FEED_BACKFILL_LIMIT', 1000))
+
+# "Who to follow": suggestions kept per user, users recomputed per batch
+# of the recommend_follows job, and the most followers (or group
+# authors) an author (or group) may have to still be expanded
+RECOMMENDATIONS_TOP = int(os.environ.get('RECOMMENDATIONS_TOP', 10))
+RECOMMENDATIONS_BATCH_SIZE = int(
+    os.environ.get('RECOMMENDATIONS_BATCH_SIZE', 1000)
+)
+RECOMMENDATIONS_MAX_FANOUT = int(
+    os.environ.get('RECOMMENDATIONS_MAX_FANOUT', 1000)
+)
+# Most similar users whose follows a user's co-follower score draws on
+RECOMMENDATIONS_SIMILAR_USERS = int(
+    os.environ.get('RECOMMENDATIONS_SIMILAR_USERS', 50)
+)
+
+# Lifetime of cached pages served to anonymous users. Writes invalidate
+# them through generation counters, so it only bounds memory use.
+ANONYMOUS_PAGE_CACHE_TIMEOUT = int(
+    os.environ.get('ANONYMOUS_PAGE_CACHE_TIMEOUT', 600)
+)
+
+# Write-behind queue for comments and follows: '' saves them in the
+# request, 'thread' queues them in-process, 'redis' on a Redis list of the
+# cache server drained by ``manage.py apply_writes``
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '')
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 500))
+# Queued writes above which requests save synchronously again
+WRITE_BEHIND_MAX_PENDING = int(
+    os.environ.get('WRITE_BEHIND_MAX_PENDING', 10000)
+)
+# Seconds the Redis overlay of a user's queued writes outlives their last
+# write, should the worker never apply them
+WRITE_BEHIND_OVERLAY_TIMEOUT = int(
+    os.environ.get('WRITE_BEHIND_OVERLAY_TIMEOUT', 300)
+)
+
+# Thumbnails are generated by a worker pool off the request path;
+# 'sync' generates them inline
+THUMBNAIL_BACKEND = 'posts.thumbnails.QueuedThumbnailBackend'
+THUMBNAIL_EXECUTOR = os.environ.get('THUMBNAIL_EXECUTOR', 'thread')
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+# Widths of the responsive post image variants
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+
+# Uploads are streamed to temporary files and checked as they arrive
+FILE_UPLOAD_HANDLERS = ['posts.uploads.ImageUploadHandler']
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+# Larger images are rejected before anything decodes them
+POST_IMAGE_MAX_PIXELS = 25_000_000
+
+# Full-text search index: posts.search.SQLiteBackend, PostgresBackend
+# or PythonBackend (in-process, for tests)
+SEARCH_BACKEND = os.environ.get(
+    'SEARCH_BACKEND',
+    'posts.search.PostgresBackend'
+    if 'postgresql' in DATABASES['default']['ENGINE']
+    else 'posts.search.SQLiteBackend'
+)
+# Text search configuration used by the PostgreSQL backend
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'simple')
+
+# Per-request instrumentation: send query, cache and template timings in
+# a Server-Timing header
+SERVER_TIMING = os.environ.get('SERVER_TIMING', str(DEBUG)) == 'True'
+# Most queries a view may run, by URL name. Views over budget are logged
+# as warnings, or raise when QUERY_BUDGET_RAISE is set (in tests). With
+# a cold cache every post image also costs a thumbnail lookup per variant.
+QUERY_BUDGETS = {
+    'index': 10,
+    'follow_index': 10,
+    'group_posts': 10,
+    'profile': 12,
+    'post': 12,
+    'post_comments': 6,
+    'search': 10,
+    'posts-list': 10,
+    'posts-detail': 8,
+    'comment-list': 6,
+    'groups-list': 4,
+    'follows-list': 5,
+}
+QUERY_BUDGET_RAISE = False
+
+# Error reporting and tracing. Requests are traced at SENTRY_TRACES_RATES
+# for their URL name, e.g. "index=0.5,post=0.2", or at
+# SENTRY_TRACES_SAMPLE_RATE; with every rate at 0 tracing is off. Slow
+# and failed requests are kept SENTRY_TRACES_BOOST times as often.
+SENTRY_DSN = os.environ.get(
+    'SENTRY_DSN',
+    'https://17a530367ad94b10ac644c9eb643d842@o423953.ingest.sentry.io/5443778'
+)
+SENTRY_TRACES_SAMPLE_RATE = float(
+    os.environ.get('SENTRY_TRACES_SAMPLE_RATE', 0.05)
+)
+SENTRY_TRACES_RATES = tracing.parse_rates(
+    os.environ.get('SENTRY_TRACES_RATES', '')
+)
+SENTRY_TRACES_IGNORE = os.environ.get(
+    'SENTRY_TRACES_IGNORE', f'{STATIC_URL},{MEDIA_URL},/health'
+).split(',')
+SENTRY_TRACES_BOOST = float(os.environ.get('SENTRY_TRACES_BOOST', 4))
+SENTRY_SLOW_TRANSACTION_MS = int(
+    os.environ.get('SENTRY_SLOW_TRANSACTION_MS', 1000)
+)
+
+sentry_sdk.init(
+    dsn=SENTRY_DSN,
+    integrations=[DjangoIntegration()],
+    # Usernames and addresses of the users in error reports
+    send_default_pii=os.environ.get('SENTRY_SEND_PII', 'False') == 'True',
+    **tracing.options(SENTRY_TRACES_SAMPLE_RATE, SENTRY_TRACES_RATES)
+)
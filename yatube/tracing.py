@@ -0,0 +1,119 @@
+"""Sentry transaction sampling.
+
+``traces_sampler`` decides when a request starts whether it is traced:
+static files, media (thumbnails included) and health checks never are,
+other requests at the rate of their URL name in ``SENTRY_TRACES_RATES``
+or ``SENTRY_TRACES_SAMPLE_RATE``.
+
+Whether a request is slow or fails is only known at its end, so slow and
+failed requests are boosted by tracing ``SENTRY_TRACES_BOOST`` times the
+rate and letting ``keep_transaction`` drop the surplus of the fast,
+successful ones. The sampler records both rates in the ``sampling``
+context of the transaction, and fast, successful transactions are kept
+with probability ``rate / applied``: they end up sampled at the
+configured rate and the others at the boosted one. Transactions without
+the context, those continuing an upstream trace among them, are never
+thinned.
+"""
+import random
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from sentry_sdk import configure_scope
+from sentry_sdk.scope import add_global_event_processor
+from sentry_sdk.transport import Transport
+
+
+def parse_rates(value):
+    """Parse ``"index=0.5,post=0.2"`` into ``{URL name: rate}``."""
+    rates = {}
+    for item in filter(None, value.split(',')):
+        name, rate = item.split('=')
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def options(sample_rate, rates):
+    """``sentry_sdk.init`` options; tracing is off when every rate is 0."""
+    if not sample_rate and not any(rates.values()):
+        return {}
+    return {'traces_sampler': traces_sampler}
+
+
+@lru_cache(maxsize=1024)
+def url_name(path):
+    try:
+        return resolve(path).view_name
+    except Resolver404:
+        return None
+
+
+def _record(sampling):
+    """Attach ``sampling`` to the transaction being started, or clear it."""
+    with configure_scope() as scope:
+        if sampling is None:
+            scope.remove_context('sampling')
+        else:
+            scope.set_context('sampling', sampling)
+
+
+def traces_sampler(sampling_context):
+    _record(None)
+    parent_sampled = sampling_context.get('parent_sampled')
+    if parent_sampled is not None:
+        # Keep distributed traces whole.
+        return parent_sampled
+    environ = sampling_context.get('wsgi_environ')
+    if environ is None:
+        return settings.SENTRY_TRACES_SAMPLE_RATE
+    path = environ.get('PATH_INFO', '')
+    if path.startswith(tuple(settings.SENTRY_TRACES_IGNORE)):
+        return 0
+    rate = settings.SENTRY_TRACES_RATES.get(
+        url_name(path), settings.SENTRY_TRACES_SAMPLE_RATE
+    )
+    applied = min(1.0, rate * settings.SENTRY_TRACES_BOOST)
+    if applied > rate:
+        _record({'rate': rate, 'applied': applied})
+    return applied
+
+
+def _seconds(timestamp):
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return datetime.fromisoformat(timestamp.rstrip('Z')).timestamp()
+
+
+def keep_transaction(event, hint):
+    """Event processor dropping the boost surplus of ordinary requests."""
+    if event.get('type') != 'transaction':
+        return event
+    sampling = event.get('contexts', {}).get('sampling')
+    if not sampling:
+        return event
+    status = event['contexts'].get('trace', {}).get('status')
+    duration = (
+        _seconds(event['timestamp']) - _seconds(event['start_timestamp'])
+    )
+    if status not in (None, 'ok'):
+        return event
+    if duration * 1000 >= settings.SENTRY_SLOW_TRANSACTION_MS:
+        return event
+    if random.random() * sampling['applied'] < sampling['rate']:
+        return event
+    return None
+
+
+add_global_event_processor(keep_transaction)
+
+
+class NullTransport(Transport):
+    """Drops every event, to measure the SDK without the network."""
+
+    def capture_event(self, event):
+        pass
+
+    def capture_envelope(self, envelope):
+        pass
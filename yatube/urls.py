@@ -21,12 +21,15 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 
+from posts.instrumentation import stats_view
+
 
 handler404 = "posts.views.page_not_found" # noqa
 handler500 = "posts.views.server_error" # noqa
 
 urlpatterns = [
     # admin section
+    path("admin/instrumentation/", stats_view, name="instrumentation"),
     path("admin/", admin.site.urls),
     # flatpages
     path("about/", include("django.contrib.flatpages.urls")),